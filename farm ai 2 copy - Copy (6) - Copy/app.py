@@ -1,21 +1,60 @@
-from fastapi import FastAPI, HTTPException
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_server'))
+# Created first so that GET /ready can report how long the imports below took
+from startup import Startup
+startup = Startup()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel,ValidationError
 from fastapi.exceptions import RequestValidationError
-import pandas as pd
-import joblib
 import numpy as np
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict
 import nest_asyncio
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi import FastAPI, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+import time
+
+from feature_builder import FeatureBuilder
+from model_registry import get_bundle
+from metrics import NULL_STOPWATCH, MetricsMiddleware, Registry, current_stopwatch
+from request_codec import RequestCodec, RequestDecodeError, dumps
+from listen_address import uvicorn_bind
+from inference_pool import InferencePool, Overloaded
+from prediction_journal import journal_from_env
+
+# pandas is only needed with FAST_PREPROCESS=0, so it's imported where it's used
+if TYPE_CHECKING:
+    import pandas as pd
 
 nest_asyncio.apply()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # A few requests through the whole app before it accepts connections; GET /ready reports 503 if they fail
+    await startup.warm_up_asgi(app, "/predict", dumps(compiled_features.sample_record(codec.normalize)))
+    # Answered predictions go to PREDICTION_JOURNAL_DIR (unset: off); started after the warm-up so its
+    # requests aren't journaled
+    global prediction_journal
+    prediction_journal = journal_from_env(metrics_registry)
+    yield
+    if prediction_journal:
+        prediction_journal.close()
+
+prediction_journal = None
+
+app = FastAPI(lifespan=lifespan)
+
+# Prometheus metrics for /metrics (METRICS_ENABLED=0 turns all instrumentation into no-ops)
+metrics_registry = Registry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+app.add_middleware(MetricsMiddleware, registry=metrics_registry, timed_paths=["/predict"])
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -25,11 +64,48 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"message": "Internal Server Error", "details": str(exc)}
     )
 
-# Load model and encoders
-model = joblib.load('LogReg.pkl')
-le = joblib.load('label_encoders.pkl')
-column_transformer = joblib.load('column_transformer.pkl')
-y_encoder = joblib.load('y_encoder.pkl')
+def count_validation_errors(errors):
+    for error in errors:
+        metrics_registry.counter("validation_errors_total", "Rejected inputs by request field",
+                                 field=str(error['loc'][-1]) if error['loc'] else "unknown").inc()
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    count_validation_errors(exc.errors())
+    return await request_validation_exception_handler(request, exc)
+
+startup.mark("imports")
+
+# Load model and encoders (from $MODEL_DIR, default: project root)
+load_started = time.perf_counter()
+bundle = get_bundle()
+model = bundle.model
+le = bundle.label_encoders
+column_transformer = bundle.column_transformer
+y_encoder = bundle.y_encoder
+metrics_registry.gauge("model_load_seconds", "Time taken to load the model files at startup").set(
+    time.perf_counter() - load_started)
+
+# The encoders compiled into a NumPy feature builder. It always describes the inputs (categories,
+# sample rows); it also builds the feature rows unless FAST_PREPROCESS=0
+compiled_features = FeatureBuilder.from_sklearn(le, column_transformer)
+feature_builder = compiled_features if os.environ.get("FAST_PREPROCESS", "1") != "0" else None
+startup.mark("model_load")
+
+# Scoring runs on INFERENCE_THREADS threads, off the event loop, with at most INFERENCE_MAX_QUEUE
+# calls waiting; beyond that requests get a 503 with Retry-After (INFERENCE_THREADS=0 scores inline)
+inference_pool = None
+if int(os.environ.get("INFERENCE_THREADS", "2")) > 0:
+    inference_pool = InferencePool(
+        workers=int(os.environ.get("INFERENCE_THREADS", "2")),
+        max_queue=int(os.environ.get("INFERENCE_MAX_QUEUE", "64")),
+        retry_after=int(os.environ.get("INFERENCE_RETRY_AFTER", "1")),
+        registry=metrics_registry,
+    )
 
 class CropPrediction(BaseModel):
     crop: str
@@ -48,7 +124,19 @@ class CropRequest(BaseModel):
     soil_type: str
     land_size: float
 
-def preprocess_input(data: pd.DataFrame):
+# Allowed values for every categorical column, used to count rejected inputs by field
+allowed_categories = {col: set(values) for col, values in compiled_features.categories().items()}
+
+# Decodes either request schema straight to a model input row, capitalizing state and soil type
+codec = RequestCodec(compiled_features.input_columns, allowed_categories, normalize=str.capitalize)
+
+def count_invalid_categories(record):
+    fields = [col for col, allowed in allowed_categories.items() if col in record and record[col] not in allowed]
+    for col in fields or ["unknown"]:
+        metrics_registry.counter("validation_errors_total", "Rejected inputs by request field",
+                                 field='soil_type' if col == 'Soil Type' else col).inc()
+
+def preprocess_input(data: "pd.DataFrame", stopwatch=NULL_STOPWATCH):
     # Apply label encoding
     for col, encoder in le.items():
         if col in data.columns:
@@ -57,47 +145,102 @@ def preprocess_input(data: pd.DataFrame):
                 invalid = data[col][~data[col].isin(encoder.classes_)].unique()
                 raise ValueError(f"Invalid {col} value(s): {invalid}. Allowed values: {encoder.classes_.tolist()}")
             data[col] = encoder.transform(data[col])
+    stopwatch.lap("label_encode")
     
     # Apply column transformations
     if column_transformer:
         data = column_transformer.transform(data)
+    stopwatch.lap("transform")
     
     return data
 
-@app.post("/predict", response_model=List[CropPrediction])
-async def predict(request: CropRequest):
-    try:
-        # Convert request to DataFrame and capitalize state and soil type
-        input_data = request.dict()
-        input_data['state'] = input_data['state'].capitalize()  # Capitalize state
-        input_data['Soil Type'] = input_data.pop('soil_type').capitalize()  # Capitalize soil type
-        
+def predict_record(input_data, stopwatch=NULL_STOPWATCH):
+    """
+    Top 5 predictions for one decoded row
+    """
+    if feature_builder:
+        processed_data = feature_builder.transform_one(input_data)
+        stopwatch.lap("transform")
+    else:
+        # Convert the decoded row to a DataFrame
+        import pandas as pd
         df = pd.DataFrame([input_data])
 
         # Preprocess data
-        processed_data = preprocess_input(df)
-
-        # Make prediction
-        probabilities = model.predict_proba(processed_data)[0]
-        
-        # Get top 5 predictions
-        top5_idx = np.argsort(probabilities)[-5:][::-1]
-        crops = y_encoder.inverse_transform(top5_idx)
-        scores = probabilities[top5_idx]
-
-        return [{"crop": crop, "probability": float(score)} 
-                for crop, score in zip(crops, scores)]
-        
+        processed_data = preprocess_input(df, stopwatch)
+
+    # Make prediction
+    probabilities = model.predict_proba(processed_data)[0]
+    stopwatch.lap("predict_proba")
+
+    # Get top 5 predictions
+    top5_idx = np.argsort(probabilities)[-5:][::-1]
+    crops = y_encoder.inverse_transform(top5_idx)
+    scores = probabilities[top5_idx]
+
+    result = [{"crop": crop, "probability": float(score)}
+              for crop, score in zip(crops, scores)]
+    stopwatch.lap("topk")
+    return result
+
+@app.post("/predict", responses={200: {"model": List[CropPrediction]}},
+          openapi_extra={"requestBody": {"required": True, "content": {
+              "application/json": {"schema": CropRequest.model_json_schema()}}}})
+async def predict(request: Request):
+    started = time.perf_counter()
+    stopwatch = current_stopwatch()
+    try:
+        input_data = codec.decode(await request.body())
+    except RequestDecodeError as e:
+        count_validation_errors(e.errors)
+        return Response(dumps({"detail": e.errors}), status_code=422, media_type="application/json")
+    stopwatch.lap("decode")
+    try:
+        if inference_pool:
+            result = await inference_pool.run(predict_record, input_data, stopwatch)
+        else:
+            result = predict_record(input_data, stopwatch)
+        if prediction_journal:
+            prediction_journal.record(input_data, result, "/predict", bundle.version,
+                                      latency_ms=(time.perf_counter() - started) * 1000.0,
+                                      stages=dict(stopwatch.stages))
+        return Response(dumps(result), media_type="application/json")
+
+    except Overloaded:
+        raise
     except ValueError as ve:
+        count_invalid_categories(input_data)
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+def metrics():
+    if not metrics_registry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/inference/stats")
+def inference_stats():
+    if not inference_pool:
+        return {"enabled": False}
+    return {"enabled": True, **inference_pool.stats()}
+
+@app.get("/journal/stats")
+def journal_stats():
+    if not prediction_journal:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_journal.stats()}
+
+@app.get("/ready")
+def ready():
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
 @app.get("/")
 def read_root():
     return {"message": "Crop Recommendation API - Send POST requests to /predict"}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    uvicorn.run(app, **uvicorn_bind())
 
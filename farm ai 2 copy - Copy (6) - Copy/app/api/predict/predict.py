@@ -1,26 +1,21 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import pickle
+import sys
 import numpy as np
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent / 'ml_server'))
+from model_registry import get_bundle
+
 app = FastAPI()
 
 # Load the models
 try:
-    model_path = Path(__file__).parent.parent.parent.parent / 'models'
-    
-    with open(model_path / 'LogReg.pkl', 'rb') as f:
-        model = pickle.load(f)
-        
-    with open(model_path / 'column_transformer.pkl', 'rb') as f:
-        column_transformer = pickle.load(f)
-        
-    with open(model_path / 'label_encoders.pkl', 'rb') as f:
-        label_encoders = pickle.load(f)
-        
-    with open(model_path / 'y_encoder.pkl', 'rb') as f:
-        y_encoder = pickle.load(f)
+    bundle = get_bundle()
+    model = bundle.model
+    column_transformer = bundle.column_transformer
+    label_encoders = bundle.label_encoders
+    y_encoder = bundle.y_encoder
 except Exception as e:
     print(f"Error loading models: {e}")
     raise
@@ -1,147 +1,240 @@
 import sys
 import json
-import pickle
 import os
+import time
 import traceback
+
+# Failures, with tracebacks, go to the text log; answered predictions go to the prediction journal
+LOG_FILE = os.path.join(os.path.dirname(__file__), 'prediction_log.txt')
+
+# (artifact name, description used in error messages)
+MODEL_ARTIFACTS = [
+    ('model', 'model'),
+    ('column_transformer', 'column transformer'),
+    ('label_encoders', 'label encoders'),
+    ('y_encoder', 'output encoder'),
+]
+
+# Shared helpers live in ml_server/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), 'ml_server'))
+from startup import Startup
+startup = Startup()
 import numpy as np
-from pathlib import Path
+from feature_builder import FeatureBuilder
+from log_config import BufferedLogWriter
+from metrics import Registry, Stopwatch
+from model_registry import ARTIFACT_FILES, get_bundle
+from prediction_journal import journal_from_env
+from request_codec import FIELD_ALIASES
+
+# Opened once and buffered; flushed after each request and at exit
+log_writer = BufferedLogWriter(LOG_FILE)
+
+# Written by a background thread, like the servers' journal: only when PREDICTION_JOURNAL_DIR is set
+journal = journal_from_env()
+
+# Only used for the per-stage times the stopwatch keeps
+stage_registry = Registry(enabled=False)
+
+def log(message):
+    log_writer.write(message)
+
+def load_models():
+    """
+    Load the model, column transformer, label encoders and output encoder.
+
+    Returns (model, feature builder, output encoder)
+    """
+    loaded = {}
+    for name, description in MODEL_ARTIFACTS:
+        file_name = ARTIFACT_FILES[name]
+        try:
+            loaded[name] = get_bundle(lazy=True).get(name)
+        except Exception as e:
+            log(f"Error loading {file_name}: {str(e)}\n{traceback.format_exc()}\n")
+            raise Exception(f"Failed to load {description}: {str(e)}")
+    feature_builder = compile_features(loaded['label_encoders'], loaded['column_transformer'])
+    return loaded['model'], feature_builder, loaded['y_encoder']
+
+# Values for fields the request leaves out, by model input column
+DEFAULT_INPUT = {
+    'N': 0.0,
+    'P': 0.0,
+    'K': 0.0,
+    'temperature': 25.0,
+    'humidity': 80.0,
+    'ph': 6.5,
+    'rainfall': 200.0,
+    'Soil Type': 'Loamy',
+    'state': 'Punjab',
+    'land_size': 1.0,
+}
+
+# Number of crops returned, best first
+TOP_K = 5
+
+def compile_features(label_encoders, column_transformer):
+    """
+    Compile the encoders into a FeatureBuilder, as the ML servers do
+    """
+    try:
+        return FeatureBuilder.from_sklearn(label_encoders, column_transformer)
+    except NotImplementedError as e:
+        log(f"Error compiling column transformer: {str(e)}\n{traceback.format_exc()}\n")
+        raise Exception(f"Failed to compile column transformer: {str(e)}")
+
+def build_record(input_data, feature_builder):
+    """
+    Model input record from the request fields (any name in FIELD_ALIASES)
+    """
+    record = {column: DEFAULT_INPUT.get(column) for column in feature_builder.input_columns}
+    for field, value in input_data.items():
+        column = FIELD_ALIASES.get(field)
+        if column in record:
+            record[column] = value
+
+    categories = feature_builder.categories()
+    for column in feature_builder.input_columns:
+        if column in categories:
+            value = str(record[column])
+            if value not in categories[column]:
+                # If the value is not known to the encoder, use a default value
+                log(f"Warning: {column} '{value}' not found in encoder, using '{categories[column][0]}'\n")
+                value = categories[column][0]
+            record[column] = value
+        else:
+            record[column] = float(record[column])
+    return record
+
+def make_prediction(input_data, models, journaled=True):
+    """
+    Run a single prediction with already loaded models
+    """
+    model, feature_builder, y_encoder = models
+    started = time.perf_counter()
+    stopwatch = Stopwatch(stage_registry, "predict_crop")
+
+    # Create the input record with proper validation
+    try:
+        record = build_record(input_data, feature_builder)
+        stopwatch.lap("features")
+    except Exception as e:
+        log(f"Error creating features: {str(e)}\n{traceback.format_exc()}\n")
+        raise Exception(f"Failed to process input values: {str(e)}")
+
+    # Transform features
+    try:
+        X_transformed = feature_builder.transform_one(record)
+        stopwatch.lap("transform")
+    except Exception as e:
+        log(f"Error transforming features: {str(e)}\n{traceback.format_exc()}\n")
+        raise Exception(f"Failed to transform features: {str(e)}")
+
+    # Make prediction
+    try:
+        probabilities = model.predict_proba(X_transformed)[0]
+        stopwatch.lap("predict_proba")
+    except Exception as e:
+        log(f"Error making prediction: {str(e)}\n{traceback.format_exc()}\n")
+        raise Exception(f"Failed to make prediction: {str(e)}")
+
+    # Decode the top predictions
+    try:
+        top_idx = np.argsort(probabilities)[-TOP_K:][::-1]
+        crops = y_encoder.inverse_transform(top_idx)
+        predictions = [{"crop": str(crop), "probability": float(probabilities[i])}
+                       for crop, i in zip(crops, top_idx)]
+        stopwatch.lap("decode")
+    except Exception as e:
+        log(f"Error decoding prediction: {str(e)}\n{traceback.format_exc()}\n")
+        raise Exception(f"Failed to decode prediction: {str(e)}")
+
+    if journal and journaled:
+        journal.record(record, predictions, "predict_crop",
+                       get_bundle(lazy=True).version, latency_ms=(time.perf_counter() - started) * 1000.0,
+                       stages=stopwatch.stages)
+    return {"prediction": predictions[0]["crop"], "predictions": predictions}
 
 def predict_crop():
     try:
         # Get input data from command line argument
         input_data = json.loads(sys.argv[1])
         
-        # Setup logging
-        log_file = os.path.join(os.path.dirname(__file__), 'prediction_log.txt')
-        with open(log_file, 'a') as f:
-            f.write(f"Input received: {json.dumps(input_data)}\n")
-        
-        # Get the path to the models directory
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'models')
-        
         # Load all required models with explicit error handling
-        try:
-            with open(os.path.join(models_dir, 'LogReg.pkl'), 'rb') as f:
-                model = pickle.load(f)
-            with open(log_file, 'a') as f:
-                f.write("Loaded LogReg.pkl successfully\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error loading LogReg.pkl: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to load model: {str(e)}")
-        
-        try:
-            with open(os.path.join(models_dir, 'column_transformer.pkl'), 'rb') as f:
-                column_transformer = pickle.load(f)
-            with open(log_file, 'a') as f:
-                f.write("Loaded column_transformer.pkl successfully\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error loading column_transformer.pkl: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to load column transformer: {str(e)}")
-        
-        try:
-            with open(os.path.join(models_dir, 'label_encoders.pkl'), 'rb') as f:
-                label_encoders = pickle.load(f)
-            with open(log_file, 'a') as f:
-                f.write("Loaded label_encoders.pkl successfully\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error loading label_encoders.pkl: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to load label encoders: {str(e)}")
-        
-        try:
-            with open(os.path.join(models_dir, 'y_encoder.pkl'), 'rb') as f:
-                y_encoder = pickle.load(f)
-            with open(log_file, 'a') as f:
-                f.write("Loaded y_encoder.pkl successfully\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error loading y_encoder.pkl: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to load output encoder: {str(e)}")
-        
-        # Create features array with proper validation
-        try:
-            features = [
-                float(input_data.get('N', 0)),
-                float(input_data.get('P', 0)),
-                float(input_data.get('K', 0)),
-                float(input_data.get('Temperature', 25)),
-                float(input_data.get('Humidity', 80)),
-                float(input_data.get('pH', 6.5)),
-                float(input_data.get('Rainfall', 200)),
-                str(input_data.get('State', 'Punjab')),
-                float(input_data.get('Area', 1.0))
-            ]
-            with open(log_file, 'a') as f:
-                f.write(f"Features created: {features}\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error creating features: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to process input values: {str(e)}")
-        
-        # Apply label encoding to categorical features (State)
-        try:
-            if 'State' in label_encoders:
-                state_idx = 7  # Index of State in features
-                state_value = features[state_idx]
-                if state_value in label_encoders['State'].classes_:
-                    features[state_idx] = label_encoders['State'].transform([state_value])[0]
-                else:
-                    # If state not found in encoder, use a default value
-                    features[state_idx] = 0
-                    with open(log_file, 'a') as f:
-                        f.write(f"Warning: State '{state_value}' not found in encoder, using default value\n")
-            with open(log_file, 'a') as f:
-                f.write(f"Features after encoding: {features}\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error in label encoding: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to encode categorical features: {str(e)}")
-        
-        # Transform features
-        try:
-            X_transformed = column_transformer.transform([features])
-            with open(log_file, 'a') as f:
-                f.write(f"Features transformed successfully\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error transforming features: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to transform features: {str(e)}")
-        
-        # Make prediction
-        try:
-            prediction = model.predict(X_transformed)[0]
-            with open(log_file, 'a') as f:
-                f.write(f"Prediction made: {prediction}\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error making prediction: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to make prediction: {str(e)}")
-        
-        # Decode prediction
-        try:
-            crop = y_encoder.inverse_transform([prediction])[0]
-            with open(log_file, 'a') as f:
-                f.write(f"Decoded prediction: {crop}\n")
-        except Exception as e:
-            with open(log_file, 'a') as f:
-                f.write(f"Error decoding prediction: {str(e)}\n{traceback.format_exc()}\n")
-            raise Exception(f"Failed to decode prediction: {str(e)}")
+        models = load_models()
         
         # Return result
-        result = {"prediction": crop}
-        with open(log_file, 'a') as f:
-            f.write(f"Returning result: {json.dumps(result)}\n\n")
+        result = make_prediction(input_data, models)
         print(json.dumps(result))
         
     except Exception as e:
         error_message = str(e)
         error_result = {"error": error_message}
-        log_file = os.path.join(os.path.dirname(__file__), 'prediction_log.txt')
-        with open(log_file, 'a') as f:
-            f.write(f"Error in prediction: {error_message}\n{traceback.format_exc()}\n\n")
+        log(f"Error in prediction: {error_message}\nInput: {sys.argv[1] if len(sys.argv) > 1 else ''}\n"
+            f"{traceback.format_exc()}\n\n")
         print(json.dumps(error_result))
 
+def warm_up(models, rounds=3):
+    """
+    Send a synthetic request through make_prediction, so the worker only
+    reports ready once it can actually answer
+    """
+    model, feature_builder, y_encoder = models
+    sample = feature_builder.sample_record()
+    for _ in range(rounds):
+        make_prediction(sample, models, journaled=False)
+
+def write_message(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def run_worker():
+    """
+    Long-lived worker mode used by the Next.js worker pool.
+
+    Models are loaded once, then every stdin line is a JSON request of the
+    form {"id": ..., "input": {...}} and every stdout line is the matching
+    response {"id": ..., "prediction": ..., "predictions": [...]} or {"id": ..., "error": ...}.
+    `input` takes the same field names as the ML servers (see
+    request_codec.FIELD_ALIASES); the response also has the top crops as
+    "predictions". A {"ready": true} line, with startup timings, is written once the
+    models are loaded and a warm-up prediction has succeeded.
+    """
+    startup.mark("imports")
+    try:
+        models = load_models()
+        startup.mark("model_load")
+        warm_up(models)
+        startup.mark("warmup")
+        startup.set_ready()
+    except Exception as e:
+        log(f"Worker failed to start: {str(e)}\n{traceback.format_exc()}\n\n")
+        write_message({"ready": False, "error": str(e)})
+        sys.exit(1)
+
+    write_message({"ready": True, "pid": os.getpid(), "startup": startup.report()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            input_data = request['input']
+
+            result = make_prediction(input_data, models)
+            write_message({"id": request_id, **result})
+        except Exception as e:
+            error_message = str(e)
+            log(f"Error in prediction: {error_message}\nInput: {line}\n{traceback.format_exc()}\n\n")
+            write_message({"id": request_id, "error": error_message})
+        log_writer.flush()
+
 if __name__ == "__main__":
-    predict_crop() 
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker()
+    else:
+        predict_crop()
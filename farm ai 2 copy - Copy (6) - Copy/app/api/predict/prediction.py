@@ -1,10 +1,9 @@
 import sys
 import json
-import pickle
 import os
 
-# Get the absolute path of the models directory
-models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'models')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), 'ml_server'))
+from model_registry import get_bundle
 
 def predict():
     try:
@@ -12,17 +11,11 @@ def predict():
         input_data = json.loads(sys.argv[1])
         
         # Load models
-        with open(os.path.join(models_dir, 'LogReg.pkl'), 'rb') as f:
-            model = pickle.load(f)
-        
-        with open(os.path.join(models_dir, 'column_transformer.pkl'), 'rb') as f:
-            column_transformer = pickle.load(f)
-        
-        with open(os.path.join(models_dir, 'label_encoders.pkl'), 'rb') as f:
-            label_encoders = pickle.load(f)
-        
-        with open(os.path.join(models_dir, 'y_encoder.pkl'), 'rb') as f:
-            y_encoder = pickle.load(f)
+        bundle = get_bundle()
+        model = bundle.model
+        column_transformer = bundle.column_transformer
+        label_encoders = bundle.label_encoders
+        y_encoder = bundle.y_encoder
         
         # Create features array
         features = [
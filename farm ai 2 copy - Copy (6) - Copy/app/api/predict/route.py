@@ -1,13 +1,16 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import pickle
 import numpy as np
 import os
+import sys
 from pathlib import Path
 from typing import Dict
 import json
 from fastapi.responses import JSONResponse
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent / 'ml_server'))
+from model_registry import get_bundle
+
 app = FastAPI()
 
 app.add_middleware(
@@ -20,19 +23,11 @@ app.add_middleware(
 
 # Load models once when the server starts
 try:
-    base_path = Path(__file__).parent.parent.parent.parent / 'models'
-    
-    with open(base_path / 'LogReg.pkl', 'rb') as f:
-        model = pickle.load(f)
-    
-    with open(base_path / 'column_transformer.pkl', 'rb') as f:
-        column_transformer = pickle.load(f)
-    
-    with open(base_path / 'label_encoders.pkl', 'rb') as f:
-        label_encoders = pickle.load(f)
-    
-    with open(base_path / 'y_encoder.pkl', 'rb') as f:
-        y_encoder = pickle.load(f)
+    bundle = get_bundle()
+    model = bundle.model
+    column_transformer = bundle.column_transformer
+    label_encoders = bundle.label_encoders
+    y_encoder = bundle.y_encoder
 except Exception as e:
     print(f"Error loading models: {e}")
     raise
@@ -0,0 +1,152 @@
+import { Agent, request as httpRequest, type IncomingHttpHeaders } from 'http';
+
+// HTTP client for the Python model server. Connections are kept alive and
+// reused, and with ML_SERVER_SOCKET set they go over a Unix domain socket
+// instead of TCP loopback (start the server with the same ML_SERVER_SOCKET).
+
+export interface CropPrediction {
+  crop: string;
+  probability: number;
+}
+
+export interface MlClientOptions {
+  socketPath?: string;
+  baseUrl?: string;
+  maxSockets?: number;
+  requestTimeoutMs?: number;
+  // Must stay below the server's ML_SERVER_KEEP_ALIVE (65s by default)
+  idleTimeoutMs?: number;
+}
+
+export interface MlResponse<T> {
+  status: number;
+  headers: IncomingHttpHeaders;
+  body: T;
+}
+
+export class MlServerError extends Error {
+  constructor(readonly status: number, readonly body: unknown) {
+    super(`Model server responded with ${status}: ${typeof body === 'string' ? body : JSON.stringify(body)}`);
+    this.name = 'MlServerError';
+  }
+}
+
+export class MlClient {
+  private readonly agent: Agent;
+  private readonly socketPath?: string;
+  private readonly hostname: string;
+  private readonly port: number;
+  private readonly requestTimeoutMs: number;
+
+  constructor(options: MlClientOptions = {}) {
+    this.socketPath = options.socketPath;
+    const url = new URL(options.baseUrl ?? 'http://127.0.0.1:8000');
+    this.hostname = url.hostname;
+    this.port = parseInt(url.port || '80', 10);
+    this.requestTimeoutMs = options.requestTimeoutMs ?? 10000;
+    this.agent = new Agent({
+      keepAlive: true,
+      maxSockets: options.maxSockets ?? 32,
+      timeout: options.idleTimeoutMs ?? 30000,
+    });
+  }
+
+  get transport(): string {
+    return this.socketPath ? `unix:${this.socketPath}` : `http://${this.hostname}:${this.port}`;
+  }
+
+  predict(input: Record<string, unknown>): Promise<CropPrediction[]> {
+    return this.post<CropPrediction[]>('/predict', input);
+  }
+
+  predictBatch(rows: Record<string, unknown>[]): Promise<unknown[]> {
+    return this.post<unknown[]>('/predict/batch', rows);
+  }
+
+  async post<T>(path: string, payload: unknown): Promise<T> {
+    const response = await this.request<T>('POST', path, payload);
+    if (response.status >= 400) {
+      throw new MlServerError(response.status, response.body);
+    }
+    return response.body;
+  }
+
+  async request<T>(method: string, path: string, payload?: unknown): Promise<MlResponse<T>> {
+    const body = payload === undefined ? undefined : Buffer.from(JSON.stringify(payload));
+    try {
+      return await this.send<T>(method, path, body);
+    } catch (error: any) {
+      // The server may close an idle connection just as we reuse it; the
+      // request never reached it, so sending it again is safe
+      if (error.reusedSocket && error.code === 'ECONNRESET') {
+        return this.send<T>(method, path, body);
+      }
+      throw error;
+    }
+  }
+
+  close() {
+    this.agent.destroy();
+  }
+
+  private send<T>(method: string, path: string, body?: Buffer): Promise<MlResponse<T>> {
+    return new Promise((resolve, reject) => {
+      const headers: Record<string, string | number> = { Accept: 'application/json' };
+      if (body) {
+        headers['Content-Type'] = 'application/json';
+        headers['Content-Length'] = body.length;
+      }
+      const req = httpRequest(
+        {
+          agent: this.agent,
+          method,
+          path,
+          headers,
+          ...(this.socketPath ? { socketPath: this.socketPath } : { hostname: this.hostname, port: this.port }),
+        },
+        (res) => {
+          const chunks: Buffer[] = [];
+          res.on('data', (chunk: Buffer) => chunks.push(chunk));
+          res.on('error', reject);
+          res.on('end', () => {
+            clearTimeout(timer);
+            const text = Buffer.concat(chunks).toString('utf8');
+            let parsed: unknown = text;
+            if ((res.headers['content-type'] || '').includes('json')) {
+              try {
+                parsed = JSON.parse(text);
+              } catch {
+                // Leave malformed JSON as text for the caller's error message
+              }
+            }
+            resolve({ status: res.statusCode ?? 0, headers: res.headers, body: parsed as T });
+          });
+        }
+      );
+      const timer = setTimeout(() => {
+        req.destroy(new Error(`Model server request timed out after ${this.requestTimeoutMs}ms`));
+      }, this.requestTimeoutMs);
+      req.on('error', (error: any) => {
+        clearTimeout(timer);
+        error.reusedSocket = req.reusedSocket;
+        reject(error);
+      });
+      req.end(body);
+    });
+  }
+}
+
+let sharedClient: MlClient | undefined;
+
+// One client (and connection pool) per server process, configured from
+// ML_SERVER_SOCKET, or ML_SERVER_URL for TCP, and ML_SERVER_MAX_SOCKETS
+export function getMlClient(): MlClient {
+  if (!sharedClient) {
+    sharedClient = new MlClient({
+      socketPath: process.env.ML_SERVER_SOCKET || undefined,
+      baseUrl: process.env.ML_SERVER_URL || undefined,
+      maxSockets: parseInt(process.env.ML_SERVER_MAX_SOCKETS || '32', 10),
+    });
+  }
+  return sharedClient;
+}
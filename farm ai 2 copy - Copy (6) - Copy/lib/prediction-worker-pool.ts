@@ -0,0 +1,240 @@
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import { createInterface } from 'readline';
+import { join } from 'path';
+
+// Pool of long-lived `predict_crop.py --worker` processes. Each worker loads
+// the model files once and then answers line-delimited JSON requests, so a
+// prediction no longer pays for interpreter startup and unpickling.
+
+export interface PredictionResult {
+  prediction?: string;
+  predictions?: { crop: string; probability: number }[];
+  error?: string;
+}
+
+export interface WorkerPoolOptions {
+  size?: number;
+  maxInFlight?: number;
+  requestTimeoutMs?: number;
+  pythonPath?: string;
+  scriptPath?: string;
+}
+
+interface PendingRequest {
+  resolve: (result: PredictionResult) => void;
+  reject: (error: Error) => void;
+  timer: ReturnType<typeof setTimeout>;
+  worker: Worker;
+}
+
+interface Worker {
+  process: ChildProcessWithoutNullStreams;
+  ready: Promise<void>;
+  inFlight: number;
+  alive: boolean;
+  // Starts in a row, including this one, that failed before the worker was ready
+  failedStarts: number;
+  started: boolean;
+}
+
+// Restart delay after a crash, doubled for every start in a row that fails before ready
+const RESTART_DELAY_MS = 1000;
+const MAX_RESTART_DELAY_MS = 60000;
+
+export class PoolBusyError extends Error {
+  constructor(maxInFlight: number) {
+    super(`Prediction pool is busy (${maxInFlight} requests in flight)`);
+    this.name = 'PoolBusyError';
+  }
+}
+
+export class PredictionWorkerPool {
+  private workers: Worker[] = [];
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+  private closed = false;
+  private readonly size: number;
+  private readonly maxInFlight: number;
+  private readonly requestTimeoutMs: number;
+  private readonly pythonPath: string;
+  private readonly scriptPath: string;
+
+  constructor(options: WorkerPoolOptions = {}) {
+    this.size = options.size ?? 2;
+    this.maxInFlight = options.maxInFlight ?? 64;
+    this.requestTimeoutMs = options.requestTimeoutMs ?? 10000;
+    this.pythonPath = options.pythonPath ?? process.env.PYTHON_PATH ?? 'python';
+    this.scriptPath = options.scriptPath ?? join(process.cwd(), 'app', 'api', 'predict', 'predict_crop.py');
+
+    for (let i = 0; i < this.size; i++) {
+      this.workers.push(this.startWorker());
+    }
+  }
+
+  get inFlight(): number {
+    return this.pending.size;
+  }
+
+  async predict(input: Record<string, unknown>): Promise<PredictionResult> {
+    if (this.closed) {
+      throw new Error('Prediction pool is closed');
+    }
+    if (this.pending.size >= this.maxInFlight) {
+      throw new PoolBusyError(this.maxInFlight);
+    }
+
+    // Pick the live worker with the fewest requests in flight
+    const worker = this.workers
+      .filter(w => w.alive)
+      .reduce<Worker | undefined>((best, w) => (!best || w.inFlight < best.inFlight ? w : best), undefined);
+    if (!worker) {
+      throw new Error('No prediction workers are available');
+    }
+
+    const id = this.nextId++;
+    const result = new Promise<PredictionResult>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.settle(id, undefined, new Error(`Prediction timed out after ${this.requestTimeoutMs}ms`));
+        // The worker is stuck; stop sending it traffic and let the exit handler replace it
+        if (worker.alive) {
+          console.error(`Prediction worker ${worker.process.pid} timed out, killing it`);
+          this.failWorker(worker, new Error('Prediction worker was killed after a request timed out'));
+          worker.process.kill('SIGKILL');
+        }
+      }, this.requestTimeoutMs);
+      this.pending.set(id, { resolve, reject, timer, worker });
+    });
+    worker.inFlight++;
+
+    await worker.ready.catch(() => undefined);
+    if (!worker.alive) {
+      this.settle(id, undefined, new Error('Prediction worker exited before it was ready'));
+    } else {
+      worker.process.stdin.write(JSON.stringify({ id, input }) + '\n');
+    }
+    return result;
+  }
+
+  close() {
+    this.closed = true;
+    for (const worker of this.workers) {
+      worker.alive = false;
+      worker.process.kill();
+    }
+    for (const id of Array.from(this.pending.keys())) {
+      this.settle(id, undefined, new Error('Prediction pool is closed'));
+    }
+  }
+
+  private startWorker(failedStarts = 0): Worker {
+    const child = spawn(this.pythonPath, [this.scriptPath, '--worker']);
+    let markReady: () => void = () => undefined;
+    let markFailed: (error: Error) => void = () => undefined;
+    const worker: Worker = {
+      process: child,
+      ready: new Promise<void>((resolve, reject) => {
+        markReady = resolve;
+        markFailed = reject;
+      }),
+      inFlight: 0,
+      alive: true,
+      failedStarts: failedStarts + 1,
+      started: false,
+    };
+    worker.ready.catch(() => undefined);
+
+    const lines = createInterface({ input: child.stdout });
+    lines.on('line', (line) => {
+      let message: any;
+      try {
+        message = JSON.parse(line);
+      } catch {
+        console.error('Prediction worker wrote invalid output:', line);
+        return;
+      }
+      if ('ready' in message) {
+        if (message.ready) {
+          worker.started = true;
+          markReady();
+        } else {
+          markFailed(new Error(message.error || 'Prediction worker failed to start'));
+        }
+        return;
+      }
+      const { id, ...result } = message;
+      this.settle(id, result);
+    });
+
+    // Writing to a worker that is exiting fails with EPIPE; without a listener that
+    // error would be thrown from the event loop and take down the server
+    child.stdin.on('error', (error) => {
+      console.error(`Prediction worker ${child.pid} stdin error:`, error);
+      this.failWorker(worker, new Error(`Prediction worker stdin failed: ${error.message}`));
+      child.kill();
+    });
+
+    child.stderr.on('data', (data) => {
+      console.error(`Prediction worker ${child.pid}: ${data}`);
+    });
+
+    child.on('exit', (code) => {
+      markFailed(new Error(`Prediction worker exited with code ${code}`));
+      this.failWorker(worker, new Error(`Prediction worker exited with code ${code}`));
+
+      // Restart the crashed worker, backing off while it keeps failing to start
+      if (!this.closed) {
+        const index = this.workers.indexOf(worker);
+        if (index !== -1) {
+          const failedStarts = worker.started ? 0 : worker.failedStarts;
+          const delay = Math.min(RESTART_DELAY_MS * 2 ** failedStarts, MAX_RESTART_DELAY_MS);
+          console.error(`Prediction worker ${child.pid} exited with code ${code}, restarting in ${delay}ms`);
+          setTimeout(() => {
+            if (!this.closed) {
+              this.workers[index] = this.startWorker(failedStarts);
+            }
+          }, delay);
+        }
+      }
+    });
+
+    return worker;
+  }
+
+  // Take a worker out of rotation and fail everything it was handling
+  private failWorker(worker: Worker, error: Error) {
+    worker.alive = false;
+    this.pending.forEach((request, id) => {
+      if (request.worker === worker) {
+        this.settle(id, undefined, error);
+      }
+    });
+  }
+
+  private settle(id: number, result?: PredictionResult, error?: Error) {
+    const request = this.pending.get(id);
+    if (!request) {
+      return;
+    }
+    this.pending.delete(id);
+    clearTimeout(request.timer);
+    request.worker.inFlight--;
+    if (error) {
+      request.reject(error);
+    } else {
+      request.resolve(result ?? {});
+    }
+  }
+}
+
+let sharedPool: PredictionWorkerPool | undefined;
+
+// One pool per server process, sized from PREDICTION_WORKERS / PREDICTION_MAX_IN_FLIGHT
+export function getPredictionWorkerPool(): PredictionWorkerPool {
+  if (!sharedPool) {
+    sharedPool = new PredictionWorkerPool({
+      size: parseInt(process.env.PREDICTION_WORKERS || '2', 10),
+      maxInFlight: parseInt(process.env.PREDICTION_MAX_IN_FLIGHT || '64', 10),
+    });
+  }
+  return sharedPool;
+}
@@ -0,0 +1,129 @@
+import math
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Physical limits of the amended values after the change
+VALUE_LIMITS = {"N": (0.0, None), "P": (0.0, None), "K": (0.0, None), "ph": (0.0, 14.0)}
+
+
+def _axis_indices(column: str, base_value: float, spec: Mapping[str, float]):
+    """
+    First and last step index (delta = min + i * step) of one amendment
+    axis that keep the amended value within its limits, without building
+    the axis
+    """
+    start, stop, step = float(spec["min"]), float(spec["max"]), float(spec["step"])
+    if not all(np.isfinite([start, stop, step])):
+        raise ValueError(f"Amendment range for {column} must be finite")
+    if step <= 0:
+        raise ValueError(f"Amendment step for {column} must be positive")
+    if stop < start:
+        raise ValueError(f"Amendment range for {column} is empty: min {start} > max {stop}")
+    # The small tolerance keeps max itself when (max - min) / step is a whole number up to rounding
+    first, last = 0, math.floor((stop - start) / step + 1e-9)
+    low, high = VALUE_LIMITS.get(column, (None, None))
+    if low is not None:
+        first = max(first, math.ceil((low - base_value - start) / step - 1e-9))
+    if high is not None:
+        last = min(last, math.floor((high - base_value - start) / step + 1e-9))
+    if last < first:
+        raise ValueError(f"No {column} amendment in [{start}, {stop}] keeps {column} within its limits")
+    return first, last
+
+
+def amendment_grid(base: Mapping[str, float], ranges: Mapping[str, Mapping[str, float]],
+                   max_candidates: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Deltas for every column in `ranges` ({"min", "max", "step"}), with values
+    that would leave the physical limits of the amended column removed.
+
+    The grid size is checked against `max_candidates` before any axis is
+    built, so an oversized request costs no memory.
+    """
+    indices = {column: _axis_indices(column, base[column], spec) for column, spec in ranges.items()}
+    n_candidates = 1
+    for first, last in indices.values():
+        n_candidates *= last - first + 1
+    if max_candidates is not None and n_candidates > max_candidates:
+        raise ValueError(f"{n_candidates} candidate profiles exceed the limit of {max_candidates}; "
+                         f"use larger steps or narrower ranges")
+
+    grid = {}
+    for column, (first, last) in indices.items():
+        spec = ranges[column]
+        # Round to the step's precision so 0.1 steps give 0.3, not 0.30000000000000004
+        grid[column] = np.round(float(spec["min"]) + np.arange(first, last + 1) * float(spec["step"]), 10)
+    return grid
+
+
+def search_amendments(base: Mapping[str, Any], target_index: int, ranges: Mapping[str, Mapping[str, float]],
+                      transform: Callable[[Dict[str, Sequence[Any]]], np.ndarray],
+                      predict_proba: Callable[[np.ndarray], np.ndarray], target_probability: float = 0.5,
+                      max_results: int = 5, max_candidates: int = 200000, chunk_size: int = 50000) -> Dict[str, Any]:
+    """
+    Score every combination of the amendment grids for one soil sample and
+    return the cheapest ones that give class `target_index` at least
+    `target_probability`.
+
+    `ranges` maps a numeric model column to {"min", "max", "step", "cost"},
+    where the deltas are added to the base value and cost is per unit of
+    change (in either direction). `transform` turns a dict of column arrays
+    into the model's feature matrix; candidates are scored `chunk_size`
+    rows at a time, so memory stays bounded for large grids.
+    """
+    started = time.perf_counter()
+    if not ranges:
+        raise ValueError("No amendments given")
+    grid = amendment_grid(base, ranges, max_candidates)
+    columns = list(grid)
+    n_candidates = int(np.prod([len(deltas) for deltas in grid.values()], dtype=np.int64))
+
+    # Cartesian product as index arrays: candidate i uses grid[column][index[column][i]]
+    mesh = np.meshgrid(*[np.arange(len(grid[column])) for column in columns], indexing="ij")
+    index = {column: m.ravel() for column, m in zip(columns, mesh)}
+    unit_costs = {column: float(ranges[column].get("cost", 0.0)) for column in columns}
+
+    probabilities = np.empty(n_candidates, dtype=np.float64)
+    is_top = np.empty(n_candidates, dtype=bool)
+    for start in range(0, n_candidates, chunk_size):
+        stop = min(start + chunk_size, n_candidates)
+        n = stop - start
+        batch = {column: np.full(n, value, dtype=object if isinstance(value, str) else np.float64)
+                 for column, value in base.items()}
+        for column in columns:
+            batch[column] = base[column] + grid[column][index[column][start:stop]]
+        proba = predict_proba(transform(batch))
+        probabilities[start:stop] = proba[:, target_index]
+        is_top[start:stop] = proba.argmax(axis=1) == target_index
+
+    costs = np.zeros(n_candidates, dtype=np.float64)
+    for column in columns:
+        costs += np.abs(grid[column][index[column]]) * unit_costs[column]
+
+    def describe(i: int) -> Dict[str, Any]:
+        deltas = {column: float(grid[column][index[column][i]]) for column in columns}
+        return {
+            "amendments": deltas,
+            "soil": {column: float(base[column] + delta) for column, delta in deltas.items()},
+            "cost": float(costs[i]),
+            "probability": float(probabilities[i]),
+            "top_crop": bool(is_top[i]),
+        }
+
+    # Cheapest first; among equal costs the most probable
+    reaching = np.flatnonzero(probabilities >= target_probability)
+    order = reaching[np.lexsort((-probabilities[reaching], costs[reaching]))][:max_results]
+
+    current = predict_proba(transform({column: [value] for column, value in base.items()}))[0, target_index]
+
+    return {
+        "candidates_scored": n_candidates,
+        "current_probability": float(current),
+        "reachable": bool(len(reaching)),
+        "results": [describe(i) for i in order],
+        "best": describe(int(np.argmax(probabilities))),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
@@ -1,26 +1,64 @@
-try:
+"""
+Check that the server's packages are installed, without importing them.
+
+    python check_imports.py          # installed? (fast: nothing is imported)
+    python check_imports.py --time   # also how long each import takes, in a fresh interpreter
+"""
+import argparse
+import importlib.metadata
+import importlib.util
+import subprocess
+import sys
+
+# (module name, distribution name)
+PACKAGES = [
+    ("fastapi", "fastapi"),
+    ("uvicorn", "uvicorn"),
+    ("pandas", "pandas"),
+    ("numpy", "numpy"),
+    ("joblib", "joblib"),
+    ("sklearn", "scikit-learn"),
+]
+
+
+def import_ms(module):
+    """
+    Milliseconds to import `module` in a new interpreter, so nothing is already cached
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return float(result.stdout) if result.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--time", action="store_true", help="time each import in a fresh interpreter")
+    args = parser.parse_args()
+
     print("Checking required packages...")
-    
-    import fastapi
-    print("✓ fastapi is installed")
-    
-    import uvicorn
-    print("✓ uvicorn is installed")
-    
-    import pandas
-    print("✓ pandas is installed")
-    
-    import numpy
-    print("✓ numpy is installed")
-    
-    import joblib
-    print("✓ joblib is installed")
-    
-    import sklearn
-    print("✓ scikit-learn is installed")
-    
+    missing = []
+    for module, distribution in PACKAGES:
+        if importlib.util.find_spec(module) is None:
+            missing.append(distribution)
+            print(f"✗ {distribution} is not installed")
+            continue
+        try:
+            version = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            version = "unknown version"
+        line = f"✓ {distribution} {version} is installed"
+        if args.time:
+            elapsed = import_ms(module)
+            line += f" (import: {elapsed:.0f} ms)" if elapsed is not None else " (import failed)"
+        print(line)
+
+    if missing:
+        print(f"Missing: {', '.join(missing)}")
+        print("Please install the missing package with: pip install [package_name]")
+        print("Or install all requirements with: pip install -r requirements.txt")
+        sys.exit(1)
     print("All required packages are installed.")
-except ImportError as e:
-    print(f"Error: {e}")
-    print("Please install the missing package with: pip install [package_name]")
-    print("Or install all requirements with: pip install -r requirements.txt") 
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    main()
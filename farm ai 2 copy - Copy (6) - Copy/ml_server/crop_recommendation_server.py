@@ -1,25 +1,61 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import pandas as pd
-import joblib
+# Created first so that GET /ready can report how long the imports below took
+from startup import Startup, is_warm_up
+startup = Startup()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import numpy as np
-from typing import List, Dict
-import uvicorn
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import os
 import sys
+import time
 import logging
 from fastapi.middleware.cors import CORSMiddleware
+from feature_builder import FeatureBuilder
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher
+from inference_pool import InferencePool, Overloaded
+from deadline_fallback import DeadlineFallback
+from prediction_journal import journal_from_env
+from rule_engine import RuleEngine
+from ndjson_stream import JsonItemReader, stream_chunks
+from request_codec import FIELD_ALIASES, RequestCodec, RequestDecodeError, dumps
+from amendment_search import search_amendments
+from model_registry import get_bundle
+from model_reloader import ModelReloader
+from log_config import Lazy, configure_logging
+from listen_address import describe, uvicorn_bind
+from metrics import NULL_STOPWATCH, MetricsMiddleware, Registry, current_stopwatch
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# pandas is only needed with FAST_PREPROCESS=0, so it is imported where it's used rather than on
+# every startup
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Configure logging (queued; per-request categories sampled via LOG_SAMPLE_RATES)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app):
+    # Send a few requests through the whole app before the server starts accepting
+    # connections; GET /ready reports 503 if they fail
+    await startup.warm_up_asgi(app, "/predict", dumps(reloader.current.compiled_features.sample_record(reloader.current.codec.normalize)))
+    # Started after the warm-up so that its requests aren't journaled (and, under serve_workers.py,
+    # in each worker rather than in the parent)
+    global prediction_journal
+    prediction_journal = journal_from_env(metrics_registry)
+    yield
+    if prediction_journal:
+        prediction_journal.close()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -30,46 +66,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Get the directory where this script is located
-script_dir = os.path.dirname(os.path.abspath(__file__))
-base_dir = os.path.dirname(script_dir)  # Go up one level to the project root
-
-logger.info(f"Script directory: {script_dir}")
-logger.info(f"Base directory: {base_dir}")
-
-# Load model and encoders
-try:
-    model_path = os.path.join(base_dir, "LogReg.pkl")
-    le_path = os.path.join(base_dir, "label_encoders.pkl")
-    column_transformer_path = os.path.join(base_dir, "column_transformer.pkl")
-    y_encoder_path = os.path.join(base_dir, "y_encoder.pkl")
-    
-    logger.info(f"Loading model from: {model_path}")
-    logger.info(f"Loading label encoders from: {le_path}")
-    logger.info(f"Loading column transformer from: {column_transformer_path}")
-    logger.info(f"Loading y encoder from: {y_encoder_path}")
-    
-    # Check if files exist
-    for file_path in [model_path, le_path, column_transformer_path, y_encoder_path]:
-        if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
-            raise FileNotFoundError(f"File not found: {file_path}")
-    
-    model = joblib.load(model_path)
-    logger.info("Model loaded successfully")
-    
-    le = joblib.load(le_path)
-    logger.info("Label encoders loaded successfully")
-    
-    column_transformer = joblib.load(column_transformer_path)
-    logger.info("Column transformer loaded successfully")
-    
-    y_encoder = joblib.load(y_encoder_path)
-    logger.info("Y encoder loaded successfully")
-    
-except Exception as e:
-    logger.error(f"Error loading model files: {str(e)}")
-    raise
+# Prometheus metrics for /metrics (METRICS_ENABLED=0 turns all instrumentation into no-ops)
+metrics_registry = Registry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+app.add_middleware(MetricsMiddleware, registry=metrics_registry, timed_paths=["/predict", "/predict/batch", "/predict/stream", "/amendments"])
 
 class CropPrediction(BaseModel):
     crop: str
@@ -87,11 +86,138 @@ class CropRequest(BaseModel):
     soil_type: str
     land_size: float
 
-def preprocess_input(data: pd.DataFrame):
+class BatchPrediction(BaseModel):
+    index: int
+    predictions: Optional[List[CropPrediction]] = None
+    error: Optional[str] = None
+
+class AmendmentRange(BaseModel):
+    min: float = 0.0
+    max: float
+    step: float
+    cost: float = 0.0  # per unit of change, e.g. per kg/ha or per pH unit
+
+class AmendmentRequest(BaseModel):
+    soil: Dict[str, Any]  # a /predict request, in either schema
+    target_crop: str
+    target_probability: float = Field(0.5, ge=0, le=1)
+    amendments: Dict[str, AmendmentRange]  # keyed by N, P, K, ph, ...
+    max_results: int = Field(5, ge=1)
+
+# Largest number of candidate soil profiles scored by one /amendments request
+AMENDMENT_MAX_CANDIDATES = int(os.environ.get("AMENDMENT_MAX_CANDIDATES", "200000"))
+
+# Largest number of rows accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+
+# /predict/stream: rows scored per NDJSON chunk, chunks scored ahead of a slow client, largest body accepted
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_PENDING = int(os.environ.get("STREAM_MAX_PENDING", "4"))
+STREAM_MAX_BYTES = int(os.environ.get("STREAM_MAX_BYTES", str(256 * 1024 * 1024)))
+
+FAST_PREPROCESS = os.environ.get("FAST_PREPROCESS", "1") != "0"
+
+class ServingModel:
+    """
+    Everything a request needs from one version of the model files. A
+    request picks up the active instance once, so a hot reload never
+    mixes two versions within one request.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.version = bundle.version
+        self.model = bundle.model
+        self.le = bundle.label_encoders
+        self.column_transformer = bundle.column_transformer
+        self.y_encoder = bundle.y_encoder
+        self.feature_names = self.column_transformer.feature_names_in_.tolist()
+
+        # The encoders compiled into a NumPy feature builder. It always describes the inputs
+        # (categories, sample rows); it also builds the feature rows unless FAST_PREPROCESS=0
+        self.compiled_features = FeatureBuilder.from_sklearn(self.le, self.column_transformer)
+        self.feature_builder = self.compiled_features if FAST_PREPROCESS else None
+
+        # Allowed values for every categorical column
+        self.allowed_categories = {col: set(values) for col, values in self.compiled_features.categories().items()}
+
+        # Decodes either request schema straight to a model input row, capitalizing state and soil type
+        self.codec = RequestCodec(self.feature_names, self.allowed_categories, normalize=str.capitalize)
+
+        # Model class names by lowercased name, so rule engine fallbacks use the same crop names
+        self.class_names = {crop.lower(): crop for crop in self.y_encoder.classes_.tolist()}
+
+def validate_categories(record: Dict[str, Any], serving: ServingModel):
+    for col, allowed in serving.allowed_categories.items():
+        if col in record and record[col] not in allowed:
+            raise ValueError(f"Invalid {col} value(s): ['{record[col]}']. Allowed values: {sorted(allowed)}")
+
+def top_k(probabilities: np.ndarray, k: int = 5):
+    """
+    Indices of the k most probable classes for every row, best first
+    """
+    k = min(k, probabilities.shape[1])
+    idx = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(probabilities, idx, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+def count_validation_error(field: str):
+    metrics_registry.counter("validation_errors_total", "Rejected inputs by request field", field=field).inc()
+
+def count_validation_errors(errors: List[Dict[str, Any]]):
+    for e in errors:
+        count_validation_error(str(e['loc'][-1]) if e['loc'] else "unknown")
+
+def json_response(content: Any, serving: ServingModel, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Encode a response directly instead of validating it against a response_model
+    """
+    return Response(dumps(content), status_code=status_code, media_type="application/json",
+                    headers={"X-Model-Version": serving.version, **(headers or {})})
+
+def decode_error_response(error: RequestDecodeError, serving: ServingModel) -> Response:
+    count_validation_errors(error.errors)
+    return json_response({"detail": error.errors}, serving, status_code=422)
+
+def request_body_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    OpenAPI request body for endpoints that decode the body themselves
+    """
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+def count_invalid_categories(record: Dict[str, Any], serving: ServingModel):
+    fields = [col for col, allowed in serving.allowed_categories.items() if col in record and record[col] not in allowed]
+    for col in fields or ["unknown"]:
+        count_validation_error('soil_type' if col == 'Soil Type' else col)
+
+def score_records(records: List[Dict[str, Any]], serving: ServingModel,
+                  stopwatch=NULL_STOPWATCH) -> List[List[Dict[str, Any]]]:
+    """
+    Top 5 predictions for already validated records, scored as one matrix
+    """
+    if serving.feature_builder:
+        processed_data = serving.feature_builder.transform(records)
+        stopwatch.lap("transform")
+    else:
+        import pandas as pd
+        processed_data = preprocess_input(pd.DataFrame(records), serving, stopwatch)
+    probabilities = serving.model.predict_proba(processed_data)
+    stopwatch.lap("predict_proba")
+
+    top_idx = top_k(probabilities, 5)
+    crops = serving.y_encoder.inverse_transform(top_idx.ravel()).reshape(top_idx.shape)
+    scores = np.take_along_axis(probabilities, top_idx, axis=1)
+    stopwatch.lap("topk")
+    return [[{"crop": crop, "probability": score} for crop, score in zip(row_crops, row_scores)]
+            for row_crops, row_scores in zip(crops.tolist(), scores.tolist())]
+
+def preprocess_input(data: "pd.DataFrame", serving: ServingModel, stopwatch=NULL_STOPWATCH):
     try:
-        logger.info(f"Preprocessing input data: {data.head()}")
+        logger.info("Preprocessing input data: %s", Lazy(data.head), extra={"category": "payload"})
         # Apply label encoding
-        for col, encoder in le.items():
+        for col, encoder in serving.le.items():
             if col in data.columns:
                 # Handle unseen labels
                 if not data[col].isin(encoder.classes_).all():
@@ -99,61 +225,592 @@ def preprocess_input(data: pd.DataFrame):
                     logger.warning(f"Invalid {col} value(s): {invalid}. Allowed values: {encoder.classes_.tolist()}")
                     raise ValueError(f"Invalid {col} value(s): {invalid}. Allowed values: {encoder.classes_.tolist()}")
                 data[col] = encoder.transform(data[col])
+        stopwatch.lap("label_encode")
         
         # Apply column transformations
-        if column_transformer:
-            data = column_transformer.transform(data)
+        if serving.column_transformer:
+            data = serving.column_transformer.transform(data)
+        stopwatch.lap("transform")
         
-        logger.info("Data preprocessing completed successfully")
+        logger.info("Data preprocessing completed successfully", extra={"category": "stage"})
         return data
     except Exception as e:
         logger.error(f"Error in preprocessing: {str(e)}")
         raise
 
-@app.post("/predict", response_model=List[CropPrediction])
-async def predict(request: CropRequest):
-    try:
-        logger.info(f"Received prediction request: {request}")
-        # Convert request to DataFrame and capitalize state and soil type
-        input_data = request.dict()
-        input_data['state'] = input_data['state'].capitalize()  # Capitalize state
-        input_data['Soil Type'] = input_data.pop('soil_type').capitalize()  # Capitalize soil type
-        
-        df = pd.DataFrame([input_data])
-        logger.info(f"Created dataframe: {df.to_dict()}")
+def transform_columns(columns: Dict[str, Any], serving: ServingModel) -> np.ndarray:
+    """
+    Feature matrix for column arrays of already validated rows
+    """
+    if serving.feature_builder:
+        return serving.feature_builder.transform_columns(columns)
+    import pandas as pd
+    return preprocess_input(pd.DataFrame(columns), serving)
+
+def validate_rows(items: List[Any], serving: ServingModel) -> Tuple[List[Dict[str, Any]], List[int], Dict[int, str]]:
+    """
+    Records and positions of the valid rows of a batch, and an error message for every invalid one
+    """
+    rows = []
+    row_indices = []
+    errors = {}
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Expected a JSON object")
+            record = serving.codec.decode_object(item)
+            validate_categories(record, serving)
+        except RequestDecodeError as e:
+            errors[i] = str(e)
+            count_validation_errors(e.errors)
+            continue
+        except ValueError as ve:
+            errors[i] = str(ve)
+            if isinstance(item, dict):
+                count_invalid_categories(record, serving)
+            else:
+                count_validation_error("body")
+            continue
+        rows.append(record)
+        row_indices.append(i)
+    return rows, row_indices, errors
+
+def encode_stream_chunk(items: List[Any], first_index: int, serving: ServingModel) -> bytes:
+    """
+    Score one chunk of /predict/stream rows into NDJSON lines, encoded directly
+    rather than through the pydantic response models
+    """
+    rows, row_indices, errors = validate_rows(items, serving)
+    scored = score_records(rows, serving) if rows else []
+    journal_rows("/predict/stream", rows, scored, serving)
+    predictions = dict(zip(row_indices, scored))
+    lines = []
+    for i in range(len(items)):
+        if i in errors:
+            lines.append(dumps({"index": first_index + i, "error": errors[i]}))
+        else:
+            lines.append(dumps({"index": first_index + i, "predictions": predictions[i]}))
+    lines.append(b"")
+    return b"\n".join(lines)
+
+def predict_record(record: Dict[str, Any], serving: ServingModel, stopwatch=NULL_STOPWATCH) -> List[Dict[str, Any]]:
+    """
+    Top 5 predictions for one decoded /predict row
+    """
+    if serving.feature_builder:
+        processed_data = serving.feature_builder.transform_one(record)
+        stopwatch.lap("transform")
+    else:
+        # Convert the decoded row to a DataFrame
+        import pandas as pd
+        df = pd.DataFrame([record])
+        logger.info("Created dataframe: %s", Lazy(df.to_dict), extra={"category": "payload"})
 
         # Preprocess data
-        processed_data = preprocess_input(df)
+        processed_data = preprocess_input(df, serving, stopwatch)
 
-        # Make prediction
-        probabilities = model.predict_proba(processed_data)[0]
-        
-        # Get top 5 predictions
-        top5_idx = np.argsort(probabilities)[-5:][::-1]
-        crops = y_encoder.inverse_transform(top5_idx)
-        scores = probabilities[top5_idx]
-        
-        logger.info(f"Prediction results: {list(zip(crops, scores))}")
+    # Make prediction
+    probabilities = serving.model.predict_proba(processed_data)[0]
+    stopwatch.lap("predict_proba")
 
-        return [{"crop": crop, "probability": float(score)} 
-                for crop, score in zip(crops, scores)]
-        
+    # Get top 5 predictions
+    top5_idx = np.argsort(probabilities)[-5:][::-1]
+    crops = serving.y_encoder.inverse_transform(top5_idx)
+    scores = probabilities[top5_idx]
+
+    logger.info("Prediction results: %s", Lazy(lambda: list(zip(crops, scores))), extra={"category": "result"})
+
+    result = [{"crop": crop, "probability": float(score)}
+              for crop, score in zip(crops, scores)]
+    stopwatch.lap("topk")
+    return result
+
+def predict_rows(requests: List[Any], serving: ServingModel, stopwatch=NULL_STOPWATCH,
+                 started: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    /predict/batch results: every row validated on its own, the valid ones scored as one matrix
+    """
+    results = [{"index": i, "predictions": None, "error": None} for i in range(len(requests))]
+
+    # Validate every row on its own so one bad row does not fail the batch
+    rows, row_indices, errors = validate_rows(requests, serving)
+    for i, error in errors.items():
+        results[i]["error"] = error
+    stopwatch.lap("validate")
+
+    logger.info("Received batch of %d rows (%d valid)", len(requests), len(rows), extra={"category": "request"})
+    if rows:
+        # Score all valid rows as one matrix
+        scored = score_records(rows, serving, stopwatch)
+        for i, predictions in zip(row_indices, scored):
+            results[i]["predictions"] = predictions
+        journal_rows("/predict/batch", rows, scored, serving, started, stopwatch)
+    return results
+
+def score_micro_batch(items: List[Any]) -> List[Any]:
+    """
+    Score (serving model, record) pairs collected by the micro-batcher;
+    invalid rows get their ValueError back instead of failing the others
+    """
+    results: List[Any] = [None] * len(items)
+    # Requests that straddle a hot reload are scored by the model they started on
+    groups: Dict[int, Any] = {}
+    for i, (serving, record) in enumerate(items):
+        try:
+            if serving.feature_builder:
+                serving.feature_builder.validate(record)
+            else:
+                validate_categories(record, serving)
+        except ValueError as ve:
+            results[i] = ve
+            continue
+        groups.setdefault(id(serving), (serving, []))[1].append(i)
+
+    for serving, indices in groups.values():
+        for i, predictions in zip(indices, score_records([items[i][1] for i in indices], serving)):
+            results[i] = predictions
+    return results
+
+def smoke_test(serving: ServingModel):
+    """
+    Score one synthetic row to check that a newly loaded model works, and
+    warm it up before it takes traffic
+    """
+    record = serving.compiled_features.sample_record()
+    if serving.feature_builder:
+        processed_data = serving.feature_builder.transform([record])
+    else:
+        import pandas as pd
+        processed_data = preprocess_input(pd.DataFrame([record]), serving)
+    probabilities = serving.model.predict_proba(processed_data)
+    if probabilities.shape != (1, len(serving.y_encoder.classes_)):
+        raise ValueError(f"Model returned {probabilities.shape[1]} probabilities for "
+                         f"{len(serving.y_encoder.classes_)} classes")
+    if not np.all(np.isfinite(probabilities)) or abs(float(probabilities.sum()) - 1.0) > 1e-6:
+        raise ValueError("Model returned invalid probabilities")
+    for _ in range(3):
+        score_records([record], serving)
+
+def build_serving_model(bundle) -> ServingModel:
+    serving = ServingModel(bundle)
+    smoke_test(serving)
+    return serving
+
+def on_model_swap(old: ServingModel, new: ServingModel):
+    if prediction_cache:
+        prediction_cache.key_columns = new.feature_names
+        prediction_cache.clear()
+    metrics_registry.gauge("model_info", "Active model version (1 = serving)", version=old.version).set(0)
+    metrics_registry.gauge("model_info", "Active model version (1 = serving)", version=new.version).set(1)
+    metrics_registry.counter("model_reloads_total", "Model reloads and rollbacks by result", result="success").inc()
+
+def on_model_reload_error(error: Exception):
+    metrics_registry.counter("model_reloads_total", "Model reloads and rollbacks by result", result="failed").inc()
+
+startup.mark("imports")
+
+# Load model and encoders (from $MODEL_DIR, default: project root)
+load_started = time.perf_counter()
+try:
+    bundle = get_bundle()
+    reloader = ModelReloader(build_serving_model, bundle=bundle, verify=bundle.verify,
+                             history=int(os.environ.get("MODEL_HISTORY", "2")), on_swap=on_model_swap,
+                             on_error=on_model_reload_error)
+    logger.info(f"Loaded model version {bundle.version} from: {bundle.model_dir}")
+    if reloader.current.feature_builder:
+        logger.info("Fast preprocessing enabled")
+
+    metrics_registry.gauge("model_load_seconds", "Time taken to load the model files at startup").set(
+        time.perf_counter() - load_started)
+    metrics_registry.gauge("model_info", "Active model version (1 = serving)", version=bundle.version).set(1)
+    startup.mark("model_load")
+    
+except Exception as e:
+    logger.error(f"Error loading model files: {str(e)}")
+    raise
+
+# Cache prediction results keyed by model version and input columns (PREDICTION_CACHE_SIZE=0 disables it)
+prediction_cache = None
+if int(os.environ.get("PREDICTION_CACHE_SIZE", "10000")) > 0:
+    prediction_cache = PredictionCache(
+        key_columns=reloader.current.feature_names,
+        maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", "10000")),
+        ttl=float(os.environ.get("PREDICTION_CACHE_TTL", "3600")),
+        precision=int(os.environ.get("PREDICTION_CACHE_PRECISION", "2")),
+        artifact_paths=list(bundle.paths.values()),
+    )
+
+# Watch the manifest for new model versions (MODEL_RELOAD_INTERVAL=0 disables it)
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", "30"))
+if MODEL_RELOAD_INTERVAL > 0:
+    reloader.start_polling(MODEL_RELOAD_INTERVAL)
+
+# Protects /admin/* when set (send it as X-Admin-Token)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Scoring runs on INFERENCE_THREADS threads, off the event loop, with at most INFERENCE_MAX_QUEUE
+# calls waiting; beyond that requests get a 503 with Retry-After (INFERENCE_THREADS=0 scores inline)
+inference_pool = None
+if int(os.environ.get("INFERENCE_THREADS", "2")) > 0:
+    inference_pool = InferencePool(
+        workers=int(os.environ.get("INFERENCE_THREADS", "2")),
+        max_queue=int(os.environ.get("INFERENCE_MAX_QUEUE", "64")),
+        retry_after=int(os.environ.get("INFERENCE_RETRY_AFTER", "1")),
+        registry=metrics_registry,
+    )
+
+async def run_inference(func, *args, **kwargs):
+    """
+    func(*args, **kwargs) on the inference pool, or on the event loop when the pool is off
+    """
+    if inference_pool:
+        return await inference_pool.run(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+# Opt-in micro-batching of concurrent /predict calls (MICRO_BATCH=1)
+micro_batcher = None
+if os.environ.get("MICRO_BATCH", "0") == "1":
+    micro_batcher = MicroBatcher(
+        score_micro_batch,
+        max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "2")),
+        offload=inference_pool.run if inference_pool else None,
+    )
+    logger.info(f"Micro-batching enabled (up to {micro_batcher.max_batch_size} requests or "
+                f"{micro_batcher.max_wait * 1000:.1f} ms)")
+
+# Every answered prediction is journaled to PREDICTION_JOURNAL_DIR (unset: off) by a background
+# writer; the journal is created in lifespan()
+prediction_journal = None
+
+def journal_rows(endpoint: str, records: List[Dict[str, Any]], predictions: List[List[Dict[str, Any]]],
+                 serving: ServingModel, started: Optional[float] = None, stopwatch=NULL_STOPWATCH,
+                 engine: str = "model"):
+    """
+    Queue answered predictions for the prediction journal, if it is on
+    """
+    if prediction_journal:
+        latency_ms = (time.perf_counter() - started) * 1000.0 if started is not None else None
+        prediction_journal.record_many(records, predictions, endpoint, serving.version, engine, latency_ms,
+                                       dict(stopwatch.stages))
+
+# Latency budget for /predict in ms, from the X-Deadline-Ms header or PREDICT_DEADLINE_MS (0: none).
+# Requests the model can't answer within it are answered by direct_prediction's rule engine instead
+PREDICT_DEADLINE_MS = float(os.environ.get("PREDICT_DEADLINE_MS", "0"))
+deadline_fallback = DeadlineFallback(
+    RuleEngine(),
+    reserve_ms=float(os.environ.get("DEADLINE_RESERVE_MS", "2")),
+    estimate_wait=inference_pool.estimated_wait if inference_pool else None,
+    registry=metrics_registry,
+)
+
+def request_budget_ms(request: Request) -> float:
+    value = request.headers.get("x-deadline-ms")
+    try:
+        return float(value) if value else PREDICT_DEADLINE_MS
+    except ValueError:
+        return PREDICT_DEADLINE_MS
+
+async def score_with_model(record: Dict[str, Any], serving: ServingModel, stopwatch=NULL_STOPWATCH):
+    """
+    Top 5 predictions for one row from the model, micro-batched if enabled
+    """
+    if micro_batcher:
+        result = await micro_batcher.submit((serving, record))
+        stopwatch.lap("micro_batch")
+        logger.info("Prediction results: %s", result, extra={"category": "result"})
+        return result
+    return await run_inference(predict_record, record, serving, stopwatch)
+
+@app.post("/predict", responses={200: {"model": List[CropPrediction]}},
+          openapi_extra=request_body_schema(CropRequest.model_json_schema()))
+async def predict(request: Request):
+    started = time.perf_counter()
+    stopwatch = current_stopwatch()
+    serving = reloader.current
+    try:
+        record = serving.codec.decode(await request.body())
+    except RequestDecodeError as e:
+        return decode_error_response(e, serving)
+    stopwatch.lap("decode")
+    # Warm-up requests neither read nor fill the cache
+    cache = None if is_warm_up(request.scope) else prediction_cache
+    try:
+        logger.info("Received prediction request: %s", record, extra={"category": "request"})
+        if cache:
+            cache_key = (serving.version, cache.make_key(record))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                stopwatch.lap("cache")
+                journal_rows("/predict", [record], [cached], serving, started, stopwatch, engine="cache")
+                return json_response(cached, serving)
+
+        budget_ms = request_budget_ms(request)
+        if budget_ms > 0:
+            # Reject bad inputs here, so that only valid rows can be answered by the rule engine
+            if serving.feature_builder:
+                serving.feature_builder.validate(record)
+            else:
+                validate_categories(record, serving)
+            result, degraded = await deadline_fallback.predict(
+                lambda: score_with_model(record, serving, stopwatch), record, budget_ms, started,
+                names=serving.class_names)
+            if degraded:
+                stopwatch.lap("rules")
+                logger.info("Answered from the rule engine (%s): %s", degraded, result, extra={"category": "result"})
+                journal_rows("/predict", [record], [result], serving, started, stopwatch, engine="rules")
+                return json_response(result, serving, headers={"X-Engine": "rules", "X-Degraded": degraded})
+            if cache:
+                cache.put(cache_key, result)
+            journal_rows("/predict", [record], [result], serving, started, stopwatch)
+            return json_response(result, serving, headers={"X-Engine": "model"})
+
+        result = await score_with_model(record, serving, stopwatch)
+        if cache:
+            cache.put(cache_key, result)
+        journal_rows("/predict", [record], [result], serving, started, stopwatch)
+        return json_response(result, serving)
+
+    except Overloaded:
+        raise
     except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}")
+        logger.error("Validation error: %s", ve, extra={"category": "validation"})
+        count_invalid_categories(record, serving)
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/batch", responses={200: {"model": List[BatchPrediction]}},
+          openapi_extra=request_body_schema({"type": "array", "items": CropRequest.model_json_schema()}))
+async def predict_batch(request: Request):
+    started = time.perf_counter()
+    serving = reloader.current
+    body = await request.body()
+    # Decoding and encoding a large batch is CPU work too, so all of it runs on the inference pool
+    return await run_inference(batch_response, body, serving, current_stopwatch(), started)
+
+def batch_response(body: bytes, serving: ServingModel, stopwatch=NULL_STOPWATCH,
+                   started: Optional[float] = None) -> Response:
+    try:
+        requests = RequestCodec.load(body)
+    except RequestDecodeError as e:
+        return decode_error_response(e, serving)
+    if not isinstance(requests, list):
+        return decode_error_response(RequestDecodeError([{"type": "list_type", "loc": ("body",),
+                                                          "msg": "Input should be a valid list"}]), serving)
+    stopwatch.lap("decode")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(requests)} rows (max {MAX_BATCH_SIZE})")
+
+    try:
+        return json_response(predict_rows(requests, serving, stopwatch, started), serving)
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Score a JSON array or NDJSON body of /predict inputs and stream back one
+    NDJSON line per row ({"index", "predictions"} or {"index", "error"}) as
+    each chunk is scored
+    """
+    stopwatch = current_stopwatch()
+    serving = reloader.current
+    body = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > STREAM_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body too large (max {STREAM_MAX_BYTES} bytes)")
+        body.append(chunk)
+    try:
+        reader = JsonItemReader(b"".join(body))
+    except ValueError as ve:
+        count_validation_error("body")
+        raise HTTPException(status_code=400, detail=str(ve))
+    del body
+    stopwatch.lap("decode")
+    logger.info("Streaming predictions for a %d-byte body", size, extra={"category": "request"})
+
+    # Start with small chunks so the first lines go out quickly, then grow to STREAM_CHUNK_SIZE
+    chunk_size = min(64, STREAM_CHUNK_SIZE)
+    # A malformed body found while reading the first chunk, when a 400 can still be sent
+    body_error = None
+
+    def produce() -> Optional[bytes]:
+        nonlocal chunk_size, body_error
+        first_index = reader.count
+        items = reader.read(chunk_size)
+        chunk_size = min(chunk_size * 2, STREAM_CHUNK_SIZE)
+        error, reader.error = reader.error, None
+        if not items and error is None:
+            return None
+        if error is not None:
+            count_validation_error("body")
+            if first_index == 0:
+                body_error = error
+                return None
+        try:
+            out = encode_stream_chunk(items, first_index, serving) if items else b""
+        except Exception as e:
+            logger.error(f"Stream prediction error: {str(e)}")
+            out = b""
+            error = f"Prediction failed: {e}"
+            reader.done = True
+        if error is not None:
+            # The status line has already been sent, so the failure is reported as a final line
+            out += dumps({"index": reader.count, "error": error}) + b"\n"
+        return out
+
+    run_chunk = inference_pool.run if inference_pool else run_in_threadpool
+    # Scored before the response starts, so a full inference queue is still a 503 with Retry-After
+    first = await run_chunk(produce)
+    if body_error is not None:
+        raise HTTPException(status_code=400, detail=body_error)
+
+    async def offload(func):
+        try:
+            return await run_chunk(func)
+        except Overloaded as e:
+            # Too late for a 503; end the stream, telling the client where to resume
+            reader.done = True
+            return dumps({"index": reader.count, "error": f"{e}; retry the rows from this index "
+                                                          f"after {e.retry_after} s"}) + b"\n"
+
+    return StreamingResponse(stream_chunks(produce, STREAM_MAX_PENDING, offload, first),
+                             media_type="application/x-ndjson", headers={"X-Model-Version": serving.version})
+
+@app.post("/amendments")
+async def amendments(body: AmendmentRequest):
+    """
+    Cheapest N/P/K/pH changes that make `target_crop` reach `target_probability`,
+    found by scoring the whole amendment grid in a few predict_proba calls
+    """
+    serving = reloader.current
+    try:
+        base = serving.codec.decode_object(body.soil)
+    except RequestDecodeError as e:
+        return decode_error_response(RequestDecodeError(
+            [{**error, "loc": ("body", "soil", *error["loc"][1:])} for error in e.errors]), serving)
+
+    classes = serving.y_encoder.classes_.tolist()
+    target_index = {crop.lower(): i for i, crop in enumerate(classes)}.get(body.target_crop.strip().lower())
+    if target_index is None:
+        count_validation_error("target_crop")
+        raise HTTPException(status_code=400, detail=f"Unknown crop {body.target_crop!r}. Known crops: {classes}")
+
+    ranges = {}
+    for field, spec in body.amendments.items():
+        column = FIELD_ALIASES.get(field, field)
+        if column not in serving.feature_names or column in serving.allowed_categories:
+            count_validation_error("amendments")
+            raise HTTPException(status_code=400, detail=f"Cannot amend {field!r}; numeric model inputs are "
+                                f"{[col for col in serving.feature_names if col not in serving.allowed_categories]}")
+        ranges[column] = spec.model_dump()
+
+    try:
+        validate_categories(base, serving)
+        result = await run_inference(
+            search_amendments, base, target_index, ranges, lambda columns: transform_columns(columns, serving),
+            serving.model.predict_proba, target_probability=body.target_probability,
+            max_results=body.max_results, max_candidates=AMENDMENT_MAX_CANDIDATES)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    logger.info("Amendment search for %s: %d candidates in %.1f ms", classes[target_index],
+                result["candidates_scored"], result["elapsed_ms"], extra={"category": "request"})
+    return json_response({"target_crop": classes[target_index], **result}, serving)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    count_validation_errors(exc.errors())
+    return await request_validation_exception_handler(request, exc)
+
+@app.get("/metrics")
+def metrics():
+    if not metrics_registry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+class ReloadRequest(BaseModel):
+    model_dir: Optional[str] = None
+
+def check_admin_token(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/model")
+def admin_model():
+    return {**reloader.status(), "classes": reloader.current.bundle.classes,
+            "features": reloader.current.feature_names}
+
+@app.post("/admin/reload")
+async def admin_reload(body: Optional[ReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        # Load and smoke-test off the event loop; requests keep using the current model meanwhile
+        return await run_in_threadpool(reloader.reload, body.model_dir if body else None)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Reload failed, still serving {reloader.current.version}: {e}")
+
+@app.post("/admin/rollback")
+async def admin_rollback(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        return reloader.rollback()
+    except ValueError as ve:
+        raise HTTPException(status_code=409, detail=str(ve))
+
+@app.get("/cache/stats")
+def cache_stats():
+    if not prediction_cache:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.get("/inference/stats")
+def inference_stats():
+    if not inference_pool:
+        return {"enabled": False}
+    return {"enabled": True, **inference_pool.stats()}
+
+@app.get("/deadline/stats")
+def deadline_stats():
+    return {"default_budget_ms": PREDICT_DEADLINE_MS, **deadline_fallback.stats()}
+
+@app.get("/journal/stats")
+def journal_stats():
+    if not prediction_journal:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_journal.stats()}
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    if not micro_batcher:
+        return {"enabled": False}
+    return {"enabled": True, **micro_batcher.stats()}
+
+@app.get("/ready")
+def ready():
+    """
+    200 once the warm-up requests have succeeded, 503 before that or if they failed
+    """
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
 @app.get("/")
 def read_root():
     logger.info("Root endpoint accessed")
     return {"message": "Crop Recommendation API - Send POST requests to /predict"}
 
 if __name__ == "__main__":
-    logger.info("Starting FastAPI server on http://127.0.0.1:8000")
+    import uvicorn
+    logger.info(f"Starting FastAPI server on {describe()}")
     try:
-        uvicorn.run(app, host="127.0.0.1", port=8000)
+        uvicorn.run(app, **uvicorn_bind())
     except Exception as e:
         logger.error(f"Error starting server: {str(e)}")
         raise 
\ No newline at end of file
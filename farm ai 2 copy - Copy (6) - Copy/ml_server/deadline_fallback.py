@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from inference_pool import Overloaded
+from metrics import NULL_METRIC, Histogram, Registry
+from rule_engine import RuleEngine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MS_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+ENGINES = ["model", "rules"]
+# Why a request was answered by the rule engine
+REASONS = ["queue", "timeout", "overloaded", "error"]
+
+
+class DeadlineFallback:
+    """
+    Answer a request within its latency budget, from the model if it can
+    and from the precompiled rule engine if it can't.
+
+    The model gets the budget minus `reserve_ms`, which is kept back for the
+    rule engine and the response. The rule engine answers instead when:
+
+    - queue: the inference queue is already longer than the budget allows
+      (from `estimate_wait`), so the model isn't tried at all
+    - timeout: the model hasn't answered in time (a slow call, or one
+      slowed down by a model reload)
+    - overloaded: the inference pool turned the call away
+    - error: the model raised anything other than a ValueError; ValueError
+      means a bad input and is raised as before
+
+    A model call that times out while still queued is cancelled; one that
+    has already started finishes in the background.
+    """
+
+    def __init__(self, rule_engine: RuleEngine, reserve_ms: float = 2.0,
+                 estimate_wait: Optional[Callable[[], float]] = None, registry: Optional[Registry] = None):
+        self.rule_engine = rule_engine
+        self.reserve = reserve_ms / 1000.0
+        self.estimate_wait = estimate_wait
+        self.latency_ms = {engine: Histogram(LATENCY_MS_BUCKETS) for engine in ENGINES}
+        self.fallbacks = dict.fromkeys(REASONS, 0)
+
+        def metric(kind, name, help_text, **labels):
+            return getattr(registry, kind)(name, help_text, **labels) if registry else NULL_METRIC
+        self._answered = {engine: metric("counter", "deadline_predictions_total",
+                                         "Requests with a latency budget, by the engine that answered", engine=engine)
+                          for engine in ENGINES}
+        self._fallback_counters = {reason: metric("counter", "deadline_fallbacks_total",
+                                                  "Requests answered by the rule engine, by reason", reason=reason)
+                                   for reason in REASONS}
+        self._latency = {engine: metric("histogram", "deadline_engine_seconds",
+                                        "Time each engine took to answer a request with a latency budget",
+                                        engine=engine)
+                         for engine in ENGINES}
+
+    async def predict(self, score: Callable[[], Awaitable[Any]], record: Dict[str, Any], budget_ms: float,
+                      started: float, names: Optional[Dict[str, str]] = None, k: int = 5) -> Tuple[Any, Optional[str]]:
+        """
+        (predictions, None) from the model, or (predictions, reason) from the rule
+        engine. `started` is the perf_counter() time the request arrived; `names`
+        maps lowercased rule engine crops to the model's class names.
+        """
+        remaining = budget_ms / 1000.0 - (time.perf_counter() - started) - self.reserve
+        if remaining <= 0 or (self.estimate_wait and self.estimate_wait() > remaining):
+            return self.fall_back(record, "queue", names, k)
+
+        model_started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(score(), remaining)
+        except asyncio.TimeoutError:
+            return self.fall_back(record, "timeout", names, k)
+        except Overloaded:
+            return self.fall_back(record, "overloaded", names, k)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Model failed, answering from the rule engine: {e}")
+            return self.fall_back(record, "error", names, k)
+        self._observe("model", time.perf_counter() - model_started)
+        return result, None
+
+    def fall_back(self, record: Dict[str, Any], reason: str, names: Optional[Dict[str, str]] = None,
+                  k: int = 5) -> Tuple[List[Dict[str, Any]], str]:
+        started = time.perf_counter()
+        result = self.rule_engine.predict_records([record], k=k)[0]
+        if names:
+            for prediction in result:
+                prediction["crop"] = names.get(prediction["crop"].lower(), prediction["crop"])
+        self._observe("rules", time.perf_counter() - started)
+        self.fallbacks[reason] += 1
+        self._fallback_counters[reason].inc()
+        return result, reason
+
+    def _observe(self, engine: str, seconds: float):
+        self.latency_ms[engine].observe(seconds * 1000.0)
+        self._latency[engine].observe(seconds)
+        self._answered[engine].inc()
+
+    def stats(self):
+        answered = {engine: histogram.count for engine, histogram in self.latency_ms.items()}
+        total = sum(answered.values())
+        return {
+            "answered": answered,
+            "fallback_rate": answered["rules"] / total if total else 0.0,
+            "fallbacks": dict(self.fallbacks),
+            "latency_ms": {engine: histogram.snapshot() for engine, histogram in self.latency_ms.items()},
+        }
@@ -0,0 +1,128 @@
+"""
+Export the pickled model files into a scikit-learn free artifact.
+
+    python export_model.py                # writes ../crop_model/
+    python export_model.py --check        # also verify parity with sklearn
+
+The artifact directory holds manifest.json (format version, feature spec,
+category vocabularies, scaler parameters, class labels) and the LogReg
+weights as coef.npy / intercept.npy. Load it with lite_model.LiteModel.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from feature_builder import FeatureBuilder
+from lite_model import ARTIFACT_FORMAT, ARTIFACT_VERSION, DEFAULT_ARTIFACT_DIR, LiteModel
+from model_registry import ARTIFACT_FILES, DEFAULT_MODEL_DIR, ModelBundle, file_sha256, version_from_checksums
+
+
+def multi_class_mode(model):
+    """
+    Mirror LogisticRegression.predict_proba's choice between OvR and softmax
+    """
+    multi_class = getattr(model, "multi_class", "auto")
+    if multi_class in ("ovr", "warn"):
+        return "ovr"
+    if multi_class in ("auto", "deprecated") and (
+        model.classes_.size <= 2 or model.solver in ("liblinear", "newton-cholesky")
+    ):
+        return "ovr"
+    return "multinomial"
+
+
+def export(model_dir, output_dir):
+    bundle = ModelBundle(model_dir)
+    model = bundle.model
+    label_encoders = bundle.label_encoders
+    column_transformer = bundle.column_transformer
+    y_encoder = bundle.y_encoder
+
+    if type(model).__name__ != "LogisticRegression":
+        raise ValueError(f"Only LogisticRegression models can be exported, got {type(model).__name__}")
+
+    feature_builder = FeatureBuilder.from_sklearn(label_encoders, column_transformer)
+    checksums = {ARTIFACT_FILES[name]: file_sha256(path) for name, path in bundle.paths.items()}
+
+    import sklearn
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "format_version": ARTIFACT_VERSION,
+        "model_version": version_from_checksums(checksums),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sklearn_version": sklearn.__version__,
+        "source_checksums": checksums,
+        "multi_class": multi_class_mode(model),
+        # Probability columns follow model.classes_, decoded with the y encoder
+        "classes": y_encoder.inverse_transform(model.classes_).tolist(),
+        "features": feature_builder.to_spec(),
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, "coef.npy"), np.ascontiguousarray(model.coef_, dtype=np.float64))
+    np.save(os.path.join(output_dir, "intercept.npy"), np.ascontiguousarray(model.intercept_, dtype=np.float64))
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return model, label_encoders, column_transformer
+
+
+def check_parity(model, label_encoders, column_transformer, output_dir, rows=2000, seed=0):
+    """
+    Compare LiteModel against sklearn predict_proba on random rows
+    """
+    import pandas as pd
+
+    lite = LiteModel.load(output_dir)
+    rng = np.random.default_rng(seed)
+    spec = lite.feature_builder.to_spec()
+
+    # Random values for every input column, drawn from the known categories
+    columns = {}
+    categorical = dict(spec["label_encoders"])
+    for block in spec["blocks"]:
+        if block["type"] == "onehot":
+            for col, categories in zip(block["columns"], block["categories"]):
+                categorical.setdefault(col, categories)
+    for col in spec["input_columns"]:
+        if col in categorical:
+            columns[col] = [categorical[col][i] for i in rng.integers(0, len(categorical[col]), rows)]
+        else:
+            columns[col] = rng.uniform(0, 300, rows)
+
+    data = pd.DataFrame(columns)
+    for col, encoder in label_encoders.items():
+        if col in data.columns:
+            data[col] = encoder.transform(data[col])
+    expected = model.predict_proba(column_transformer.transform(data))
+    actual = lite.predict_proba(lite.feature_builder.transform_columns(columns))
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    exact = bool(np.array_equal(expected, actual))
+    print(f"Parity check on {rows} rows: max abs difference {max_diff:.3g} ({'identical' if exact else 'not identical'})")
+    # The softmax path is the same arithmetic as sklearn; OvR uses np.exp instead of scipy's expit
+    return exact if lite.multi_class == "multinomial" else max_diff < 1e-12
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="directory with the .pkl files")
+    parser.add_argument("--output", default=DEFAULT_ARTIFACT_DIR, help="artifact directory to write")
+    parser.add_argument("--check", action="store_true", help="verify predictions against sklearn")
+    parser.add_argument("--rows", type=int, default=2000, help="number of random rows for --check")
+    args = parser.parse_args()
+
+    model, label_encoders, column_transformer = export(args.model_dir, args.output)
+    print(f"Exported model to {args.output}")
+
+    if args.check and not check_parity(model, label_encoders, column_transformer, args.output, rows=args.rows):
+        print("Parity check failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+class Coded:
+    """
+    A categorical column given as integer codes into `categories`, e.g. a
+    raster index layer and its legend. transform_columns() looks up each
+    category once instead of once per row.
+    """
+
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes: Sequence[int], categories: Sequence[Any]):
+        self.codes = np.asarray(codes, dtype=np.intp)
+        self.categories = list(categories)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def values(self) -> np.ndarray:
+        return np.array(self.categories, dtype=object)[self.codes]
+
+
+class FeatureBuilder:
+    """
+    Plain NumPy replacement for the label encoders + column transformer.
+
+    The fitted encoders are compiled once into dict lookups and column
+    offsets, so a request row is written straight into a feature buffer
+    without building a DataFrame. The output matches
+    column_transformer.transform() exactly.
+
+    The compiled form is a JSON-friendly spec (see to_spec), so it can be
+    stored next to exported model weights and loaded without scikit-learn.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.input_columns: List[str] = list(spec["input_columns"])
+        self.n_features: int = int(spec["n_features"])
+
+        # Label encoders map a raw value to its integer code
+        self.label_lookups: Dict[str, Dict[Any, int]] = {
+            col: {value: i for i, value in enumerate(classes)}
+            for col, classes in spec.get("label_encoders", {}).items()
+        }
+        self.label_classes: Dict[str, List[Any]] = {
+            col: list(classes) for col, classes in spec.get("label_encoders", {}).items()
+        }
+
+        # (column, output index, mean, scale) for every numeric output
+        self.numeric_ops = []
+        # (column, position in its encoder, output offset, lookup, categories, ignore unknown)
+        self.onehot_ops = []
+        for block in spec["blocks"]:
+            offset = block["offset"]
+            if block["type"] == "onehot":
+                for position, (col, categories) in enumerate(zip(block["columns"], block["categories"])):
+                    # Compose the label encoder (if any) with the one-hot position
+                    if col in self.label_lookups:
+                        lookup = {value: categories.index(code)
+                                  for value, code in self.label_lookups[col].items() if code in categories}
+                    else:
+                        lookup = {value: i for i, value in enumerate(categories)}
+                    self.onehot_ops.append((col, position, offset, lookup, list(categories),
+                                            block.get("handle_unknown") == "ignore"))
+                    offset += len(categories)
+            elif block["type"] in ("passthrough", "scale"):
+                means = block.get("mean") or [0.0] * len(block["columns"])
+                scales = block.get("scale") or [1.0] * len(block["columns"])
+                for i, col in enumerate(block["columns"]):
+                    self.numeric_ops.append((col, offset + i, means[i], scales[i]))
+            else:
+                raise ValueError(f"Unknown feature block type: {block['type']}")
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "FeatureBuilder":
+        return cls(spec)
+
+    @classmethod
+    def from_sklearn(cls, label_encoders, column_transformer) -> "FeatureBuilder":
+        """
+        Compile fitted label encoders and a ColumnTransformer.
+
+        Raises NotImplementedError for transformers this builder can't
+        reproduce exactly.
+        """
+        if column_transformer is None:
+            raise NotImplementedError("No column transformer to compile")
+        if getattr(column_transformer, "sparse_output_", False):
+            raise NotImplementedError("Sparse column transformer output is not supported")
+
+        input_columns = [str(col) for col in column_transformer.feature_names_in_]
+        blocks = []
+        for name, transformer, columns in column_transformer.transformers_:
+            if isinstance(transformer, str) and transformer == "drop":
+                continue
+            output = column_transformer.output_indices_[name]
+            if output.stop == output.start:
+                continue
+            if isinstance(columns, (list, tuple)) and columns and all(isinstance(c, str) for c in columns):
+                names = list(columns)
+            else:
+                names = [input_columns[i] for i in np.arange(len(input_columns))[columns]]
+            block = {"columns": names, "offset": output.start}
+            kind = type(transformer).__name__
+
+            if isinstance(transformer, str) and transformer == "passthrough":
+                block["type"] = "passthrough"
+            elif kind == "FunctionTransformer" and transformer.func is None:
+                block["type"] = "passthrough"
+            elif kind == "OneHotEncoder":
+                if transformer.drop_idx_ is not None:
+                    raise NotImplementedError("OneHotEncoder with drop is not supported")
+                if transformer.handle_unknown not in ("error", "ignore"):
+                    raise NotImplementedError(f"OneHotEncoder handle_unknown={transformer.handle_unknown!r} is not supported")
+                if getattr(transformer, "_infrequent_enabled", False):
+                    raise NotImplementedError("OneHotEncoder infrequent categories are not supported")
+                block["type"] = "onehot"
+                block["categories"] = [categories.tolist() for categories in transformer.categories_]
+                block["handle_unknown"] = transformer.handle_unknown
+            elif kind == "StandardScaler":
+                block["type"] = "scale"
+                block["mean"] = transformer.mean_.tolist() if transformer.with_mean else None
+                block["scale"] = transformer.scale_.tolist() if transformer.with_std else None
+            else:
+                raise NotImplementedError(f"Transformer {name!r} ({kind}) is not supported")
+            blocks.append(block)
+
+        spec = {
+            "input_columns": input_columns,
+            "label_encoders": {col: encoder.classes_.tolist() for col, encoder in (label_encoders or {}).items()},
+            "blocks": blocks,
+            "n_features": sum(column_transformer.output_indices_[name].stop - column_transformer.output_indices_[name].start
+                              for name, _, _ in column_transformer.transformers_),
+        }
+        return cls(spec)
+
+    def to_spec(self) -> Dict[str, Any]:
+        return self.spec
+
+    def sample_record(self, normalize: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+        """
+        A valid input row (first category of each categorical column, 1.0
+        elsewhere) for warm-up and smoke tests. With `normalize`, categories
+        it would change are avoided where possible, so the row also survives
+        a RequestCodec round trip.
+        """
+        def first(values):
+            return min(values, key=lambda value: (bool(normalize) and normalize(value) != value, value))
+        categories = self.categories()
+        return {col: first(categories[col]) if col in categories else 1.0 for col in self.input_columns}
+
+    def categories(self) -> Dict[str, List[Any]]:
+        """
+        Accepted values of every categorical input column
+        """
+        categories = {col: list(classes) for col, classes in self.label_classes.items()}
+        for col, _, _, lookup, _, _ in self.onehot_ops:
+            categories.setdefault(col, list(lookup))
+        return categories
+
+    def _label_encode(self, col: str, value):
+        lookup = self.label_lookups.get(col)
+        if lookup is None:
+            return value
+        try:
+            return lookup[value]
+        except (KeyError, TypeError):
+            invalid = np.array([value], dtype=object)
+            raise ValueError(f"Invalid {col} value(s): {invalid}. Allowed values: {self.label_classes[col]}")
+
+    def _onehot_position(self, col, position, lookup, value, ignore_unknown):
+        index = lookup.get(value) if isinstance(value, (str, int, float)) else None
+        if index is None and not ignore_unknown:
+            raise ValueError(f"Found unknown categories {[value]} in column {position} during transform")
+        return index
+
+    def validate(self, record: Mapping[str, Any]):
+        """
+        Raise ValueError if the record would be rejected by transform()
+        """
+        for col in self.input_columns:
+            if col not in record:
+                raise ValueError(f"columns are missing: {{{col!r}}}")
+        for col in self.label_lookups:
+            if col in record:
+                self._label_encode(col, record[col])
+        for col, position, _, lookup, _, ignore_unknown in self.onehot_ops:
+            self._onehot_position(col, position, lookup, record[col], ignore_unknown)
+
+    def _fill_row(self, row: np.ndarray, record: Mapping[str, Any]):
+        # Label encoding runs first, like the pandas path
+        encoded = {col: self._label_encode(col, record[col]) for col in self.label_lookups if col in record}
+        for col, position, offset, lookup, _, ignore_unknown in self.onehot_ops:
+            # One-hot lookups already go through the label encoder, if any
+            index = self._onehot_position(col, position, lookup, record[col], ignore_unknown)
+            if index is not None:
+                row[offset + index] = 1.0
+        for col, out, mean, scale in self.numeric_ops:
+            value = encoded.get(col, record[col])
+            row[out] = (float(value) - mean) / scale
+
+    def transform_one(self, record: Mapping[str, Any]) -> np.ndarray:
+        """
+        Build a (1, n_features) matrix for one row.
+
+        The returned array is a per-thread buffer that is reused by the next
+        call, so use it (e.g. predict_proba) before building another row.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.zeros((1, self.n_features), dtype=np.float64)
+        else:
+            buffer.fill(0.0)
+        missing = [col for col in self.input_columns if col not in record]
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+        self._fill_row(buffer[0], record)
+        return buffer
+
+    def transform(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """
+        Build an (n, n_features) matrix from a list of row dicts
+        """
+        columns = {}
+        for col in self.input_columns:
+            try:
+                columns[col] = [record[col] for record in records]
+            except KeyError:
+                raise ValueError(f"columns are missing: {{{col!r}}}")
+        return self.transform_columns(columns)
+
+    def transform_columns(self, columns: Mapping[str, Sequence[Any]]) -> np.ndarray:
+        """
+        Build an (n, n_features) matrix from column arrays; categorical
+        columns may also be passed as Coded
+        """
+        missing = [col for col in self.input_columns if col not in columns]
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+        n = len(columns[self.input_columns[0]])
+        out = np.zeros((n, self.n_features), dtype=np.float64)
+        rows = np.arange(n)
+
+        encoded = {}
+        for col, lookup in self.label_lookups.items():
+            if col in columns:
+                values = columns[col]
+                if isinstance(values, Coded):
+                    table = np.array([lookup.get(value, -1) for value in values.categories], dtype=np.intp)
+                    codes = table[values.codes]
+                    if (codes < 0).any():
+                        invalid = np.unique(values.values()[codes < 0])
+                        raise ValueError(f"Invalid {col} value(s): {invalid}. Allowed values: {self.label_classes[col]}")
+                    encoded[col] = codes
+                    continue
+                codes = [lookup.get(value) for value in values]
+                if None in codes:
+                    invalid = np.unique(np.array([v for v, c in zip(values, codes) if c is None], dtype=object))
+                    raise ValueError(f"Invalid {col} value(s): {invalid}. Allowed values: {self.label_classes[col]}")
+                encoded[col] = codes
+
+        for col, position, offset, lookup, _, ignore_unknown in self.onehot_ops:
+            values = columns[col]
+            if isinstance(values, Coded):
+                table = np.array([lookup.get(value, -1) for value in values.categories], dtype=np.intp)
+                index = table[values.codes]
+            else:
+                index = np.fromiter((lookup.get(value, -1) for value in values), dtype=np.intp, count=n)
+            known = index >= 0
+            if not known.all():
+                if not ignore_unknown:
+                    if isinstance(values, Coded):
+                        values = values.values()
+                    unknown = [value for value, ok in zip(values, known) if not ok]
+                    raise ValueError(f"Found unknown categories {list(dict.fromkeys(unknown))} in column {position} during transform")
+                out[rows[known], offset + index[known]] = 1.0
+            else:
+                out[rows, offset + index] = 1.0
+
+        for col, out_index, mean, scale in self.numeric_ops:
+            values = encoded.get(col, columns[col])
+            out[:, out_index] = (np.asarray(values, dtype=np.float64) - mean) / scale
+
+        return out
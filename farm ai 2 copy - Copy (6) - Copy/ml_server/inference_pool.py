@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import NULL_METRIC, Histogram, Registry
+
+QUEUE_WAIT_MS_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+# Weight of the latest call in the moving average of call durations
+SERVICE_TIME_SMOOTHING = 0.1
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing a call when the pool's queue is full
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy, retry later")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """
+    Run blocking scoring calls on a fixed set of threads, so the event loop
+    stays free to accept connections and answer cheap endpoints.
+
+    At most `workers` calls run at once and at most `max_queue` more wait
+    for a thread. A call beyond that raises Overloaded straight away
+    instead of joining the queue, so under a burst the wait for a thread is
+    bounded by the queue length rather than growing without limit.
+    Context variables (e.g. the request's stopwatch) are carried into the
+    worker thread.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64, retry_after: int = 1,
+                 registry: Optional[Registry] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.in_flight = 0  # admitted and not finished: running + queued
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.service_time = 0.0  # moving average of call durations, seconds
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._lock = threading.Lock()
+
+        def metric(kind, name, help_text):
+            return getattr(registry, kind)(name, help_text) if registry else NULL_METRIC
+        self._queued_gauge = metric("gauge", "inference_queue_depth", "Scoring calls waiting for an inference thread")
+        self._running_gauge = metric("gauge", "inference_running", "Scoring calls running on an inference thread")
+        self._rejected_counter = metric("counter", "inference_rejected_total",
+                                        "Scoring calls rejected because the inference queue was full")
+        self._wait_histogram = metric("histogram", "inference_queue_wait_seconds",
+                                      "Time scoring calls waited for an inference thread")
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                self._rejected_counter.inc()
+                raise Overloaded(self.retry_after)
+            self.in_flight += 1
+            self._update_gauges()
+        future = self.executor.submit(self._call, contextvars.copy_context(), time.perf_counter(),
+                                      func, args, kwargs)
+        # Also runs when a queued call is cancelled because its client went away
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _call(self, context, enqueued, func, args, kwargs):
+        waited = time.perf_counter() - enqueued
+        self.queue_wait_ms.observe(waited * 1000.0)
+        self._wait_histogram.observe(waited)
+        with self._lock:
+            self.running += 1
+            self._update_gauges()
+        started = time.perf_counter()
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                self.service_time += SERVICE_TIME_SMOOTHING * (elapsed - self.service_time)
+
+    def _finished(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self._update_gauges()
+
+    def estimated_wait(self) -> float:
+        """
+        Roughly how long a call submitted now would wait for a thread, in seconds
+        """
+        with self._lock:
+            if self.in_flight < self.workers:
+                return 0.0
+            return (self.in_flight - self.workers + 1) / self.workers * self.service_time
+
+    def _update_gauges(self):
+        self._queued_gauge.set(self.in_flight - self.running)
+        self._running_gauge.set(self.running)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.in_flight - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "service_time_ms": self.service_time * 1000.0,
+                "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            }
@@ -0,0 +1,86 @@
+"""
+Where the Python servers listen, from the environment.
+
+    uvicorn.run(app, **uvicorn_bind())
+    logger.info(f"Starting server on {describe()}")
+
+ML_SERVER_SOCKET=/tmp/farm-ml.sock makes a server listen on that Unix
+domain socket instead of TCP. Otherwise ML_SERVER_HOST / ML_SERVER_PORT
+(default 127.0.0.1:8000) are used. ML_SERVER_KEEP_ALIVE is how long an
+idle keep-alive connection is held open, in seconds; it is longer than
+uvicorn's default of 5s so that clients holding a connection pool (see
+lib/ml-client.ts) rarely have to reconnect.
+"""
+import os
+import socket
+import stat
+from typing import Any, Dict, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_KEEP_ALIVE = 65
+
+
+def socket_path() -> Optional[str]:
+    return os.environ.get("ML_SERVER_SOCKET") or None
+
+
+def host_port():
+    return os.environ.get("ML_SERVER_HOST", DEFAULT_HOST), int(os.environ.get("ML_SERVER_PORT", DEFAULT_PORT))
+
+
+def keep_alive() -> int:
+    return int(os.environ.get("ML_SERVER_KEEP_ALIVE", DEFAULT_KEEP_ALIVE))
+
+
+def describe() -> str:
+    path = socket_path()
+    if path:
+        return f"unix:{path}"
+    host, port = host_port()
+    return f"http://{host}:{port}"
+
+
+def uvicorn_bind() -> Dict[str, Any]:
+    """
+    Keyword arguments for uvicorn.run / uvicorn.Config
+    """
+    path = socket_path()
+    if path:
+        remove_stale_socket(path)
+        return {"uds": path, "timeout_keep_alive": keep_alive()}
+    host, port = host_port()
+    return {"host": host, "port": port, "timeout_keep_alive": keep_alive()}
+
+
+def remove_stale_socket(path: str):
+    """
+    Delete a socket file left behind by a server that didn't shut down
+    cleanly; refuses to touch anything that isn't a socket, or a socket
+    another server is still accepting on
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another server is already listening on {path}")
+
+
+def bind_unix_socket(path: str, backlog: int = 2048) -> socket.socket:
+    remove_stale_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    # Same permissions uvicorn gives its own Unix sockets
+    os.chmod(path, 0o666)
+    sock.listen(backlog)
+    return sock
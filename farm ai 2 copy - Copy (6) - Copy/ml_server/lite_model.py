@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from feature_builder import FeatureBuilder
+
+ARTIFACT_FORMAT = "farm-ai-logreg"
+ARTIFACT_VERSION = 1
+
+# Default location of the exported model (see export_model.py)
+DEFAULT_ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crop_model")
+
+
+class LiteModel:
+    """
+    NumPy-only crop model loaded from an exported artifact directory.
+
+    The artifact holds manifest.json (feature spec, class labels, metadata)
+    plus coef.npy and intercept.npy, which are memory-mapped. Predictions
+    are identical to LogisticRegression.predict_proba on the same rows.
+    """
+
+    def __init__(self, manifest: Dict[str, Any], coef: np.ndarray, intercept: np.ndarray):
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Not a {ARTIFACT_FORMAT} artifact: {manifest.get('format')!r}")
+        if manifest.get("format_version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported artifact version {manifest.get('format_version')} (expected {ARTIFACT_VERSION})")
+
+        self.manifest = manifest
+        self.coef = coef
+        self.intercept = intercept
+        self.multi_class = manifest["multi_class"]
+        self.classes = np.array(manifest["classes"], dtype=object)
+        self.feature_builder = FeatureBuilder.from_spec(manifest["features"])
+        if coef.shape[1] != self.feature_builder.n_features:
+            raise ValueError(f"Artifact has {coef.shape[1]} coefficients per class but "
+                             f"{self.feature_builder.n_features} features")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ARTIFACT_DIR, mmap: bool = True) -> "LiteModel":
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        mmap_mode = "r" if mmap else None
+        coef = np.load(os.path.join(path, "coef.npy"), mmap_mode=mmap_mode)
+        intercept = np.load(os.path.join(path, "intercept.npy"), mmap_mode=mmap_mode)
+        return cls(manifest, coef, intercept)
+
+    @property
+    def version(self) -> str:
+        return self.manifest.get("model_version", "unknown")
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        scores = X @ self.coef.T + self.intercept
+        return scores.reshape(-1) if scores.shape[1] == 1 else scores
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Same arithmetic as sklearn's LogisticRegression.predict_proba
+        """
+        decision = self.decision_function(X)
+        if self.multi_class == "ovr":
+            prob = 1.0 / (1.0 + np.exp(-decision))
+            if prob.ndim == 1:
+                return np.vstack([1 - prob, prob]).T
+            prob /= prob.sum(axis=1).reshape((prob.shape[0], -1))
+            return prob
+
+        if decision.ndim == 1:
+            decision = np.c_[-decision, decision]
+        decision -= np.max(decision, axis=1).reshape((-1, 1))
+        np.exp(decision, out=decision)
+        decision /= np.sum(decision, axis=1).reshape((-1, 1))
+        return decision
+
+    def transform(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        return self.feature_builder.transform(records)
+
+    def top_k(self, probabilities: np.ndarray, k: int = 5) -> np.ndarray:
+        """
+        Indices of the k most probable classes for every row, best first
+        """
+        k = min(k, probabilities.shape[1])
+        idx = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(probabilities, idx, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(idx, order, axis=1)
+
+    def predict_records(self, records: Sequence[Mapping[str, Any]], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k crops with probabilities for every record
+        """
+        probabilities = self.predict_proba(self.transform(records))
+        top_idx = self.top_k(probabilities, k)
+        scores = np.take_along_axis(probabilities, top_idx, axis=1)
+        return [[{"crop": crop, "probability": score} for crop, score in zip(row_crops, row_scores)]
+                for row_crops, row_scores in zip(self.classes[top_idx].tolist(), scores.tolist())]
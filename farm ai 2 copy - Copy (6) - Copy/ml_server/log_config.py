@@ -0,0 +1,133 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class Lazy:
+    """
+    Defer building an expensive log argument until the record is emitted:
+
+        logger.info("Created dataframe: %s", Lazy(df.to_dict), extra={"category": "payload"})
+    """
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    __repr__ = __str__
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records of each category.
+
+    The category comes from `extra={"category": ...}`; records without one
+    are always kept. A rate of 0 drops the category, 1 keeps all of it.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "category", None), 1.0)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse "request=0.01,payload=0,result=0.1"
+    """
+    rates = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            category, rate = item.split("=", 1)
+            rates[category.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(level=logging.INFO, fmt: str = DEFAULT_FORMAT, sample_rates: Optional[Dict[str, float]] = None,
+                      stream=None) -> QueueListener:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Request handlers only pay for the level check, the sampling decision
+    and formatting of the records that are kept; the write to stdout happens
+    on the listener thread. Sample rates default to $LOG_SAMPLE_RATES.
+    """
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES"))
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(fmt))
+
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    state = {"listener": QueueListener(queue_handler.queue, handler, respect_handler_level=True)}
+    state["listener"].start()
+
+    def stop():
+        state["listener"].stop()
+
+    def restart_in_child():
+        # The listener thread does not survive fork(); give the child its own
+        new_queue = queue.SimpleQueue()
+        queue_handler.queue = new_queue
+        state["listener"] = QueueListener(new_queue, handler, respect_handler_level=True)
+        state["listener"].start()
+
+    atexit.register(stop)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=restart_in_child)
+    return state["listener"]
+
+
+class BufferedLogWriter:
+    """
+    Append-only text log for CLI scripts.
+
+    The file is opened once with a large buffer instead of once per line;
+    call flush() at natural boundaries (e.g. after each request). Buffered
+    lines are written out at interpreter exit.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 64 * 1024):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._file = None
+
+    def write(self, message: str):
+        if self._file is None:
+            self._file = open(self.path, "a", buffering=self.buffer_size)
+            atexit.register(self.close)
+        self._file.write(message)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,10 +1,14 @@
+# Created first so that GET /ready can report how long the imports below took
+from startup import Startup
+startup = Startup()
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import pickle
-import uvicorn
-from pathlib import Path
-import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
+from model_registry import get_bundle
+
+startup.mark("imports")
 
 app = FastAPI()
 
@@ -17,26 +21,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load models at startup
+# Load models at startup (from $MODEL_DIR, default: project root)
 try:
-    base_path = Path("models")
-    
-    with open(base_path / "LogReg.pkl", "rb") as f:
-        model = pickle.load(f)
-    
-    with open(base_path / "column_transformer.pkl", "rb") as f:
-        column_transformer = pickle.load(f)
-    
-    with open(base_path / "label_encoders.pkl", "rb") as f:
-        label_encoders = pickle.load(f)
-    
-    with open(base_path / "y_encoder.pkl", "rb") as f:
-        y_encoder = pickle.load(f)
+    bundle = get_bundle()
+    model = bundle.model
+    column_transformer = bundle.column_transformer
+    label_encoders = bundle.label_encoders
+    y_encoder = bundle.y_encoder
+    startup.mark("model_load")
         
 except Exception as e:
     print(f"Error loading models: {str(e)}")
     raise
 
+# Score a synthetic row before serving; GET /ready reports 503 if it fails
+startup.warm_up(bundle.warm_up)
+
 class PredictionInput(BaseModel):
     N: float
     P: float
@@ -76,5 +76,10 @@ async def predict(data: PredictionInput):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ready")
+def ready():
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
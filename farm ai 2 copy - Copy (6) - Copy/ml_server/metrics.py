@@ -0,0 +1,269 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, Sequence
+
+from startup import is_warm_up
+
+# Seconds; covers the ~10 µs NumPy stages up to slow pandas requests
+LATENCY_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; bucket bounds are inclusive upper limits
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            buckets["+Inf"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "buckets": buckets,
+            }
+
+    def samples(self, name: str, labels: str):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ["+Inf"], counts):
+            cumulative += bucket_count
+            bucket_labels = _join_labels(labels, f'le="{bound}"')
+            yield f"{name}_bucket{{{bucket_labels}}} {cumulative}"
+        yield f"{name}_sum{_braces(labels)} {total}"
+        yield f"{name}_count{_braces(labels)} {count}"
+
+
+class Counter:
+    """
+    Monotonic counter
+    """
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str):
+        yield f"{name}{_braces(labels)} {self.value}"
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down
+    """
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _NullMetric:
+    """
+    Stands in for every metric when metrics are switched off
+    """
+
+    def inc(self, amount: float = 1.0):
+        pass
+
+    def dec(self, amount: float = 1.0):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _join_labels(*parts: str) -> str:
+    return ",".join(part for part in parts if part)
+
+
+def _braces(labels: str) -> str:
+    return f"{{{labels}}}" if labels else ""
+
+
+class Registry:
+    """
+    Named metrics with labels, rendered in the Prometheus text format.
+
+    Metrics are created on first use, e.g.
+    `registry.counter("validation_errors_total", "...", field="ph").inc()`.
+    A disabled registry hands out no-op metrics, so call sites don't need
+    their own switch.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._families: Dict[str, tuple] = {}  # name -> (type, help, {label tuple: metric})
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, help_text: str, factory, labels: Dict[str, str]):
+        if not self.enabled:
+            return NULL_METRIC
+        family = self._families.get(name)
+        if family is None:
+            with self._lock:
+                family = self._families.setdefault(name, (kind, help_text, {}))
+        key = tuple(sorted(labels.items()))
+        metric = family[2].get(key)
+        if metric is None:
+            with self._lock:
+                metric = family[2].setdefault(key, factory())
+        return metric
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        return self._get("counter", name, help_text, Counter, labels)
+
+    def gauge(self, name: str, help_text: str, **labels) -> Gauge:
+        return self._get("gauge", name, help_text, Gauge, labels)
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS, **labels) -> Histogram:
+        return self._get("histogram", name, help_text, lambda: Histogram(buckets), labels)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in sorted(self._families.items())]
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(metrics, key=lambda item: item[0]):
+                labels = ",".join(f'{label}="{_escape(value)}"' for label, value in key)
+                lines.extend(metric.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+STAGE_METRIC = "prediction_stage_seconds"
+STAGE_HELP = "Time spent in each stage of a prediction request"
+
+
+class Stopwatch:
+    """
+    Times consecutive stages of one request: each lap() records the time
+    since the previous lap under that stage name. `stages` keeps the
+    seconds per stage for the request (e.g. for the prediction journal).
+    """
+
+    __slots__ = ("registry", "endpoint", "last", "laps", "stages")
+
+    def __init__(self, registry: Registry, endpoint: str):
+        self.registry = registry
+        self.endpoint = endpoint
+        self.last = time.perf_counter()
+        self.laps = 0
+        self.stages: Dict[str, float] = {}
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.registry.histogram(STAGE_METRIC, STAGE_HELP, endpoint=self.endpoint, stage=stage).observe(elapsed)
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        self.last = now
+        self.laps += 1
+
+
+class _NullStopwatch:
+    laps = 0
+    stages: Dict[str, float] = {}  # never written to
+
+    def lap(self, stage: str):
+        pass
+
+
+NULL_STOPWATCH = _NullStopwatch()
+
+_current_stopwatch: contextvars.ContextVar = contextvars.ContextVar("stopwatch", default=NULL_STOPWATCH)
+
+
+def current_stopwatch():
+    """
+    Stopwatch of the request being handled, or a no-op one
+    """
+    return _current_stopwatch.get()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that tracks in-flight requests, response status codes
+    and, for the `timed_paths`, the per-stage stopwatch. Warm-up requests
+    (see startup.is_warm_up) are not counted.
+
+    The "decode" stage (body read, JSON parsing and request validation) is
+    the time until the handler's first lap; "encode" (response model
+    validation and JSON rendering) is the time from its last lap until the
+    response starts.
+    """
+
+    def __init__(self, app, registry: Registry, timed_paths: Iterable[str] = ()):
+        self.app = app
+        self.registry = registry
+        self.timed_paths = frozenset(timed_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled or is_warm_up(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"] if scope["path"] in self.timed_paths else "other"
+        in_flight = self.registry.gauge("http_requests_in_flight", "Requests currently being handled", path=path)
+        stopwatch = Stopwatch(self.registry, path) if path != "other" else NULL_STOPWATCH
+        token = _current_stopwatch.set(stopwatch)
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if stopwatch.laps:
+                    stopwatch.lap("encode")
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status.setdefault("code", 500)
+            raise
+        finally:
+            in_flight.dec()
+            _current_stopwatch.reset(token)
+            code = status.get("code", 500)
+            self.registry.counter("http_requests_total", "Requests by path and status code",
+                                  path=path, status=str(code)).inc()
+            if code >= 500:
+                self.registry.counter("http_server_errors_total", "Responses with a 5xx status",
+                                      path=path).inc()
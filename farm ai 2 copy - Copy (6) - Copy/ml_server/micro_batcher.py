@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_MS_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100]
+
+
+class MicroBatcher:
+    """
+    Collect concurrent requests and score them as one batch.
+
+    A batch is flushed once it holds `max_batch_size` items or the oldest
+    item has waited `max_wait_ms`, so a lone request never waits longer
+    than the window. `score_batch` gets the list of items and returns one
+    result per item; an Exception instance in the result list is raised
+    for that caller only. With `offload` (e.g. InferencePool.run),
+    score_batch is called through it instead of on the event loop, and an
+    exception it raises goes to every caller in the batch.
+    """
+
+    def __init__(self, score_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 offload: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.score_batch = score_batch
+        self.offload = offload
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+
+            items = [item for item, _, _ in batch]
+            try:
+                if self.offload:
+                    results = await self.offload(self.score_batch, items)
+                else:
+                    results = self.score_batch(items)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future, _), result in zip(batch, results):
+                if future.done():
+                    continue  # caller went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
@@ -0,0 +1,265 @@
+"""
+Single place that finds, verifies and loads the model artifacts.
+
+    from model_registry import get_bundle
+    bundle = get_bundle()                 # $MODEL_DIR, default: project root
+    bundle.model.predict_proba(...)
+
+    python model_registry.py --write-manifest   # record checksums after retraining
+    python model_registry.py --info             # version, classes, features
+
+Artifacts are loaded with joblib, at most once per process per model
+directory. If the directory has a model_manifest.json, every file is
+checked against its sha256 before it is unpickled. With lazy=True each
+artifact is loaded on first use, so tools that only need the encoders
+never unpickle the model.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_DIR = os.environ.get("MODEL_DIR", BASE_DIR)
+MANIFEST_NAME = "model_manifest.json"
+
+# Attribute name -> file name
+ARTIFACT_FILES = {
+    "model": "LogReg.pkl",
+    "label_encoders": "label_encoders.pkl",
+    "column_transformer": "column_transformer.pkl",
+    "y_encoder": "y_encoder.pkl",
+}
+
+
+class ArtifactIntegrityError(RuntimeError):
+    """
+    An artifact does not match the checksum recorded in the manifest
+    """
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_from_checksums(checksums: Dict[str, str]) -> str:
+    """
+    Short version id derived from the artifact checksums (same as export_model's model_version)
+    """
+    return hashlib.sha256(json.dumps(checksums, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_manifest(model_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(model_dir: str) -> Dict[str, Any]:
+    """
+    Record the checksums of the artifacts currently in model_dir
+    """
+    checksums = {}
+    for file_name in ARTIFACT_FILES.values():
+        path = os.path.join(model_dir, file_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        checksums[file_name] = file_sha256(path)
+
+    manifest = {
+        "version": version_from_checksums(checksums),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "checksums": checksums,
+    }
+    try:
+        import sklearn
+        manifest["sklearn_version"] = sklearn.__version__
+    except ImportError:
+        pass
+
+    with open(os.path.join(model_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class ModelBundle:
+    """
+    The four model artifacts of one model directory.
+
+    Artifacts are available as attributes (model, label_encoders,
+    column_transformer, y_encoder). With lazy=False everything is loaded
+    and verified in the constructor; with lazy=True on first access.
+    """
+
+    def __init__(self, model_dir: Optional[str] = None, lazy: bool = False, verify: bool = True):
+        self.model_dir = os.path.abspath(model_dir or DEFAULT_MODEL_DIR)
+        self.paths = {name: os.path.join(self.model_dir, file_name) for name, file_name in ARTIFACT_FILES.items()}
+        self.verify = verify
+        self.manifest = read_manifest(self.model_dir)
+        self.load_seconds: Dict[str, float] = {}
+        self.checksums: Dict[str, str] = {}
+        self._artifacts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        for path in self.paths.values():
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"File not found: {path}")
+        if verify and self.manifest is None:
+            logger.warning(f"No {MANIFEST_NAME} in {self.model_dir}; artifacts are not checksum-verified "
+                           f"(create one with: python model_registry.py --write-manifest)")
+        if not lazy:
+            for name in ARTIFACT_FILES:
+                self.get(name)
+
+    def get(self, name: str) -> Any:
+        artifact = self._artifacts.get(name)
+        if artifact is not None:
+            return artifact
+        with self._lock:
+            if name not in self._artifacts:
+                self._artifacts[name] = self._load(name)
+            return self._artifacts[name]
+
+    def _load(self, name: str) -> Any:
+        import joblib
+
+        path = self.paths[name]
+        file_name = ARTIFACT_FILES[name]
+        started = time.perf_counter()
+        if self.verify and self.manifest is not None:
+            expected = self.manifest.get("checksums", {}).get(file_name)
+            actual = file_sha256(path)
+            if expected is None:
+                raise ArtifactIntegrityError(f"{file_name} is not listed in {MANIFEST_NAME}")
+            if actual != expected:
+                raise ArtifactIntegrityError(
+                    f"Checksum mismatch for {path}: expected {expected[:12]}, got {actual[:12]}")
+            self.checksums[file_name] = actual
+
+        artifact = joblib.load(path)
+        self.load_seconds[name] = time.perf_counter() - started
+        logger.info(f"Loaded {file_name} in {self.load_seconds[name] * 1000:.1f} ms")
+        return artifact
+
+    @property
+    def model(self):
+        return self.get("model")
+
+    @property
+    def label_encoders(self):
+        return self.get("label_encoders")
+
+    @property
+    def column_transformer(self):
+        return self.get("column_transformer")
+
+    @property
+    def y_encoder(self):
+        return self.get("y_encoder")
+
+    @property
+    def version(self) -> str:
+        if self.manifest is not None and self.manifest.get("version"):
+            return self.manifest["version"]
+        if len(self.checksums) < len(ARTIFACT_FILES):
+            self.checksums = {file_name: file_sha256(self.paths[name]) for name, file_name in ARTIFACT_FILES.items()}
+        return version_from_checksums(self.checksums)
+
+    @property
+    def classes(self) -> List[str]:
+        return self.y_encoder.classes_.tolist()
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.column_transformer.feature_names_in_.tolist()
+
+    def warm_up(self, rounds: int = 3):
+        """
+        Score a synthetic row a few times so that one-time work in the
+        prediction path (lazy imports inside scikit-learn, the first BLAS
+        call) is done before the first request
+        """
+        from feature_builder import FeatureBuilder
+
+        try:
+            builder = FeatureBuilder.from_sklearn(self.label_encoders, self.column_transformer)
+        except NotImplementedError as e:
+            logger.info(f"Skipping warm-up: {e}")
+            return
+        features = builder.transform([builder.sample_record()])
+        for _ in range(rounds):
+            self.y_encoder.inverse_transform(self.model.predict_proba(features).argmax(axis=1))
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "model_dir": self.model_dir,
+            "version": self.version,
+            "verified": self.verify and self.manifest is not None,
+            "loaded": sorted(self._artifacts),
+            "load_seconds": dict(self.load_seconds),
+            "classes": self.classes,
+            "features": self.feature_names,
+        }
+
+
+_bundles: Dict[tuple, ModelBundle] = {}
+_bundles_lock = threading.Lock()
+
+
+def get_bundle(model_dir: Optional[str] = None, lazy: bool = False) -> ModelBundle:
+    """
+    Process-wide bundle for model_dir; repeated calls return the same
+    (already loaded) artifacts. Set MODEL_VERIFY=0 to skip checksums.
+    """
+    model_dir = os.path.abspath(model_dir or DEFAULT_MODEL_DIR)
+    verify = os.environ.get("MODEL_VERIFY", "1") != "0"
+    key = (model_dir, verify)
+    with _bundles_lock:
+        bundle = _bundles.get(key)
+        if bundle is None:
+            bundle = _bundles[key] = ModelBundle(model_dir, lazy=True, verify=verify)
+    if not lazy:
+        for name in ARTIFACT_FILES:
+            bundle.get(name)
+    return bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--write-manifest", action="store_true", help="record checksums of the current artifacts")
+    parser.add_argument("--verify", action="store_true", help="check every artifact against the manifest")
+    parser.add_argument("--info", action="store_true", help="print version, classes and feature order")
+    args = parser.parse_args()
+
+    if args.write_manifest:
+        manifest = write_manifest(args.model_dir)
+        print(f"Wrote {os.path.join(args.model_dir, MANIFEST_NAME)} (version {manifest['version']})")
+    if args.verify:
+        if read_manifest(args.model_dir) is None:
+            sys.exit(f"No {MANIFEST_NAME} in {args.model_dir}")
+        try:
+            ModelBundle(args.model_dir, lazy=False)
+        except ArtifactIntegrityError as e:
+            sys.exit(str(e))
+        print("All artifacts match the manifest")
+    if args.info:
+        # Only the encoders are needed here; the model itself is never unpickled
+        print(json.dumps(ModelBundle(args.model_dir, lazy=True).metadata(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
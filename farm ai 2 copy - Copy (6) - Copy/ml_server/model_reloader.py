@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from model_registry import DEFAULT_MODEL_DIR, MANIFEST_NAME, ModelBundle, read_manifest
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReloader:
+    """
+    Holds the model currently being served and replaces it without a restart.
+
+    `build(bundle)` turns a freshly loaded ModelBundle into whatever the
+    server needs per request (it should also run a smoke prediction and
+    raise if the model is unusable); the result must have a `version`
+    attribute. A reload builds the new object off the request path and
+    then swaps a single reference, so requests that already picked up
+    `current` finish on the old model. Up to `history` previous models are
+    kept for rollback().
+
+    With start_polling(), the model directory's manifest is checked every
+    `poll_interval` seconds and a new version is loaded automatically.
+    """
+
+    def __init__(self, build: Callable[[ModelBundle], Any], bundle: Optional[ModelBundle] = None,
+                 verify: bool = True, history: int = 2, on_swap: Optional[Callable[[Any, Any], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.build = build
+        self.model_dir = bundle.model_dir if bundle else os.path.abspath(DEFAULT_MODEL_DIR)
+        self.verify = verify
+        self.on_swap = on_swap
+        self.on_error = on_error
+        # (model, model_dir), oldest first; with history=0 nothing is kept and rollback() is off
+        self.history: Deque[tuple] = deque(maxlen=history)
+        self.last_error: Optional[str] = None
+        self.last_reload: Optional[float] = None
+        self._reload_lock = threading.Lock()
+        self._poll_interval = 0.0
+        self._manifest_signature = self._read_manifest_signature()
+        self.current = build(bundle or ModelBundle(self.model_dir, lazy=False, verify=verify))
+
+    def _read_manifest_signature(self):
+        try:
+            stat = os.stat(os.path.join(self.model_dir, MANIFEST_NAME))
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _activate(self, new, model_dir: str):
+        old = self.current
+        self.current = new
+        self.model_dir = model_dir
+        self._manifest_signature = self._read_manifest_signature()
+        if self.on_swap:
+            self.on_swap(old, new)
+
+    def reload(self, model_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Load, validate and activate the artifacts in model_dir (default: the
+        current directory). Raises and keeps the current model on failure.
+        """
+        with self._reload_lock:
+            model_dir = os.path.abspath(model_dir or self.model_dir)
+            started = time.perf_counter()
+            try:
+                new = self.build(ModelBundle(model_dir, lazy=False, verify=self.verify))
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Model reload failed, still serving {self.current.version}: {self.last_error}")
+                if self.on_error:
+                    self.on_error(e)
+                raise
+            previous = self.current.version
+            self.history.append((self.current, self.model_dir))
+            self._activate(new, model_dir)
+            self.last_error = None
+            self.last_reload = time.time()
+            logger.info(f"Model reloaded: {previous} -> {new.version} in {time.perf_counter() - started:.2f}s")
+            return {"previous_version": previous, "version": new.version}
+
+    def rollback(self) -> Dict[str, Any]:
+        """
+        Switch back to the model that was active before the last swap
+        """
+        with self._reload_lock:
+            if not self.history:
+                raise ValueError("No previous model to roll back to")
+            previous, model_dir = self.history.pop()
+            current = self.current
+            self._activate(previous, model_dir)
+            logger.info(f"Model rolled back: {current.version} -> {previous.version}")
+            return {"previous_version": current.version, "version": previous.version}
+
+    def poll_once(self) -> Optional[Dict[str, Any]]:
+        """
+        Reload if the manifest changed and names a different version
+        """
+        signature = self._read_manifest_signature()
+        if signature is None or signature == self._manifest_signature:
+            return None
+        manifest = read_manifest(self.model_dir) or {}
+        if manifest.get("version") == self.current.version:
+            self._manifest_signature = signature
+            return None
+        try:
+            return self.reload()
+        except Exception:
+            # Already logged; the files may still be being copied, so try again next poll
+            return None
+
+    def _poll_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Model poll failed: {e}")
+
+    def start_polling(self, interval: float):
+        """
+        Check the manifest in a daemon thread (restarted in forked workers)
+        """
+        self._poll_interval = interval
+
+        def start():
+            threading.Thread(target=self._poll_loop, args=(interval,), daemon=True, name="model-reloader").start()
+
+        start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=start)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.current.version,
+            "model_dir": self.model_dir,
+            "previous_versions": [model.version for model, _ in reversed(self.history)],
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+            "poll_interval": self._poll_interval,
+        }
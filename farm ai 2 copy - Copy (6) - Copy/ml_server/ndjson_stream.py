@@ -0,0 +1,125 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_NOT_STARTED = object()
+
+
+class JsonItemReader:
+    """
+    Decode the objects of a JSON array or an NDJSON body a few at a time.
+
+    The body is kept as one string and only the items asked for are turned
+    into Python objects, so the first rows of a large upload can be scored
+    before the rest has been parsed. Malformed JSON, or anything but
+    whitespace after the closing bracket, ends the stream and is reported
+    in `error`; the items decoded before it are still returned.
+    """
+
+    def __init__(self, body: bytes):
+        self.text = body.decode("utf-8")
+        self.pos = self._skip_whitespace(0)
+        self.count = 0  # items decoded so far
+        self.done = False
+        self.error: Optional[str] = None
+        self.is_array = self.text.startswith("[", self.pos)
+        if self.is_array:
+            if not self.text.rstrip(_WHITESPACE).endswith("]"):
+                raise ValueError("Expected the JSON array to end the body")
+            self.pos = self._skip_whitespace(self.pos + 1)
+            if self.text.startswith("]", self.pos):
+                self._close_array(self.pos)
+        elif self.pos == len(self.text):
+            self.done = True
+        elif not self.text.startswith("{", self.pos):
+            raise ValueError("Expected a JSON array or newline-delimited JSON objects")
+
+    def _skip_whitespace(self, pos: int) -> int:
+        text = self.text
+        while pos < len(text) and text[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _close_array(self, pos: int) -> int:
+        self.done = True
+        pos = self._skip_whitespace(pos + 1)
+        if pos < len(self.text):
+            self.error = f"Unexpected data after the JSON array at character {pos}"
+        return pos
+
+    def read(self, n: int) -> List[Any]:
+        """
+        Up to n more items; an empty list once the body is exhausted
+        """
+        items: List[Any] = []
+        text = self.text
+        while not self.done and len(items) < n:
+            try:
+                item, end = _decoder.raw_decode(text, self.pos)
+            except json.JSONDecodeError as e:
+                self.done = True
+                self.error = f"Invalid JSON in item {self.count}: {e}"
+                break
+            items.append(item)
+            self.count += 1
+            pos = self._skip_whitespace(end)
+            if self.is_array:
+                if text.startswith(",", pos):
+                    pos = self._skip_whitespace(pos + 1)
+                elif text.startswith("]", pos):
+                    pos = self._close_array(pos)
+                else:
+                    self.done = True
+                    self.error = f"Expected ',' or ']' after item {self.count - 1}"
+            elif pos == len(text):
+                self.done = True
+            self.pos = pos
+        return items
+
+
+async def stream_chunks(produce: Callable[[], Optional[bytes]], max_pending: int = 4,
+                        offload: Optional[Callable[..., Awaitable[Any]]] = None,
+                        first: Any = _NOT_STARTED) -> AsyncIterator[bytes]:
+    """
+    Run produce() in the thread pool, or through `offload` (e.g.
+    InferencePool.run), until it returns None, yielding its results in order.
+
+    `first` is a chunk the caller already produced, e.g. so that an error
+    raised by the first call can still become an error response. At most
+    `max_pending` chunks wait to be sent, so a slow client pauses the
+    producer instead of the results piling up in memory. The producer stops
+    as soon as the client goes away.
+    """
+    offload = offload or run_in_threadpool
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    async def producer():
+        try:
+            if first is not _NOT_STARTED:
+                await queue.put(first)
+                if first is None:
+                    return
+            while True:
+                chunk = await offload(produce)
+                await queue.put(chunk)
+                if chunk is None:
+                    return
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.get_running_loop().create_task(producer())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        task.cancel()
+
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional
+
+
+class PredictionCache:
+    """
+    In-process LRU cache for prediction results with a TTL.
+
+    Keys are built from the normalized request: only the columns the model
+    actually uses, with numeric values rounded to `precision` decimals.
+    The cache clears itself when any of the watched artifact files change
+    (checked at most once every `check_interval` seconds).
+    """
+
+    def __init__(self, key_columns: Iterable[str], maxsize: int = 10000, ttl: float = 3600.0,
+                 precision: int = 2, artifact_paths: Iterable[str] = (), check_interval: float = 1.0):
+        self.key_columns = list(key_columns)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = precision
+        self.artifact_paths = list(artifact_paths)
+        self.check_interval = check_interval
+
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._artifact_signature = self._read_artifact_signature()
+        self._next_check = time.monotonic() + check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _read_artifact_signature(self):
+        signature = []
+        for path in self.artifact_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _check_artifacts(self, now: float):
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._read_artifact_signature()
+        if signature != self._artifact_signature:
+            self._artifact_signature = signature
+            self._data.clear()
+            self.invalidations += 1
+
+    def make_key(self, record: Mapping[str, Any]) -> Hashable:
+        key = []
+        for col in self.key_columns:
+            value = record.get(col)
+            if isinstance(value, float):
+                # round() can give -0.0; normalize so it hits the same entry as 0.0
+                value = round(value, self.precision) + 0.0
+            key.append(value)
+        return tuple(key)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._check_artifacts(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "precision": self.precision,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
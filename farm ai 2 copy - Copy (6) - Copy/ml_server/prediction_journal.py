@@ -0,0 +1,561 @@
+"""
+Append-only columnar journal of predictions.
+
+Every answered prediction becomes one row: when it happened, the endpoint,
+the engine and model version that answered, the input features, the top-k
+crops and scores, the total latency and each stage's latency. Request
+handlers only put the row on a queue; a background thread collects rows
+into blocks and appends them to the current journal file.
+
+A journal file is FILE_MAGIC followed by blocks. A block is BLOCK_MAGIC, the
+length of a JSON header, the header, and then each column's values as a
+separately compressed NumPy array. The header gives the row count, the
+time range and, per column, its name, dtype and compressed size. Text
+columns (endpoint, crops, categorical features) are stored as integer codes
+with the distinct values in the header. A reader can therefore skip blocks
+outside a time range, and columns it doesn't need, without decompressing
+them. Files are rotated by size and age; their names start with the time
+they were opened.
+
+    python prediction_journal.py journal/ --since 2026-10-18T09:00 --until 2026-10-18T10:00
+    python prediction_journal.py journal/ --csv predictions.csv --columns ts model_version crop_1 score_1
+"""
+import argparse
+import atexit
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import weakref
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from metrics import NULL_METRIC, Registry
+
+logger = logging.getLogger(__name__)
+
+FILE_MAGIC = b"PJRNL1\n"
+BLOCK_MAGIC = b"BLK1"
+BLOCK_HEADER = struct.Struct("<4sI")  # magic, JSON header length
+FILE_SUFFIX = ".pjl"
+FILE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+FEATURE_PREFIX = "feature."
+STAGE_PREFIX = "stage."
+
+
+def _lzma():
+    import lzma
+    return lzma
+
+
+COMPRESSORS = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+    "lzma": (lambda data: _lzma().compress(data, preset=1), lambda data: _lzma().decompress(data)),
+    "none": (bytes, bytes),
+}
+
+
+# Journals not closed yet; restarted in forked children and closed at exit
+_open_journals: "weakref.WeakSet[PredictionJournal]" = weakref.WeakSet()
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork(); give the child its own, and its own files
+    for journal in list(_open_journals):
+        journal._start()
+
+
+def _close_all():
+    for journal in list(_open_journals):
+        journal.close()
+
+
+atexit.register(_close_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _codes_dtype(count: int):
+    if count <= 0xFF:
+        return np.uint8
+    if count <= 0xFFFF:
+        return np.uint16
+    return np.uint32
+
+
+def _text_column(values: Sequence[Any]):
+    index: Dict[str, int] = {}
+    codes = [index.setdefault("" if value is None else str(value), len(index)) for value in values]
+    return np.array(codes, dtype=_codes_dtype(len(index))), list(index)
+
+
+def _feature_column(values: Sequence[Any]):
+    """
+    Float column if every value is a number (or missing), text otherwise
+    """
+    try:
+        return np.array(values, dtype=np.float64), None
+    except (TypeError, ValueError):
+        return _text_column(values)
+
+
+class PredictionJournal:
+    """
+    Background writer for the prediction journal.
+
+    record() and record_many() only append to an in-memory queue. Rows are
+    written in blocks of up to `flush_rows`, or after `flush_interval`
+    seconds, whichever comes first. A new file is started once the current
+    one reaches `max_bytes` or is `max_age` seconds old. At most
+    `max_pending` rows wait for the writer; beyond that rows are dropped
+    and counted rather than slowing requests down.
+    """
+
+    def __init__(self, directory: str, top_k: int = 5, flush_rows: int = 4096, flush_interval: float = 1.0,
+                 max_bytes: int = 64 * 1024 * 1024, max_age: float = 3600.0, compression: str = "zlib",
+                 max_pending: int = 100000, registry: Optional[Registry] = None):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression {compression!r} (use one of: {', '.join(COMPRESSORS)})")
+        self.directory = directory
+        self.top_k = top_k
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+        self.max_pending = max_pending
+        self.rows_written = 0
+        self.blocks_written = 0
+        self.bytes_written = 0
+        self.files_opened = 0
+        self.dropped = 0
+        self.write_errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+        def metric(kind, name, help_text):
+            return getattr(registry, kind)(name, help_text) if registry else NULL_METRIC
+        self._rows_counter = metric("counter", "prediction_journal_rows_total", "Rows written to the prediction journal")
+        self._dropped_counter = metric("counter", "prediction_journal_dropped_total",
+                                       "Rows dropped because too many were waiting for the journal writer")
+        self._bytes_counter = metric("counter", "prediction_journal_bytes_total",
+                                     "Compressed bytes written to the prediction journal")
+
+        self._start()
+        _open_journals.add(self)
+
+    def _start(self):
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._file = None
+        self._file_opened = 0.0
+        self._file_size = 0
+        self._file_seq = 0
+        self._thread = threading.Thread(target=self._run, name="prediction-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, features: Dict[str, Any], predictions: List[Dict[str, Any]], endpoint: str,
+               model_version: Optional[str] = None, engine: str = "model", latency_ms: Optional[float] = None,
+               stages: Optional[Dict[str, float]] = None):
+        """
+        Queue one answered prediction. `stages` holds seconds per stage, as kept by the stopwatch
+        """
+        self._put(1, (time.time(), endpoint, engine, model_version, latency_ms, stages, [features], [predictions]))
+
+    def record_many(self, features: List[Dict[str, Any]], predictions: List[List[Dict[str, Any]]], endpoint: str,
+                    model_version: Optional[str] = None, engine: str = "model", latency_ms: Optional[float] = None,
+                    stages: Optional[Dict[str, float]] = None):
+        """
+        Queue the rows of one batch; they share its timestamp, latency and stages
+        """
+        if features:
+            self._put(len(features), (time.time(), endpoint, engine, model_version, latency_ms, stages,
+                                      features, predictions))
+
+    def _put(self, rows: int, item):
+        with self._lock:
+            if self._pending + rows > self.max_pending:
+                self.dropped += rows
+                self._dropped_counter.inc(rows)
+                return
+            self._pending += rows
+        self._queue.put(item)
+
+    def _run(self):
+        items = []
+        rows = 0
+        flush_at = None
+        while True:
+            timeout = None if flush_at is None else max(0.0, flush_at - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._flush(items, rows)
+                return
+            if item:
+                items.append(item)
+                rows += len(item[6])
+                if flush_at is None:
+                    flush_at = time.monotonic() + self.flush_interval
+            if rows >= self.flush_rows or (items and time.monotonic() >= flush_at):
+                self._flush(items, rows)
+                items, rows, flush_at = [], 0, None
+
+    def _flush(self, items, rows: int):
+        if not items:
+            return
+        try:
+            self._write_block(self._build_columns(items, rows), rows)
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"Could not write {rows} rows to the prediction journal: {e}")
+            # Start a fresh file rather than append after a partial block
+            self._close_file()
+        finally:
+            with self._lock:
+                self._pending -= rows
+
+    def _build_columns(self, items, rows: int) -> Dict[str, Any]:
+        ts = np.empty(rows, dtype=np.float64)
+        latency = np.full(rows, np.nan, dtype=np.float32)
+        batch_size = np.empty(rows, dtype=np.int32)
+        endpoints, engines, versions = [], [], []
+        feature_rows: List[Dict[str, Any]] = []
+        prediction_rows: List[Any] = []
+        stage_names: Dict[str, None] = {}
+        position = 0
+        for stamp, endpoint, engine, version, latency_ms, stages, features, predictions in items:
+            count = len(features)
+            end = position + count
+            ts[position:end] = stamp
+            batch_size[position:end] = count
+            if latency_ms is not None:
+                latency[position:end] = latency_ms
+            endpoints += [endpoint] * count
+            engines += [engine] * count
+            versions += [version] * count
+            feature_rows.extend(features)
+            prediction_rows.extend(predictions)
+            stage_names.update(dict.fromkeys(stages or ()))
+            position = end
+
+        columns: Dict[str, Any] = {"ts": ts, "latency_ms": latency, "batch_size": batch_size,
+                                   "endpoint": _text_column(endpoints), "engine": _text_column(engines),
+                                   "model_version": _text_column(versions)}
+
+        names: Dict[str, None] = {}
+        for features in feature_rows:
+            names.update(dict.fromkeys(features))
+        for name in names:
+            values = [features.get(name) for features in feature_rows]
+            column, categories = _feature_column(values)
+            columns[FEATURE_PREFIX + name] = column if categories is None else (column, categories)
+
+        for rank in range(self.top_k):
+            crops = [predictions[rank]["crop"] if predictions and rank < len(predictions) else None
+                     for predictions in prediction_rows]
+            scores = [predictions[rank].get("probability", predictions[rank].get("score"))
+                      if predictions and rank < len(predictions) else None
+                      for predictions in prediction_rows]
+            columns[f"crop_{rank + 1}"] = _text_column(crops)
+            columns[f"score_{rank + 1}"] = np.array(scores, dtype=np.float32)
+
+        for name in stage_names:
+            stage = np.full(rows, np.nan, dtype=np.float32)
+            position = 0
+            for item in items:
+                count = len(item[6])
+                seconds = (item[5] or {}).get(name)
+                if seconds is not None:
+                    stage[position:position + count] = seconds * 1000.0
+                position += count
+            columns[STAGE_PREFIX + name] = stage
+        return columns
+
+    def _write_block(self, columns: Dict[str, Any], rows: int):
+        compress = COMPRESSORS[self.compression][0]
+        described, payloads = [], []
+        for name, column in columns.items():
+            entry: Dict[str, Any] = {"name": name}
+            if isinstance(column, tuple):
+                column, entry["values"] = column
+            data = compress(np.ascontiguousarray(column).tobytes())
+            entry.update(dtype=column.dtype.str, size=len(data))
+            described.append(entry)
+            payloads.append(data)
+        ts = columns["ts"]
+        header = json.dumps({"rows": rows, "ts_min": float(ts.min()), "ts_max": float(ts.max()),
+                             "compression": self.compression, "columns": described}).encode()
+
+        self._rotate_if_needed()
+        block = b"".join([BLOCK_HEADER.pack(BLOCK_MAGIC, len(header)), header] + payloads)
+        self._file.write(block)
+        self._file.flush()
+        self._file_size += len(block)
+        self.rows_written += rows
+        self.blocks_written += 1
+        self.bytes_written += len(block)
+        self._rows_counter.inc(rows)
+        self._bytes_counter.inc(len(block))
+
+    def _rotate_if_needed(self):
+        if self._file is not None and (self._file_size >= self.max_bytes
+                                       or time.time() - self._file_opened >= self.max_age):
+            self._close_file()
+        if self._file is None:
+            self._file_opened = time.time()
+            self._file_seq += 1
+            opened = time.strftime(FILE_TIME_FORMAT, time.gmtime(self._file_opened))
+            path = os.path.join(self.directory, f"journal-{opened}-{os.getpid()}-{self._file_seq}{FILE_SUFFIX}")
+            self._file = open(path, "ab")
+            self._file.write(FILE_MAGIC)
+            self._file_size = len(FILE_MAGIC)
+            self.files_opened += 1
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def close(self, timeout: float = 5.0):
+        """
+        Write out the queued rows and close the current file
+        """
+        _open_journals.discard(self)
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._close_file()
+
+    @property
+    def current_file(self) -> Optional[str]:
+        return self._file.name if self._file is not None else None
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "current_file": self.current_file,
+            "compression": self.compression,
+            "pending": self._pending,
+            "rows_written": self.rows_written,
+            "blocks_written": self.blocks_written,
+            "bytes_written": self.bytes_written,
+            "files_opened": self.files_opened,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+        }
+
+
+def journal_from_env(registry: Optional[Registry] = None) -> Optional[PredictionJournal]:
+    """
+    PredictionJournal configured from PREDICTION_JOURNAL_* variables, or None
+    when PREDICTION_JOURNAL_DIR is unset or empty
+    """
+    directory = os.environ.get("PREDICTION_JOURNAL_DIR")
+    if not directory:
+        return None
+    return PredictionJournal(
+        directory,
+        flush_rows=int(os.environ.get("PREDICTION_JOURNAL_FLUSH_ROWS", "4096")),
+        flush_interval=float(os.environ.get("PREDICTION_JOURNAL_FLUSH_INTERVAL", "1")),
+        max_bytes=int(float(os.environ.get("PREDICTION_JOURNAL_MAX_MB", "64")) * 1024 * 1024),
+        max_age=float(os.environ.get("PREDICTION_JOURNAL_MAX_AGE", "3600")),
+        compression=os.environ.get("PREDICTION_JOURNAL_COMPRESSION", "zlib"),
+        registry=registry,
+    )
+
+
+def journal_files(path: str) -> List[str]:
+    """
+    Journal files in a directory (or just `path` if it is a file), oldest first
+    """
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(path, f"*{FILE_SUFFIX}")))
+
+
+def _file_opened_at(path: str) -> Optional[float]:
+    parts = os.path.basename(path).split("-")
+    try:
+        opened = datetime.datetime.strptime(parts[1], FILE_TIME_FORMAT)
+    except (IndexError, ValueError):
+        return None
+    return opened.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def read_blocks(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                columns: Optional[Iterable[str]] = None):
+    """
+    Yield (rows, {column: array}) for each block of one file that overlaps [start, end).
+
+    Only the wanted columns (all when None, always "ts") are decompressed;
+    text columns come back as object arrays. A truncated last block, left by
+    a writer that was killed mid-write, ends the file quietly.
+    """
+    wanted = None if columns is None else set(columns) | {"ts"}
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a prediction journal")
+        while True:
+            prefix = f.read(BLOCK_HEADER.size)
+            if len(prefix) < BLOCK_HEADER.size:
+                return
+            magic, header_size = BLOCK_HEADER.unpack(prefix)
+            if magic != BLOCK_MAGIC:
+                logger.warning(f"{path}: unreadable data at byte {f.tell() - BLOCK_HEADER.size}, stopping there")
+                return
+            raw_header = f.read(header_size)
+            if len(raw_header) < header_size:
+                return
+            header = json.loads(raw_header)
+            if (start is not None and header["ts_max"] < start) or (end is not None and header["ts_min"] >= end):
+                f.seek(sum(column["size"] for column in header["columns"]), os.SEEK_CUR)
+                continue
+
+            decompress = COMPRESSORS[header["compression"]][1]
+            block = {}
+            for column in header["columns"]:
+                if wanted is not None and column["name"] not in wanted:
+                    f.seek(column["size"], os.SEEK_CUR)
+                    continue
+                data = f.read(column["size"])
+                if len(data) < column["size"]:
+                    return
+                values = np.frombuffer(decompress(data), dtype=np.dtype(column["dtype"]))
+                if "values" in column:
+                    values = np.array(column["values"], dtype=object)[values]
+                block[column["name"]] = values
+            yield header["rows"], block
+
+
+def read_journal(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                 columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Rows with start <= ts < end (Unix seconds) from a journal file or directory, as {column: array};
+    "ts" and every requested column are always included, empty when no rows match.
+
+    Files opened after `end` or last written before `start` are not opened.
+    Columns missing from some blocks (a feature or stage that only some
+    rows have) are NaN or "" there; a requested column no block has is all NaN.
+    """
+    blocks = []
+    for file_path in journal_files(path):
+        opened = _file_opened_at(file_path)
+        if end is not None and opened is not None and opened >= end:
+            continue
+        if start is not None and os.path.getmtime(file_path) < start:
+            continue
+        for rows, block in read_blocks(file_path, start, end, columns):
+            mask = np.ones(rows, dtype=bool)
+            if start is not None:
+                mask &= block["ts"] >= start
+            if end is not None:
+                mask &= block["ts"] < end
+            if not mask.all():
+                block = {name: values[mask] for name, values in block.items()}
+            blocks.append((int(mask.sum()), block))
+
+    names: Dict[str, np.dtype] = {}
+    for _, block in blocks:
+        for name, values in block.items():
+            names.setdefault(name, values.dtype)
+    if columns is not None:
+        names = {name: names.get(name, np.dtype(np.float64)) for name in dict.fromkeys(["ts", *columns])}
+    else:
+        names.setdefault("ts", np.dtype(np.float64))
+
+    result = {}
+    for name, dtype in names.items():
+        fill = "" if dtype == object else np.nan
+        parts = []
+        for rows, block in blocks:
+            if name in block:
+                parts.append(block[name])
+            else:
+                parts.append(np.full(rows, fill, dtype=object if dtype == object else np.float64))
+        result[name] = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    return result
+
+
+def read_journal_frame(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                       columns: Optional[Iterable[str]] = None):
+    """
+    read_journal() as a pandas DataFrame, with text columns as categoricals
+    """
+    import pandas as pd
+    data = read_journal(path, start, end, columns)
+    frame = pd.DataFrame({name: pd.Categorical(values) if values.dtype == object else values
+                          for name, values in data.items()})
+    if "ts" in frame:
+        frame.insert(0, "time", pd.to_datetime(frame["ts"], unit="s", utc=True))
+    return frame
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """
+    Unix seconds, or an ISO date/time (UTC unless it has an offset)
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp()
+
+
+def summarize(data: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    ts = data.get("ts", np.empty(0))
+    summary: Dict[str, Any] = {"rows": int(len(ts))}
+    if not len(ts):
+        return summary
+    summary["from"] = datetime.datetime.fromtimestamp(ts.min(), datetime.timezone.utc).isoformat()
+    summary["to"] = datetime.datetime.fromtimestamp(ts.max(), datetime.timezone.utc).isoformat()
+    for name in ("endpoint", "engine", "model_version", "crop_1"):
+        if name in data:
+            values, counts = np.unique(data[name].astype(str), return_counts=True)
+            summary[name] = {value: int(count) for value, count in
+                             sorted(zip(values, counts), key=lambda pair: -pair[1])}
+    latencies = {}
+    for name in ["latency_ms"] + sorted(name for name in data if name.startswith(STAGE_PREFIX)):
+        values = data[name][~np.isnan(data[name])] if name in data else []
+        if len(values):
+            p50, p99 = np.percentile(values, [50, 99])
+            latencies[name] = {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+    summary["latency_ms"] = latencies
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="journal directory or file")
+    parser.add_argument("--since", help="first time to include (ISO or Unix seconds)")
+    parser.add_argument("--until", help="time to stop at, exclusive (ISO or Unix seconds)")
+    parser.add_argument("--columns", nargs="+", help="only these columns (default: all)")
+    parser.add_argument("--csv", help="write the rows to this CSV file instead of printing a summary")
+    args = parser.parse_args()
+
+    start, end = parse_time(args.since), parse_time(args.until)
+    if args.csv:
+        read_journal_frame(args.path, start, end, args.columns).to_csv(args.csv, index=False)
+        return
+    print(json.dumps(summarize(read_journal(args.path, start, end, args.columns)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
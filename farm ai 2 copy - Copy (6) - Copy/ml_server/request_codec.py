@@ -0,0 +1,164 @@
+"""
+Decode prediction requests and encode responses without pydantic.
+
+    codec = RequestCodec(feature_names, categorical_columns, normalize=str.capitalize)
+    record = codec.decode(await request.body())     # model column -> value
+    return Response(dumps(result), media_type="application/json")
+
+Both request schemas in use are accepted: the server one (`ph`,
+`soil_type`, `land_size`, ...) and the form one (`pH`, `State`, `Area`,
+`Soil_Type`, ...). Field names are resolved through one precompiled table
+straight to the model's input columns, so a request is checked and
+converted in a single pass over its keys. Invalid input raises
+RequestDecodeError with errors in the same format as FastAPI's 422
+responses. orjson is used for JSON when it is installed.
+"""
+import json
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Request field -> model input column, for both request schemas
+FIELD_ALIASES = {
+    "N": "N",
+    "P": "P",
+    "K": "K",
+    "temperature": "temperature",
+    "Temperature": "temperature",
+    "humidity": "humidity",
+    "Humidity": "humidity",
+    "ph": "ph",
+    "pH": "ph",
+    "rainfall": "rainfall",
+    "Rainfall": "rainfall",
+    "state": "state",
+    "State": "state",
+    "soil_type": "Soil Type",
+    "Soil_Type": "Soil Type",
+    "Soil Type": "Soil Type",
+    "land_size": "land_size",
+    "Area": "land_size",
+}
+
+# Model input column -> field name used in error messages (the CropRequest names)
+REQUEST_FIELDS = {"Soil Type": "soil_type"}
+
+
+def loads(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class RequestDecodeError(ValueError):
+    """
+    The request body does not match either schema; `errors` has one
+    FastAPI-style entry ({"loc", "msg", "type"}) per problem
+    """
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__("; ".join(f"{'.'.join(str(loc) for loc in e['loc'][1:]) or 'body'}: {e['msg']}"
+                                   for e in errors))
+
+    def fields(self) -> List[str]:
+        return [str(e["loc"][-1]) for e in self.errors]
+
+
+def _error(field: Any, msg: str, error_type: str, value: Any = None) -> Dict[str, Any]:
+    error = {"type": error_type, "loc": ("body", field), "msg": msg}
+    if value is not None:
+        error["input"] = value
+    return error
+
+
+class RequestCodec:
+    """
+    Compiled decoder from request JSON to a model input record.
+
+    `columns` are the model's input columns; `categorical` are the ones
+    holding strings, which are passed through `normalize` (e.g.
+    str.capitalize). All other columns are converted to float; numeric
+    strings are accepted, like pydantic's lax mode.
+    """
+
+    def __init__(self, columns: Sequence[str], categorical: Iterable[str],
+                 normalize: Optional[Callable[[str], str]] = None):
+        self.columns = list(columns)
+        categorical = set(categorical)
+        self.normalize = normalize
+        # field -> (column, is_categorical), restricted to the model's columns
+        self.fields = {field: (column, column in categorical)
+                       for field, column in FIELD_ALIASES.items() if column in self.columns}
+        unknown = [column for column in self.columns if column not in FIELD_ALIASES.values()]
+        if unknown:
+            raise ValueError(f"No request field for model input column(s): {unknown}")
+
+    def decode(self, body: bytes) -> Dict[str, Any]:
+        return self.decode_object(self.load(body))
+
+    @staticmethod
+    def load(body: bytes) -> Any:
+        try:
+            return loads(body)
+        except ValueError as e:
+            raise RequestDecodeError([{"type": "json_invalid", "loc": ("body",), "msg": f"JSON decode error: {e}"}])
+
+    def decode_object(self, data: Any) -> Dict[str, Any]:
+        """
+        Check and convert one already parsed request object
+        """
+        if not isinstance(data, dict):
+            raise RequestDecodeError([{"type": "model_attributes_type", "loc": ("body",),
+                                       "msg": "Input should be a valid dictionary or object"}])
+        record: Dict[str, Any] = {}
+        errors = []
+        fields = self.fields
+        for field, value in data.items():
+            spec = fields.get(field)
+            if spec is None:
+                continue  # extra fields are ignored, as with the pydantic models
+            column, is_categorical = spec
+            if column in record:
+                errors.append(_error(field, f"Field given twice (also as another name for {column})", "duplicate"))
+                continue
+            if is_categorical:
+                if type(value) is not str:
+                    errors.append(_error(field, "Input should be a valid string", "string_type", value))
+                    continue
+                record[column] = self.normalize(value) if self.normalize else value
+                continue
+            value_type = type(value)
+            if value_type is float or value_type is int:
+                record[column] = float(value)
+            elif value_type is str:
+                try:
+                    record[column] = float(value)
+                except ValueError:
+                    errors.append(_error(field, "Input should be a valid number, unable to parse string as a number",
+                                         "float_parsing", value))
+                    continue
+            else:
+                errors.append(_error(field, "Input should be a valid number", "float_type", value))
+                continue
+            if not math.isfinite(record[column]):
+                del record[column]
+                errors.append(_error(field, "Input should be a finite number", "finite_number", value))
+
+        if len(record) < len(self.columns):
+            for column in self.columns:
+                if column not in record and not any(fields.get(e["loc"][-1], (None,))[0] == column for e in errors):
+                    errors.append(_error(REQUEST_FIELDS.get(column, column), "Field required", "missing"))
+        if errors:
+            raise RequestDecodeError(errors)
+        return record
@@ -0,0 +1,201 @@
+from operator import attrgetter
+
+import numpy as np
+
+# Crop requirements based on research
+CROP_REQUIREMENTS = {
+    'Rice': {
+        'N': {'min': 80, 'max': 120, 'weight': 0.15},
+        'P': {'min': 30, 'max': 60, 'weight': 0.1},
+        'K': {'min': 40, 'max': 80, 'weight': 0.1},
+        'ph': {'min': 5.5, 'max': 6.8, 'weight': 0.15},
+        'temperature': {'min': 22, 'max': 32, 'weight': 0.2},
+        'humidity': {'min': 70, 'max': 90, 'weight': 0.15},
+        'rainfall': {'min': 200, 'max': 300, 'weight': 0.25},
+    },
+    'Wheat': {
+        'N': {'min': 60, 'max': 100, 'weight': 0.2},
+        'P': {'min': 30, 'max': 60, 'weight': 0.1},
+        'K': {'min': 25, 'max': 50, 'weight': 0.1},
+        'ph': {'min': 6.0, 'max': 7.5, 'weight': 0.1},
+        'temperature': {'min': 15, 'max': 25, 'weight': 0.2},
+        'humidity': {'min': 40, 'max': 65, 'weight': 0.1},
+        'rainfall': {'min': 75, 'max': 150, 'weight': 0.2},
+    },
+    'Maize': {
+        'N': {'min': 50, 'max': 90, 'weight': 0.15},
+        'P': {'min': 25, 'max': 45, 'weight': 0.1},
+        'K': {'min': 40, 'max': 80, 'weight': 0.15},
+        'ph': {'min': 5.8, 'max': 7.0, 'weight': 0.1},
+        'temperature': {'min': 20, 'max': 30, 'weight': 0.2},
+        'humidity': {'min': 50, 'max': 75, 'weight': 0.1},
+        'rainfall': {'min': 150, 'max': 250, 'weight': 0.2},
+    },
+    'Cotton': {
+        'N': {'min': 40, 'max': 80, 'weight': 0.1},
+        'P': {'min': 20, 'max': 40, 'weight': 0.1},
+        'K': {'min': 50, 'max': 70, 'weight': 0.15},
+        'ph': {'min': 6.0, 'max': 8.0, 'weight': 0.1},
+        'temperature': {'min': 25, 'max': 35, 'weight': 0.25},
+        'humidity': {'min': 40, 'max': 70, 'weight': 0.1},
+        'rainfall': {'min': 150, 'max': 200, 'weight': 0.2},
+    },
+    'Chickpea': {
+        'N': {'min': 20, 'max': 40, 'weight': 0.1},
+        'P': {'min': 30, 'max': 60, 'weight': 0.15},
+        'K': {'min': 20, 'max': 40, 'weight': 0.1},
+        'ph': {'min': 6.0, 'max': 8.0, 'weight': 0.1},
+        'temperature': {'min': 18, 'max': 28, 'weight': 0.15},
+        'humidity': {'min': 30, 'max': 60, 'weight': 0.15},
+        'rainfall': {'min': 60, 'max': 150, 'weight': 0.25},
+    },
+    'Sugarcane': {
+        'N': {'min': 80, 'max': 150, 'weight': 0.15},
+        'P': {'min': 40, 'max': 80, 'weight': 0.1},
+        'K': {'min': 80, 'max': 150, 'weight': 0.15},
+        'ph': {'min': 6.0, 'max': 7.5, 'weight': 0.1},
+        'temperature': {'min': 20, 'max': 35, 'weight': 0.2},
+        'humidity': {'min': 70, 'max': 90, 'weight': 0.1},
+        'rainfall': {'min': 200, 'max': 300, 'weight': 0.2},
+    },
+    'Potato': {
+        'N': {'min': 60, 'max': 120, 'weight': 0.15},
+        'P': {'min': 50, 'max': 100, 'weight': 0.15},
+        'K': {'min': 80, 'max': 120, 'weight': 0.15},
+        'ph': {'min': 5.5, 'max': 6.5, 'weight': 0.15},
+        'temperature': {'min': 15, 'max': 25, 'weight': 0.15},
+        'humidity': {'min': 60, 'max': 80, 'weight': 0.1},
+        'rainfall': {'min': 120, 'max': 180, 'weight': 0.15},
+    },
+    'Mustard': {
+        'N': {'min': 40, 'max': 80, 'weight': 0.15},
+        'P': {'min': 20, 'max': 50, 'weight': 0.15},
+        'K': {'min': 20, 'max': 50, 'weight': 0.15},
+        'ph': {'min': 6.0, 'max': 7.5, 'weight': 0.1},
+        'temperature': {'min': 15, 'max': 25, 'weight': 0.2},
+        'humidity': {'min': 50, 'max': 70, 'weight': 0.1},
+        'rainfall': {'min': 80, 'max': 160, 'weight': 0.15},
+    }
+}
+
+# Crops that grow better in certain states get a small bonus
+STATE_PREFERENCES = {
+    'Rice': ['West Bengal', 'Andhra Pradesh', 'Punjab'],
+    'Wheat': ['Punjab', 'Uttar Pradesh', 'Rajasthan'],
+    'Maize': ['Karnataka', 'Rajasthan', 'Punjab'],
+    'Cotton': ['Gujarat', 'Maharashtra', 'Punjab'],
+    'Sugarcane': ['Uttar Pradesh', 'Maharashtra', 'Karnataka'],
+    'Chickpea': ['Rajasthan', 'Maharashtra', 'Punjab']
+}
+STATE_BONUS = 0.1
+
+# Order in which parameters are scored
+PARAMETERS = ["N", "P", "K", "ph", "temperature", "humidity", "rainfall"]
+
+
+class RuleEngine:
+    """
+    CROP_REQUIREMENTS compiled into min/max/weight matrices.
+
+    Scores are computed as one broadcast over (requests x crops x parameters)
+    and match the original per-crop loop exactly, including the order in
+    which the weighted parameter scores are summed.
+    """
+
+    def __init__(self, requirements=CROP_REQUIREMENTS, state_preferences=STATE_PREFERENCES):
+        self.crops = list(requirements)
+        shape = (len(self.crops), len(PARAMETERS))
+        self.mins = np.zeros(shape)
+        self.maxs = np.ones(shape)
+        self.weights = np.zeros(shape)
+        self.present = np.zeros(shape, dtype=bool)
+        self.total_weights = np.zeros(len(self.crops))
+
+        for c, crop in enumerate(self.crops):
+            total_weight = 0
+            for p, param in enumerate(PARAMETERS):
+                if param in requirements[crop]:
+                    req = requirements[crop][param]
+                    self.mins[c, p] = req['min']
+                    self.maxs[c, p] = req['max']
+                    self.weights[c, p] = req['weight']
+                    self.present[c, p] = True
+                    total_weight += req['weight']
+            self.total_weights[c] = total_weight
+
+        self.middles = (self.mins + self.maxs) / 2
+        self.half_ranges = (self.maxs - self.mins) / 2
+        self.ranges = self.maxs - self.mins
+
+        # State bonus matrix: (states x crops); unknown states use the extra last row
+        self.states = sorted({state for states in state_preferences.values() for state in states})
+        self.state_index = {state: i for i, state in enumerate(self.states)}
+        self.state_bonus = np.zeros((len(self.states) + 1, len(self.crops)), dtype=bool)
+        for c, crop in enumerate(self.crops):
+            for state in state_preferences.get(crop, []):
+                self.state_bonus[self.state_index[state], c] = True
+
+    def state_indices(self, states):
+        unknown = len(self.states)
+        return np.fromiter((self.state_index.get(state, unknown) for state in states), dtype=np.intp, count=len(states))
+
+    def score(self, values: np.ndarray, state_idx: np.ndarray) -> np.ndarray:
+        """
+        Suitability of every crop, shape (requests, crops).
+
+        values has one column per entry in PARAMETERS; state_idx comes from
+        state_indices().
+        """
+        v = np.asarray(values, dtype=np.float64)[:, None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inside = (self.mins <= v) & (v <= self.maxs)
+            inside_score = 1 - (np.abs(v - self.middles) / self.half_ranges * 0.2)
+            distance = np.minimum(np.abs(v - self.mins), np.abs(v - self.maxs))
+            outside_score = np.maximum(0, 1 - (distance / self.ranges))
+        param_scores = np.where(inside, inside_score, outside_score) * self.weights
+
+        # Sum parameter by parameter to keep the original float rounding
+        total = np.zeros(param_scores.shape[:2])
+        for p in range(len(PARAMETERS)):
+            total += np.where(self.present[:, p], param_scores[:, :, p], 0.0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            final = np.where(self.total_weights > 0, 0.5 + (total / self.total_weights) * 0.5, 0.5)
+        final = final + np.where(self.state_bonus[state_idx], STATE_BONUS, 0.0)
+        return np.minimum(0.98, np.maximum(0.05, final))
+
+    def rank(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Crop indices per request, highest score first (ties keep table order)
+        """
+        return np.argsort(-scores, axis=1, kind="stable")
+
+    def _predict(self, values, states, k=None):
+        """
+        Ranked [{"crop", "probability"}] lists from a (requests x PARAMETERS)
+        value array and the requests' states; with `k`, only the k best crops
+        """
+        scores = self.score(values, self.state_indices(states))
+        order = self.rank(scores)[:, :k]
+        crops = self.crops
+        probabilities = np.take_along_axis(scores, order, axis=1).tolist()
+        return [[{"crop": crops[c], "probability": probability} for c, probability in zip(row_order, row_probs)]
+                for row_order, row_probs in zip(order.tolist(), probabilities)]
+
+    def predict_records(self, records, k=None):
+        """
+        Like predict_many, for dicts keyed by PARAMETERS and "state" (decoded
+        /predict rows); with `k`, only the k best crops
+        """
+        values = np.array([[record[param] for param in PARAMETERS] for record in records], dtype=np.float64)
+        return self._predict(values.reshape(len(records), len(PARAMETERS)),
+                             [record.get("state") for record in records], k)
+
+    def predict_many(self, requests):
+        """
+        Ranked [{"crop", "probability"}] lists for objects with N, P, K, ph,
+        temperature, humidity, rainfall and state attributes
+        """
+        get_values = attrgetter(*PARAMETERS)
+        values = np.array([get_values(r) for r in requests], dtype=np.float64).reshape(len(requests), len(PARAMETERS))
+        return self._predict(values, [r.state for r in requests])
@@ -0,0 +1,235 @@
+"""
+Multi-worker launcher that shares preloaded models copy-on-write.
+
+    python serve_workers.py crop_recommendation_server:app --workers 16
+    python serve_workers.py app:app --app-dir .. --workers 8
+    python serve_workers.py crop_recommendation_server:app --uds /tmp/farm-ml.sock
+
+The app module is imported (and its model files loaded) once in this
+parent process. Workers are then forked, so they share the model pages
+copy-on-write, and all of them accept connections from one listening
+socket (TCP, or a Unix domain socket with --uds). BLAS/OpenMP pools are limited to --threads per worker to avoid
+oversubscription. The parent restarts workers that die, backing off while
+they keep dying soon after starting and giving up after
+--max-fast-failures of those in a row. It also periodically logs each
+worker's memory (RSS, and PSS which splits shared pages fairly).
+
+Needs os.fork, so it runs on Linux/macOS only.
+"""
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from listen_address import DEFAULT_KEEP_ALIVE, bind_unix_socket
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("serve_workers")
+
+# Restart delay after the first worker in a row that exits within --min-uptime; doubled for each further one
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def limit_threads(threads):
+    # Must run before numpy is imported for the env vars to take effect
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+
+def load_app(app_ref, app_dir):
+    module_name, _, attr = app_ref.partition(":")
+    app_dir = os.path.abspath(app_dir)
+    # Entry points load model files relative to their own folder or the CWD
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    module = importlib.import_module(module_name)
+    return getattr(module, attr or "app")
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def memory_usage(pid):
+    """
+    (rss_kb, pss_kb) for a process, or None if /proc is not available
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return values.get("Rss"), values.get("Pss")
+
+
+def run_worker(app, sock, threads, log_level, keep_alive):
+    import uvicorn
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+    config = uvicorn.Config(app, log_level=log_level, timeout_keep_alive=keep_alive)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn_worker(app, sock, threads, log_level, keep_alive):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(app, sock, threads, log_level, keep_alive)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("app", help="module:attribute of the FastAPI app, e.g. crop_recommendation_server:app")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="folder to import the app module from (also used as the working directory)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--uds", help="listen on this Unix domain socket path instead of --host/--port")
+    parser.add_argument("--keep-alive", type=int, default=DEFAULT_KEEP_ALIVE,
+                        help="seconds an idle keep-alive connection is held open")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="BLAS/OpenMP threads per worker")
+    parser.add_argument("--report-interval", type=float, default=60.0,
+                        help="seconds between per-worker memory reports (0 disables)")
+    parser.add_argument("--min-uptime", type=float, default=10.0,
+                        help="a worker that exits sooner than this many seconds after starting counts as a fast failure")
+    parser.add_argument("--max-fast-failures", type=int, default=5,
+                        help="stop after this many fast failures in a row (0: keep restarting)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve_workers.py needs os.fork; on Windows run the server directly")
+    if args.uds:
+        # load_app changes the working directory
+        args.uds = os.path.abspath(args.uds)
+
+    limit_threads(args.threads)
+    started = time.perf_counter()
+    app = load_app(args.app, args.app_dir)
+    logger.info(f"Loaded {args.app} in {time.perf_counter() - started:.2f}s (pid {os.getpid()})")
+
+    # Keep the preloaded objects out of the collector so workers don't
+    # dirty the shared pages on their first GC pass
+    gc.collect()
+    gc.freeze()
+
+    if args.uds:
+        sock = bind_unix_socket(args.uds)
+        sock.set_inheritable(True)
+        address = f"unix:{args.uds}"
+    else:
+        sock = bind_socket(args.host, args.port)
+        address = f"http://{args.host}:{args.port}"
+    worker_args = (app, sock, args.threads, args.log_level, args.keep_alive)
+    workers = {}
+    for _ in range(args.workers):
+        pid = spawn_worker(*worker_args)
+        workers[pid] = time.time()
+    logger.info(f"Started {args.workers} workers on {address}: {sorted(workers)}")
+
+    stopping = False
+    exit_code = 0
+    fast_failures = 0
+    restarts = []  # times at which to fork a replacement worker
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    next_report = time.time() + args.report_interval
+    while not stopping:
+        # Restart workers that exited
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        if pid and pid in workers:
+            uptime = time.time() - workers.pop(pid)
+            fast_failures = fast_failures + 1 if uptime < args.min_uptime else 0
+            if args.max_fast_failures and fast_failures >= args.max_fast_failures:
+                logger.error(f"Worker {pid} exited with status {status} after {uptime:.1f}s; {fast_failures} workers "
+                             f"in a row exited within {args.min_uptime:g}s of starting, giving up")
+                exit_code = 1
+                break
+            delay = min(RESTART_DELAY * 2 ** (fast_failures - 1), MAX_RESTART_DELAY) if fast_failures else 0.0
+            logger.warning(f"Worker {pid} exited with status {status} after {uptime:.1f}s, restarting in {delay:g}s")
+            restarts.append(time.time() + delay)
+            continue
+
+        now = time.time()
+        for due in [due for due in restarts if due <= now]:
+            restarts.remove(due)
+            new_pid = spawn_worker(*worker_args)
+            workers[new_pid] = time.time()
+
+        if args.report_interval and time.time() >= next_report:
+            next_report = time.time() + args.report_interval
+            for worker_pid in sorted(workers):
+                usage = memory_usage(worker_pid)
+                if usage:
+                    rss, pss = usage
+                    logger.info(f"Worker {worker_pid}: RSS {rss / 1024:.1f} MiB, PSS {pss / 1024:.1f} MiB")
+        time.sleep(0.5)
+
+    logger.info("Stopping workers")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.time() + 30
+    while workers and time.time() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in workers:
+        os.kill(pid, signal.SIGKILL)
+    if args.uds:
+        os.unlink(args.uds)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,393 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+"""
+Low-footprint prediction server: the standard library plus NumPy.
 
-class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+    python simple_server.py
+    SIMPLE_SERVER_THREADS=2 ML_SERVER_SOCKET=/tmp/farm-ml.sock python simple_server.py
+
+Serves the exported LogReg model (crop_model/, written by export_model.py)
+through LiteModel, so FastAPI, pandas and scikit-learn are never imported.
+The endpoints match crop_recommendation_server.py:
+
+    GET  /               status and model version
+    GET  /ready          startup timings; 200 once warmed up
+    POST /predict        one request in either schema -> top 5 crops
+    POST /predict/batch  JSON array -> [{"index", "predictions", "error"}]
+
+Connections use HTTP/1.1 keep-alive. The main thread watches the listening
+socket and all idle connections with a selector. When a request arrives on
+a connection, the connection is handed to a fixed pool of
+SIMPLE_SERVER_THREADS workers, and is given back once the response is sent.
+An idle client therefore doesn't hold a thread, and a few workers can serve
+many connections. Connections idle for longer than ML_SERVER_KEEP_ALIVE
+seconds are closed. Past SIMPLE_SERVER_MAX_CONNECTIONS open connections,
+new ones get a 503.
+
+Before the socket is bound, a synthetic request is decoded, scored and
+encoded a few times, so the first real request doesn't pay for first-call
+work in NumPy and the codec.
+"""
+from startup import Startup
+startup = Startup()
+
+import collections
+import logging
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+from lite_model import DEFAULT_ARTIFACT_DIR, LiteModel
+from listen_address import bind_unix_socket, describe, host_port, keep_alive, socket_path
+from log_config import configure_logging
+from request_codec import RequestCodec, RequestDecodeError, dumps
+
+configure_logging()
+logger = logging.getLogger("simple_server")
+startup.mark("imports")
+
+# Exported model directory (see export_model.py)
+LITE_MODEL_DIR = os.environ.get("LITE_MODEL_DIR", DEFAULT_ARTIFACT_DIR)
+# Worker threads handling requests, and open connections accepted at once
+THREADS = int(os.environ.get("SIMPLE_SERVER_THREADS", "4"))
+MAX_CONNECTIONS = int(os.environ.get("SIMPLE_SERVER_MAX_CONNECTIONS", "1024"))
+# Largest request body and /predict/batch size accepted
+MAX_BODY_BYTES = int(os.environ.get("SIMPLE_SERVER_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+# Seconds a client gets to send the rest of a request once it has started
+REQUEST_TIMEOUT = 30
+
+BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: 34\r\nRetry-After: 1\r\nConnection: close\r\n\r\n"
+                 b'{"detail":"Too many connections"}\n')
+
+
+class ServingModel:
+    """
+    The LiteModel with its request decoder and category checks
+    """
+
+    def __init__(self, path):
+        self.model = LiteModel.load(path)
+        self.version = self.model.version
+        self.feature_builder = self.model.feature_builder
+        self.allowed_categories = {col: set(values) for col, values in self.feature_builder.categories().items()}
+        self.codec = RequestCodec(self.feature_builder.input_columns, self.allowed_categories,
+                                  normalize=str.capitalize)
+
+    def validate_categories(self, record):
+        for col, allowed in self.allowed_categories.items():
+            if record[col] not in allowed:
+                raise ValueError(f"Invalid {col} value(s): ['{record[col]}']. Allowed values: {sorted(allowed)}")
+
+    def decode(self, item):
+        record = self.codec.decode_object(item)
+        self.validate_categories(record)
+        return record
+
+    def predict(self, records):
+        return self.model.predict_records(records, k=5)
+
+    def warm_up(self, rounds=3):
+        """
+        Run a synthetic request through decoding, scoring and encoding
+        """
+        body = dumps(self.feature_builder.sample_record(self.codec.normalize))
+        for _ in range(rounds):
+            record = self.codec.decode(body)
+            self.validate_categories(record)
+            dumps(self.predict([record])[0])
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    One instance per connection. The server calls handle_one_request()
+    from a pool thread each time a request is waiting on the connection.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response so headers and body leave in one write, flushed after each request
+    wbufsize = -1
+    timeout = REQUEST_TIMEOUT
+
+    def __init__(self, request, client_address, server):
+        # Only set up the streams; requests are read by the server's workers
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.close_connection = True
+        self.setup()
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args, extra={"category": "request"})
+
+    def send_json(self, status, body):
+        data = dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('X-Model-Version', self.server.serving.version)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
         self.end_headers()
-        
-        response = {
-            "message": "Crop Recommendation API - Test Server",
-            "status": "OK"
-        }
-        
-        self.wfile.write(json.dumps(response).encode('utf-8'))
-    
+        self.wfile.write(data)
+
+    def read_body(self):
+        """
+        The request body, or None after sending an error response
+        """
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self.send_json(411, {"detail": "Content-Length required"})
+            return None
+        if int(length) > MAX_BODY_BYTES:
+            # The body is left unread, so the connection can't be reused
+            self.close_connection = True
+            self.send_json(413, {"detail": f"Request body too large (max {MAX_BODY_BYTES} bytes)"})
+            return None
+        return self.rfile.read(int(length))
+
+    def do_GET(self):
+        if self.path == '/ready':
+            self.send_json(200 if startup.ready else 503, startup.report())
+            return
+        if self.path != '/':
+            self.send_json(404, {"detail": "Not Found"})
+            return
+        self.send_json(200, {"message": "Crop Recommendation API - Send POST requests to /predict",
+                             "model_version": self.server.serving.version})
+
     def do_POST(self):
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
+        routes = {'/predict': self.predict, '/predict/batch': self.predict_batch}
+        route = routes.get(self.path)
+        body = self.read_body()
+        if body is None:
+            return
+        if route is None:
+            self.send_json(404, {"detail": "Not Found"})
+            return
         try:
-            # Try to parse the JSON data
-            data = json.loads(post_data.decode('utf-8'))
-            
-            # Create a sample prediction response
-            sample_predictions = [
-                {"crop": "Wheat", "probability": 0.92},
-                {"crop": "Rice", "probability": 0.85},
-                {"crop": "Maize", "probability": 0.78},
-                {"crop": "Cotton", "probability": 0.65},
-                {"crop": "Chickpea", "probability": 0.58}
-            ]
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(sample_predictions).encode('utf-8'))
-            
+            route(body)
         except Exception as e:
-            self.send_response(400)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": str(e)}).encode('utf-8'))
+            logger.exception("Prediction error")
+            self.send_json(500, {"detail": str(e)})
+
+    def predict(self, body):
+        serving = self.server.serving
+        try:
+            record = serving.codec.decode(body)
+        except RequestDecodeError as e:
+            self.send_json(422, {"detail": e.errors})
+            return
+        try:
+            serving.validate_categories(record)
+        except ValueError as ve:
+            self.send_json(400, {"detail": str(ve)})
+            return
+        self.send_json(200, serving.predict([record])[0])
+
+    def predict_batch(self, body):
+        serving = self.server.serving
+        try:
+            items = RequestCodec.load(body)
+        except RequestDecodeError as e:
+            self.send_json(422, {"detail": e.errors})
+            return
+        if not isinstance(items, list):
+            self.send_json(422, {"detail": [{"type": "list_type", "loc": ("body",), "msg": "Input should be a valid list"}]})
+            return
+        if len(items) > MAX_BATCH_SIZE:
+            self.send_json(413, {"detail": f"Batch too large: {len(items)} rows (max {MAX_BATCH_SIZE})"})
+            return
+
+        # Validate every row on its own so one bad row does not fail the batch
+        results = [{"index": i, "predictions": None, "error": None} for i in range(len(items))]
+        rows, row_indices = [], []
+        for i, item in enumerate(items):
+            try:
+                rows.append(serving.decode(item))
+                row_indices.append(i)
+            except ValueError as ve:  # RequestDecodeError included
+                results[i]["error"] = str(ve)
+        if rows:
+            for i, predictions in zip(row_indices, serving.predict(rows)):
+                results[i]["predictions"] = predictions
+        self.send_json(200, results)
+
+
+class PooledHTTPServer:
+    """
+    Selector loop for accepting and idle connections, with a bounded thread
+    pool for the requests themselves
+    """
+
+    def __init__(self, sock, serving, threads=THREADS, max_connections=MAX_CONNECTIONS, idle_timeout=None):
+        self.socket = sock
+        self.socket.setblocking(False)
+        self.serving = serving
+        self.max_connections = max_connections
+        self.idle_timeout = keep_alive() if idle_timeout is None else idle_timeout
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix="simple-server")
+        self.selector = selectors.DefaultSelector()
+        # Connections the workers are done with, waiting to be watched again
+        self.returned = collections.deque()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+        self.idle = {}  # handler -> time it became idle; main thread only
+        self.open_connections = 0
+        self.lock = threading.Lock()
+        self.stopping = False
+
+    def serve_forever(self):
+        self.selector.register(self.socket, selectors.EVENT_READ, "accept")
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, "wakeup")
+        while not self.stopping:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.data == "accept":
+                    self.accept()
+                elif key.data == "wakeup":
+                    try:
+                        self.wakeup_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                else:
+                    handler = key.data
+                    self.selector.unregister(handler.connection)
+                    del self.idle[handler]
+                    self.pool.submit(self.serve_connection, handler)
+            while self.returned:
+                self.watch(self.returned.popleft())
+            self.close_idle()
+
+    def accept(self):
+        while True:
+            try:
+                conn, address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.error(f"accept failed: {e}")
+                return
+            with self.lock:
+                busy = self.open_connections >= self.max_connections
+                if not busy:
+                    self.open_connections += 1
+            if busy:
+                try:
+                    conn.send(BUSY_RESPONSE)
+                except OSError:
+                    pass
+                conn.close()
+                continue
+            conn.setblocking(True)
+            if conn.family != socket.AF_UNIX:
+                # Responses larger than the write buffer go out in several writes; don't let
+                # Nagle hold back the last one until the client's delayed ACK
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.watch(PredictionHandler(conn, address, self))
+
+    def watch(self, handler):
+        self.idle[handler] = time.monotonic()
+        self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+
+    def close_idle(self):
+        if not self.idle:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        for handler in [handler for handler, since in self.idle.items() if since < cutoff]:
+            self.selector.unregister(handler.connection)
+            del self.idle[handler]
+            self.close(handler)
+
+    def serve_connection(self, handler):
+        """
+        Worker: answer the waiting request(s), then give the connection back to the selector
+        """
+        try:
+            while True:
+                handler.close_connection = True
+                handler.handle_one_request()
+                if handler.close_connection:
+                    break
+                if not self.request_waiting(handler):
+                    self.returned.append(handler)
+                    try:
+                        self.wakeup_w.send(b"\0")
+                    except BlockingIOError:
+                        pass  # a wakeup is already pending
+                    return
+        except ConnectionError:
+            pass  # the client went away
+        except Exception:
+            logger.exception("Connection error")
+        self.close(handler)
+
+    @staticmethod
+    def request_waiting(handler):
+        """
+        Whether the next request (or EOF) is already buffered or readable, without blocking
+        """
+        handler.connection.setblocking(False)
+        try:
+            return bool(handler.rfile.peek(1))
+        except OSError:
+            return True  # let handle_one_request see the error
+        finally:
+            handler.connection.settimeout(handler.timeout)
+
+    def close(self, handler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        handler.connection.close()
+        with self.lock:
+            self.open_connections -= 1
+
+    def shutdown(self):
+        self.stopping = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for handler in list(self.idle):
+            self.close(handler)
+        self.selector.close()
+        self.socket.close()
+
+
+def make_server(serving):
+    path = socket_path()
+    if path:
+        sock = bind_unix_socket(path)
+    else:
+        sock = socket.create_server(host_port(), backlog=2048)
+    return PooledHTTPServer(sock, serving)
+
 
 def run_server():
-    server_address = ('127.0.0.1', 8000)
-    httpd = HTTPServer(server_address, SimpleHTTPRequestHandler)
-    print("Starting simple HTTP server on http://127.0.0.1:8000")
+    serving = ServingModel(LITE_MODEL_DIR)
+    startup.mark("model_load")
+    startup.warm_up(serving.warm_up)
+    server = make_server(serving)
+    logger.info(f"Loaded model {serving.version}; starting simple HTTP server on {describe()} with {THREADS} threads")
+    # Stop the loop (and remove a Unix socket) on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda signum, frame: setattr(server, "stopping", True))
     try:
-        httpd.serve_forever()
+        server.serve_forever()
     except KeyboardInterrupt:
-        print("Server stopped by user")
-    except Exception as e:
-        print(f"Server error: {str(e)}")
+        logger.info("Server stopped by user")
+    finally:
+        server.shutdown()
+        path = socket_path()
+        if path and os.path.exists(path):
+            os.unlink(path)
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    run_server()
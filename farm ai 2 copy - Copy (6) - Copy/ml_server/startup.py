@@ -0,0 +1,137 @@
+"""
+Startup timing and readiness for the server entry points.
+
+    from startup import Startup
+    startup = Startup()                 # before the heavy imports
+    ...
+    startup.mark("imports")
+    bundle = get_bundle()
+    startup.mark("model_load")
+    startup.warm_up(bundle.warm_up)     # or: await startup.warm_up_asgi(app, "/predict", body)
+
+GET /ready returns report(), with status 503 until warm-up has succeeded.
+warm_up_asgi() marks its requests in the ASGI scope (see is_warm_up) so
+that metrics and caches can leave them out.
+Phase times are milliseconds since the previous mark. interpreter_ms is
+how long the process ran before Startup() was created (Python itself and
+site-packages), read from /proc where available. Standard library only.
+"""
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ASGI scope key set on warm-up requests
+WARM_UP_SCOPE_KEY = "farm_ai.warm_up"
+
+
+def is_warm_up(scope) -> bool:
+    """
+    True for requests sent by Startup.warm_up_asgi()
+    """
+    return bool(scope.get(WARM_UP_SCOPE_KEY))
+
+
+def process_age() -> Optional[float]:
+    """
+    Seconds since this process started (Linux, 10 ms resolution), or None
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name; starttime is field 22 of the full line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Startup:
+    def __init__(self):
+        age = process_age()
+        self.interpreter_ms = round(age * 1000, 1) if age is not None else None
+        self.started = self.last = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self.last) * 1000, 1)
+        self.last = now
+
+    def warm_up(self, func: Callable[[], Any]):
+        """
+        Run a warm-up prediction; the process reports ready once it succeeds
+        """
+        try:
+            func()
+        except Exception as e:
+            self.fail(e)
+            return
+        self.mark("warmup")
+        self.set_ready()
+
+    async def warm_up_asgi(self, app, path: str, body: bytes, rounds: int = 3):
+        """
+        Send `rounds` POST requests through the whole ASGI app (middleware,
+        routing, decoding, the model and encoding) without a socket
+        """
+        try:
+            for _ in range(rounds):
+                status = await asgi_post(app, path, body, warm_up=True)
+                if status != 200:
+                    raise RuntimeError(f"Warm-up POST {path} returned {status}")
+        except Exception as e:
+            self.fail(e)
+            return
+        self.mark("warmup")
+        self.set_ready()
+
+    def fail(self, error: Exception):
+        self.error = f"Warm-up failed: {error}"
+        logger.error(self.error)
+
+    def set_ready(self):
+        self.ready = True
+        logger.info(f"Ready in {self.total_ms():.0f} ms: {self.phases}"
+                    + (f" (+{self.interpreter_ms:.0f} ms interpreter startup)" if self.interpreter_ms else ""))
+
+    def total_ms(self) -> float:
+        return round((self.last - self.started) * 1000, 1)
+
+    def report(self) -> Dict[str, Any]:
+        report = {"ready": self.ready, "phases_ms": self.phases, "startup_ms": self.total_ms(),
+                  "interpreter_ms": self.interpreter_ms}
+        if self.error:
+            report["error"] = self.error
+        return report
+
+
+async def asgi_post(app, path: str, body: bytes, warm_up: bool = False) -> int:
+    """
+    One POST request straight through the ASGI interface; returns the status
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 0),
+    }
+    if warm_up:
+        scope[WARM_UP_SCOPE_KEY] = True
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0] if status else 0
@@ -0,0 +1,41 @@
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+from model_registry import DEFAULT_MODEL_DIR, ModelBundle
+from model_reloader import ModelReloader
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    return ModelBundle(DEFAULT_MODEL_DIR)
+
+
+def make_reloader(bundle, history):
+    # Every build gets its own version, so swaps can be told apart
+    versions = count()
+    return ModelReloader(lambda _: SimpleNamespace(version=f"v{next(versions)}"), bundle, history=history)
+
+
+def test_history_keeps_the_newest_models(bundle):
+    reloader = make_reloader(bundle, history=2)
+    for _ in range(3):
+        reloader.reload()
+    assert reloader.current.version == "v3"
+    assert [model.version for model, _ in reloader.history] == ["v1", "v2"]
+
+    assert reloader.rollback()["version"] == "v2"
+    assert reloader.rollback()["version"] == "v1"
+    with pytest.raises(ValueError):
+        reloader.rollback()
+
+
+def test_history_zero_keeps_nothing(bundle):
+    reloader = make_reloader(bundle, history=0)
+    for _ in range(3):
+        reloader.reload()
+    assert reloader.current.version == "v3"
+    assert len(reloader.history) == 0
+    with pytest.raises(ValueError):
+        reloader.rollback()
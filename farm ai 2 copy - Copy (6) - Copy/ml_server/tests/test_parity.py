@@ -0,0 +1,157 @@
+"""
+Parity between the fast paths and the code they replace:
+
+- FeatureBuilder against label encoders + column_transformer.transform
+- LiteModel (export_model.py output) against scikit-learn's predict_proba
+- RuleEngine against the original per-crop suitability loop
+
+    cd ml_server
+    python -m pytest tests
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from export_model import export
+from feature_builder import Coded, FeatureBuilder
+from lite_model import LiteModel
+from model_registry import DEFAULT_MODEL_DIR, ModelBundle
+from rule_engine import CROP_REQUIREMENTS, PARAMETERS, RuleEngine, STATE_PREFERENCES
+
+ROWS = 2000
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    return ModelBundle(DEFAULT_MODEL_DIR)
+
+
+@pytest.fixture(scope="module")
+def builder(bundle):
+    return FeatureBuilder.from_sklearn(bundle.label_encoders, bundle.column_transformer)
+
+
+def random_columns(builder, rows, seed=0):
+    """
+    Random values for every input column, drawn from the known categories
+    """
+    rng = np.random.default_rng(seed)
+    categories = builder.categories()
+    columns = {}
+    for col in builder.input_columns:
+        if col in categories:
+            columns[col] = [categories[col][i] for i in rng.integers(0, len(categories[col]), rows)]
+        else:
+            columns[col] = rng.uniform(0, 300, rows)
+    return columns
+
+
+def sklearn_features(bundle, columns):
+    import pandas as pd
+    data = pd.DataFrame(columns)
+    for col, encoder in bundle.label_encoders.items():
+        if col in data.columns:
+            data[col] = encoder.transform(data[col])
+    return bundle.column_transformer.transform(data)
+
+
+def test_feature_builder_matches_column_transformer(bundle, builder):
+    columns = random_columns(builder, ROWS)
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    expected = sklearn_features(bundle, columns)
+
+    assert np.array_equal(builder.transform(records), expected)
+    assert np.array_equal(builder.transform_columns(columns), expected)
+    for i in range(0, ROWS, 97):
+        assert np.array_equal(builder.transform_one(records[i])[0], expected[i])
+
+
+def test_feature_builder_coded_columns(bundle, builder):
+    columns = random_columns(builder, ROWS, seed=1)
+    coded = dict(columns)
+    for col, allowed in builder.categories().items():
+        coded[col] = Coded([allowed.index(value) for value in columns[col]], allowed)
+    assert np.array_equal(builder.transform_columns(coded), sklearn_features(bundle, columns))
+
+
+def test_lite_model_matches_sklearn(bundle, builder, tmp_path):
+    export(DEFAULT_MODEL_DIR, str(tmp_path))
+    lite = LiteModel.load(str(tmp_path))
+    columns = random_columns(builder, ROWS, seed=2)
+
+    expected = bundle.model.predict_proba(sklearn_features(bundle, columns))
+    actual = lite.predict_proba(lite.feature_builder.transform_columns(columns))
+    if lite.multi_class == "multinomial":
+        assert np.array_equal(actual, expected)
+    else:
+        # OvR uses np.exp where scikit-learn uses scipy's expit
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+    assert lite.classes.tolist() == bundle.y_encoder.inverse_transform(bundle.model.classes_).tolist()
+
+
+def original_suitability(data):
+    """
+    The per-crop loop RuleEngine replaced
+    """
+    results = []
+    for crop, requirements in CROP_REQUIREMENTS.items():
+        total_score = 0
+        total_weight = 0
+        for param in PARAMETERS:
+            if param in requirements:
+                value = getattr(data, param)
+                req = requirements[param]
+                min_val, max_val, weight = req['min'], req['max'], req['weight']
+                if min_val <= value <= max_val:
+                    middle = (min_val + max_val) / 2
+                    distance = abs(value - middle) / ((max_val - min_val) / 2)
+                    param_score = 1 - (distance * 0.2)
+                else:
+                    distance = min(abs(value - min_val), abs(value - max_val))
+                    range_size = max_val - min_val
+                    param_score = max(0, 1 - (distance / range_size))
+                total_score += param_score * weight
+                total_weight += weight
+        final_score = 0.5 + (total_score / total_weight) * 0.5 if total_weight > 0 else 0.5
+        if crop in STATE_PREFERENCES and data.state in STATE_PREFERENCES[crop]:
+            final_score += 0.1
+        final_score = min(0.98, max(0.05, final_score))
+        results.append({"crop": crop, "probability": final_score})
+    results.sort(key=lambda x: x["probability"], reverse=True)
+    return results
+
+
+def random_requests(rows, seed=0):
+    """
+    Random requests, with some values exactly on a crop's range limits or middle
+    """
+    rng = np.random.default_rng(seed)
+    states = sorted({state for states in STATE_PREFERENCES.values() for state in states}) + ["Kerala"]
+    edges = {param: sorted({value for req in CROP_REQUIREMENTS.values() if param in req
+                            for value in (req[param]['min'], req[param]['max'],
+                                          (req[param]['min'] + req[param]['max']) / 2)})
+             for param in PARAMETERS}
+    requests = []
+    for _ in range(rows):
+        values = {}
+        for param in PARAMETERS:
+            if rng.random() < 0.3:
+                values[param] = float(rng.choice(edges[param]))
+            else:
+                values[param] = float(rng.uniform(0, 1.5 * max(edges[param])))
+        requests.append(SimpleNamespace(state=states[rng.integers(len(states))], **values))
+    return requests
+
+
+def test_rule_engine_matches_original_loop():
+    from direct_prediction import predict_crop_suitability, predict_crop_suitability_batch
+
+    requests = random_requests(ROWS)
+    expected = [original_suitability(request) for request in requests]
+
+    assert [predict_crop_suitability(request) for request in requests[:200]] == expected[:200]
+    assert predict_crop_suitability_batch(requests) == expected
+    assert RuleEngine().predict_records([vars(request) for request in requests]) == expected
+    assert RuleEngine().predict_records([vars(request) for request in requests], k=5) == \
+        [ranked[:5] for ranked in expected]
@@ -0,0 +1,555 @@
+"""
+Train the crop model, or fold new labeled rows into the current one.
+
+    python train_model.py train crops.csv --output ../models/2026-10-18
+    python train_model.py train crops/*.csv --solver sgd --epochs 5 --output ../models/next
+    python train_model.py update outcomes.csv --model-dir .. --output ../models/next --eval holdout.csv
+
+`train` rebuilds all four artifacts (column transformer, label encoders,
+y encoder, LogisticRegression) from a dataset. With --solver lbfgs (the
+default) the whole dataset is loaded and fitted as the current model was.
+With --solver sgd the files are streamed in chunks: two passes collect the
+categories, classes and feature scales, then each epoch is another pass of
+mini-batch updates, so memory stays at one chunk.
+
+`update` keeps the current column transformer and encoders and continues
+training the current model's weights on the new rows with mini-batch SGD.
+A few epochs over a day's outcomes take seconds. Categories or crops the
+model has never seen need a full `train`.
+
+Datasets are CSV (or Parquet) files with the model's feature columns and a
+`label` (or `crop`) column. Request field names (soil_type, Area, ...) and
+the `feature.` prefix of prediction journal exports are accepted, so
+`prediction_journal.py --csv` output with a label column added can be used
+directly.
+
+The output directory gets the four .pkl files and then, last,
+model_manifest.json. Point MODEL_DIR at it or copy the files in (see
+"Updating the Model Without a Restart"). Timings, memory and evaluation
+scores are printed and, with --report, written as JSON.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from feature_builder import FeatureBuilder
+from model_registry import ARTIFACT_FILES, DEFAULT_MODEL_DIR, ModelBundle, write_manifest
+from request_codec import FIELD_ALIASES
+
+# Input columns, in the order of the current model
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall", "Soil Type", "state", "land_size"]
+CATEGORICAL_COLUMNS = ["Soil Type", "state"]
+LABEL_COLUMNS = ["label", "crop", "Crop"]
+JOURNAL_PREFIX = "feature."
+
+# Same settings as the model that shipped with the repo
+RANDOM_STATE = 2
+
+
+def memory_mb() -> Tuple[Optional[float], Optional[float]]:
+    """
+    (current RSS, peak RSS) of this process in MB from /proc, or (None, None) elsewhere
+    """
+    values = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+class Report:
+    """
+    Wall time and memory per phase, plus whatever else the run wants to record
+    """
+
+    def __init__(self, command: str):
+        self.data: Dict[str, Any] = {"command": command, "phases": []}
+        self.started = self.last = time.perf_counter()
+
+    def phase(self, name: str, **details):
+        now = time.perf_counter()
+        rss, peak = memory_mb()
+        entry = {"phase": name, "seconds": round(now - self.last, 3), "rss_mb": rss, "peak_rss_mb": peak, **details}
+        self.data["phases"].append(entry)
+        self.last = now
+        extra = "".join(f", {key}={value}" for key, value in details.items())
+        memory = f", RSS {rss:.0f} MB (peak {peak:.0f} MB)" if rss is not None else ""
+        print(f"{name}: {entry['seconds']:.2f}s{memory}{extra}", file=sys.stderr)
+
+    def finish(self) -> Dict[str, Any]:
+        self.data["total_seconds"] = round(time.perf_counter() - self.started, 3)
+        return self.data
+
+
+def normalize_columns(frame, label_column: Optional[str] = None):
+    """
+    Model column names for a dataset chunk: journal prefixes stripped, request aliases resolved
+    """
+    renames = {}
+    for column in frame.columns:
+        name = column[len(JOURNAL_PREFIX):] if column.startswith(JOURNAL_PREFIX) else column
+        renames[column] = FIELD_ALIASES.get(name, name)
+    frame = frame.rename(columns=renames)
+    labels = [label_column] if label_column else LABEL_COLUMNS
+    label = next((name for name in labels if name in frame.columns), None)
+    if label is None:
+        raise ValueError(f"No label column (looked for {', '.join(labels)})")
+    return frame, label
+
+
+def read_chunks(paths: Sequence[str], feature_columns: Sequence[str], chunk_size: int,
+                label_column: Optional[str] = None, dropped: Optional[List[int]] = None) -> Iterator[Tuple[Any, np.ndarray]]:
+    """
+    Yield (features DataFrame, labels) chunks from CSV/Parquet files.
+
+    Rows with a missing or non-numeric value are skipped and counted in `dropped`.
+    """
+    import pandas as pd
+    for path in paths:
+        if path.endswith(".parquet"):
+            chunks = [pd.read_parquet(path)]
+        else:
+            chunks = pd.read_csv(path, chunksize=chunk_size)
+        for chunk in chunks:
+            chunk, label = normalize_columns(chunk, label_column)
+            missing = [column for column in feature_columns if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"{path}: columns are missing: {missing}")
+            frame = chunk[list(feature_columns)].copy()
+            for column in feature_columns:
+                if column in CATEGORICAL_COLUMNS:
+                    frame[column] = frame[column].astype("string").str.strip()
+                else:
+                    frame[column] = pd.to_numeric(frame[column], errors="coerce")
+            labels = chunk[label].astype("string").str.strip()
+            keep = frame.notna().all(axis=1) & labels.notna()
+            if dropped is not None:
+                dropped[0] += int((~keep).sum())
+            if keep.any():
+                yield frame[keep].astype({column: object for column in CATEGORICAL_COLUMNS}), \
+                    labels[keep].to_numpy(dtype=object)
+
+
+def encode(feature_builder: FeatureBuilder, frame) -> np.ndarray:
+    return feature_builder.transform_columns({column: frame[column].to_numpy() for column in frame.columns})
+
+
+def build_column_transformer(feature_columns: Sequence[str], categories: Dict[str, List[str]]):
+    """
+    The current model's layout: one-hot categorical columns first, then the numeric ones as they are
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+    categorical = [column for column in feature_columns if column in CATEGORICAL_COLUMNS]
+    return ColumnTransformer(
+        [("encoder", OneHotEncoder(categories=[sorted(categories[column]) for column in categorical]),
+          [feature_columns.index(column) for column in categorical])],
+        remainder="passthrough",
+        # Always dense: the servers' fast path (FeatureBuilder) doesn't take sparse output
+        sparse_threshold=0,
+    )
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+class SoftmaxSGD:
+    """
+    Multinomial logistic regression trained with mini-batch SGD (Adam step
+    sizes), one chunk at a time.
+
+    Inputs are standardized with fixed `mean`/`scale` while training, and the
+    weights are converted back when exported, so the result is an ordinary
+    LogisticRegression on the raw features with the same softmax
+    predict_proba. `alpha` is the L2 penalty per sample.
+    """
+
+    def __init__(self, n_features: int, n_classes: int, mean: Optional[np.ndarray] = None,
+                 scale: Optional[np.ndarray] = None, learning_rate: float = 0.01, alpha: float = 1e-6,
+                 batch_size: int = 256, seed: int = RANDOM_STATE):
+        self.weights = np.zeros((n_features, n_classes))
+        self.bias = np.zeros(n_classes)
+        self.mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.learning_rate = learning_rate
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+        self.epochs = 0
+        self._moments = [np.zeros_like(self.weights), np.zeros_like(self.weights),
+                         np.zeros_like(self.bias), np.zeros_like(self.bias)]
+
+    @classmethod
+    def from_logistic(cls, model, mean: np.ndarray, scale: np.ndarray, **kwargs) -> "SoftmaxSGD":
+        """
+        Start from a fitted multinomial LogisticRegression's weights
+        """
+        sgd = cls(model.coef_.shape[1], model.coef_.shape[0], mean, scale, **kwargs)
+        sgd.weights = model.coef_.T * sgd.scale[:, None]
+        sgd.bias = model.intercept_ + sgd.mean @ model.coef_.T
+        return sgd
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> float:
+        """
+        One pass over (X, y) in shuffled mini-batches; returns the mean log loss seen
+        """
+        X = (X - self.mean) / self.scale
+        order = self.rng.permutation(len(X))
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        # Smaller steps in later epochs, so the weights settle instead of hovering around the optimum
+        step = self.learning_rate / np.sqrt(1 + self.epochs)
+        m_w, v_w, m_b, v_b = self._moments
+        total_loss = 0.0
+        for start in range(0, len(X), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            xb, yb = X[batch], y[batch]
+            probabilities = softmax(xb @ self.weights + self.bias)
+            rows = np.arange(len(batch))
+            total_loss -= np.log(np.maximum(probabilities[rows, yb], 1e-15)).sum()
+            probabilities[rows, yb] -= 1.0
+            grad_w = xb.T @ probabilities / len(batch) + self.alpha * self.weights
+            grad_b = probabilities.mean(axis=0)
+
+            self.steps += 1
+            correction1 = 1 - beta1 ** self.steps
+            correction2 = 1 - beta2 ** self.steps
+            for param, grad, m, v in ((self.weights, grad_w, m_w, v_w), (self.bias, grad_b, m_b, v_b)):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= step * (m / correction1) / (np.sqrt(v / correction2) + eps)
+        return total_loss / max(len(X), 1)
+
+    def coef_intercept(self) -> Tuple[np.ndarray, np.ndarray]:
+        coef = (self.weights / self.scale[:, None]).T
+        intercept = self.bias - (self.mean / self.scale) @ self.weights
+        return np.ascontiguousarray(coef), intercept
+
+    def to_logistic(self, n_classes: int):
+        """
+        A fitted LogisticRegression with these weights, as the servers load it
+        """
+        from sklearn.linear_model import LogisticRegression
+        model = LogisticRegression(random_state=RANDOM_STATE)
+        model.coef_, model.intercept_ = self.coef_intercept()
+        model.classes_ = np.arange(n_classes)
+        model.n_features_in_ = model.coef_.shape[1]
+        model.n_iter_ = np.array([self.epochs], dtype=np.int32)
+        return model
+
+
+def feature_scaling(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and scale used to standardize X for SGD; one-hot columns are left as they are
+    """
+    binary = np.all((X == 0) | (X == 1), axis=0)
+    mean = np.where(binary, 0.0, X.mean(axis=0))
+    scale = np.where(binary, 1.0, X.std(axis=0))
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def evaluate(model, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """
+    Accuracy, top-5 accuracy and log loss of a fitted model on encoded rows
+    """
+    started = time.perf_counter()
+    probabilities = model.predict_proba(X)
+    rows = np.arange(len(y))
+    top5 = np.argsort(probabilities, axis=1)[:, -5:]
+    return {
+        "rows": int(len(y)),
+        "accuracy": round(float((probabilities.argmax(axis=1) == y).mean()), 4),
+        "top5_accuracy": round(float((top5 == y[:, None]).any(axis=1).mean()), 4),
+        "log_loss": round(float(-np.log(np.maximum(probabilities[rows, y], 1e-15)).mean()), 4),
+        "predict_ms_per_1k_rows": round((time.perf_counter() - started) * 1000 / max(len(y), 1) * 1000, 3),
+    }
+
+
+def encode_labels(y_encoder, labels: np.ndarray, what: str) -> np.ndarray:
+    known = set(y_encoder.classes_.tolist())
+    unknown = sorted(set(labels.tolist()) - known)
+    if unknown:
+        raise ValueError(f"{what} has crops the model doesn't know: {unknown}; retrain with `train`")
+    return y_encoder.transform(labels)
+
+
+def load_eval_set(paths, feature_columns, feature_builder, y_encoder, chunk_size, label_column):
+    import pandas as pd
+    chunks = list(read_chunks(paths, feature_columns, chunk_size, label_column))
+    if not chunks:
+        raise ValueError("The evaluation set has no usable rows")
+    frame = pd.concat([frame for frame, _ in chunks])
+    labels = np.concatenate([labels for _, labels in chunks])
+    return encode(feature_builder, frame), encode_labels(y_encoder, labels, "The evaluation set")
+
+
+def save_bundle(output_dir: str, artifacts: Dict[str, Any], copy_from: Optional[ModelBundle] = None) -> Dict[str, Any]:
+    """
+    Write the artifacts (each atomically), copying unchanged ones from `copy_from`, then the manifest last
+    """
+    import joblib
+    os.makedirs(output_dir, exist_ok=True)
+    for name, file_name in ARTIFACT_FILES.items():
+        path = os.path.join(output_dir, file_name)
+        fd, temporary = tempfile.mkstemp(dir=output_dir, prefix=f".{file_name}.")
+        os.close(fd)
+        try:
+            if name in artifacts:
+                joblib.dump(artifacts[name], temporary)
+            else:
+                shutil.copyfile(copy_from.paths[name], temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    return write_manifest(output_dir)
+
+
+def check_loadable(output_dir: str, X: np.ndarray) -> str:
+    """
+    Load the written bundle the way the servers do and score a few rows; returns its version
+    """
+    bundle = ModelBundle(output_dir)
+    feature_builder = FeatureBuilder.from_sklearn(bundle.label_encoders, bundle.column_transformer)
+    if feature_builder.n_features != X.shape[1]:
+        raise ValueError(f"Written model expects {feature_builder.n_features} features, not {X.shape[1]}")
+    probabilities = bundle.model.predict_proba(X[:5])
+    if not np.allclose(probabilities.sum(axis=1), 1.0):
+        raise ValueError("Written model's probabilities don't sum to 1")
+    return bundle.version
+
+
+def train(args, report: Report):
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import LabelEncoder
+
+    feature_columns = FEATURE_COLUMNS
+    dropped = [0]
+
+    def chunks(count_dropped=False):
+        return read_chunks(args.data, feature_columns, args.chunk_size, args.label_column,
+                           dropped if count_dropped else None)
+
+    if args.solver == "lbfgs":
+        frames = list(chunks(count_dropped=True))
+        if not frames:
+            raise ValueError("The dataset has no usable rows")
+        frame = pd.concat([chunk for chunk, _ in frames], ignore_index=True)
+        labels = np.concatenate([chunk_labels for _, chunk_labels in frames])
+        del frames
+        report.phase("load", rows=len(frame), skipped_rows=dropped[0])
+
+        # Categories and classes come from all rows, so the holdout never has one the model lacks
+        categories = {column: frame[column].unique().tolist() for column in CATEGORICAL_COLUMNS}
+        column_transformer = build_column_transformer(feature_columns, categories).fit(frame)
+        y_encoder = LabelEncoder().fit(labels)
+
+        holdout = None
+        if not args.eval and args.holdout > 0:
+            order = np.random.default_rng(RANDOM_STATE).permutation(len(frame))
+            cut = int(len(frame) * args.holdout)
+            holdout = (frame.iloc[order[:cut]], labels[order[:cut]])
+            frame, labels = frame.iloc[order[cut:]], labels[order[cut:]]
+
+        feature_builder = FeatureBuilder.from_sklearn({}, column_transformer)
+        X, y = encode(feature_builder, frame), y_encoder.transform(labels)
+        report.phase("encode", features=X.shape[1], classes=len(y_encoder.classes_))
+
+        model = LogisticRegression(random_state=RANDOM_STATE, max_iter=args.max_iter, C=args.C).fit(X, y)
+        report.phase("fit", iterations=int(np.max(model.n_iter_)))
+        train_X, train_y = X, y
+    else:
+        # Categories and classes, then feature scales, one chunk at a time
+        categories: Dict[str, set] = {column: set() for column in CATEGORICAL_COLUMNS}
+        classes = set()
+        rows = 0
+        first = None
+        for frame, labels in chunks(count_dropped=True):
+            for column in CATEGORICAL_COLUMNS:
+                categories[column].update(frame[column].unique().tolist())
+            classes.update(labels.tolist())
+            rows += len(frame)
+            if first is None:
+                first = (frame, labels)
+        if first is None:
+            raise ValueError("The dataset has no usable rows")
+        column_transformer = build_column_transformer(feature_columns, categories).fit(first[0])
+        y_encoder = LabelEncoder().fit(sorted(classes))
+        feature_builder = FeatureBuilder.from_sklearn({}, column_transformer)
+        sums = np.zeros(feature_builder.n_features)
+        squares = np.zeros(feature_builder.n_features)
+        for frame, _ in chunks():
+            X = encode(feature_builder, frame)
+            sums += X.sum(axis=0)
+            squares += (X * X).sum(axis=0)
+        mean = sums / rows
+        scale = np.sqrt(np.maximum(squares / rows - mean * mean, 0.0))
+        onehot = column_transformer.output_indices_["encoder"]
+        mean[onehot], scale[onehot] = 0.0, 1.0
+        scale[scale == 0] = 1.0
+        report.phase("scan", rows=rows, skipped_rows=dropped[0], features=feature_builder.n_features,
+                     classes=len(y_encoder.classes_))
+
+        sgd = SoftmaxSGD(feature_builder.n_features, len(y_encoder.classes_), mean, scale,
+                         learning_rate=args.learning_rate, alpha=args.alpha, batch_size=args.batch_size)
+        for epoch in range(args.epochs):
+            losses = []
+            for frame, labels in chunks():
+                losses.append(sgd.partial_fit(encode(feature_builder, frame), y_encoder.transform(labels)))
+            sgd.epochs += 1
+            report.phase(f"epoch {epoch + 1}", train_log_loss=round(float(np.mean(losses)), 4))
+        model = sgd.to_logistic(len(y_encoder.classes_))
+        # Without --eval, the first chunk stands in for an evaluation set
+        train_X, train_y = encode(feature_builder, first[0]), y_encoder.transform(first[1])
+        holdout = None
+
+    if args.eval:
+        eval_X, eval_y = load_eval_set(args.eval, feature_columns, feature_builder, y_encoder, args.chunk_size,
+                                       args.label_column)
+    elif holdout is not None:
+        eval_X, eval_y = encode(feature_builder, holdout[0]), encode_labels(y_encoder, holdout[1], "The holdout")
+    else:
+        eval_X, eval_y = train_X, train_y
+    scores = evaluate(model, eval_X, eval_y)
+    report.phase("evaluate", **{key: scores[key] for key in ("rows", "accuracy", "top5_accuracy", "log_loss")})
+    report.data["evaluation"] = {"set": "eval" if args.eval else "holdout" if holdout is not None else "train",
+                                 **scores}
+
+    manifest = save_bundle(args.output, {"model": model, "label_encoders": {}, "column_transformer": column_transformer,
+                                         "y_encoder": y_encoder})
+    version = check_loadable(args.output, eval_X)
+    report.phase("save", version=manifest["version"])
+    report.data.update(version=version, output=os.path.abspath(args.output), solver=args.solver,
+                       classes=y_encoder.classes_.tolist())
+
+
+def update(args, report: Report):
+    bundle = ModelBundle(args.model_dir)
+    model = bundle.model
+    if type(model).__name__ != "LogisticRegression" or model.coef_.shape[0] < 3:
+        raise ValueError(f"Can only update a multinomial LogisticRegression, got {type(model).__name__}")
+    column_transformer = bundle.column_transformer
+    y_encoder = bundle.y_encoder
+    feature_builder = FeatureBuilder.from_sklearn(bundle.label_encoders, column_transformer)
+    feature_columns = [str(column) for column in column_transformer.feature_names_in_]
+    report.phase("load model", version=bundle.version)
+
+    # The new rows are usually small enough to keep encoded in memory across epochs
+    dropped = [0]
+    X_parts, y_parts = [], []
+    for frame, labels in read_chunks(args.data, feature_columns, args.chunk_size, args.label_column, dropped):
+        try:
+            X_parts.append(encode(feature_builder, frame))
+        except ValueError as e:
+            raise ValueError(f"{e}; new categories need a full `train`")
+        y_parts.append(encode_labels(y_encoder, labels, "The new data"))
+    if not X_parts:
+        raise ValueError("The new data has no usable rows")
+    X, y = np.concatenate(X_parts), np.concatenate(y_parts)
+    del X_parts, y_parts
+    report.phase("load data", rows=len(X), skipped_rows=dropped[0])
+
+    evaluation = {}
+    eval_X = eval_y = None
+    if args.eval:
+        eval_X, eval_y = load_eval_set(args.eval, feature_columns, feature_builder, y_encoder, args.chunk_size,
+                                       args.label_column)
+        evaluation["before"] = evaluate(model, eval_X, eval_y)
+    evaluation["new_data_before"] = evaluate(model, X, y)
+    report.phase("evaluate before", accuracy_new=evaluation["new_data_before"]["accuracy"],
+                 **({"accuracy_eval": evaluation["before"]["accuracy"]} if args.eval else {}))
+
+    mean, scale = feature_scaling(X)
+    sgd = SoftmaxSGD.from_logistic(model, mean, scale, learning_rate=args.learning_rate, alpha=args.alpha,
+                                   batch_size=args.batch_size)
+    for epoch in range(args.epochs):
+        loss = sgd.partial_fit(X, y)
+        sgd.epochs += 1
+        report.phase(f"epoch {epoch + 1}", train_log_loss=round(loss, 4))
+    updated = sgd.to_logistic(len(model.classes_))
+    updated.classes_ = model.classes_
+
+    evaluation["new_data_after"] = evaluate(updated, X, y)
+    if args.eval:
+        evaluation["after"] = evaluate(updated, eval_X, eval_y)
+    report.phase("evaluate after", accuracy_new=evaluation["new_data_after"]["accuracy"],
+                 **({"accuracy_eval": evaluation["after"]["accuracy"]} if args.eval else {}))
+    report.data["evaluation"] = evaluation
+
+    if args.output:
+        # Only the model changes; the encoders are copied byte for byte
+        manifest = save_bundle(args.output, {"model": updated}, copy_from=bundle)
+        version = check_loadable(args.output, X)
+        report.phase("save", version=manifest["version"])
+        report.data.update(version=version, output=os.path.abspath(args.output))
+    report.data.update(base_version=bundle.version, epochs=args.epochs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def common(command):
+        command.add_argument("data", nargs="+", help="CSV or Parquet files with the features and a label column")
+        command.add_argument("--label-column", help="name of the label column (default: label, crop or Crop)")
+        command.add_argument("--eval", nargs="+", help="labeled files to evaluate on")
+        command.add_argument("--chunk-size", type=int, default=50000, help="rows read at a time")
+        command.add_argument("--batch-size", type=int, default=256, help="SGD mini-batch size")
+        command.add_argument("--alpha", type=float, default=1e-6, help="SGD L2 penalty per row")
+        command.add_argument("--report", help="write timings, memory and scores as JSON here")
+
+    train_parser = commands.add_parser("train", help="build all artifacts from a dataset")
+    common(train_parser)
+    train_parser.add_argument("--output", required=True, help="directory to write the model files to")
+    train_parser.add_argument("--solver", choices=["lbfgs", "sgd"], default="lbfgs",
+                              help="lbfgs loads everything into memory; sgd streams the files")
+    train_parser.add_argument("--holdout", type=float, default=0.2,
+                              help="fraction held out for evaluation without --eval (lbfgs only)")
+    train_parser.add_argument("--max-iter", type=int, default=1000, help="lbfgs iterations")
+    train_parser.add_argument("--C", type=float, default=1.0, help="lbfgs inverse regularization strength")
+    train_parser.add_argument("--epochs", type=int, default=10, help="passes over the data (sgd)")
+    train_parser.add_argument("--learning-rate", type=float, default=0.05, help="SGD step size")
+
+    update_parser = commands.add_parser("update", help="continue training the current model on new rows")
+    common(update_parser)
+    update_parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="model to start from")
+    update_parser.add_argument("--output", help="directory to write the updated model to (default: evaluate only)")
+    update_parser.add_argument("--epochs", type=int, default=3, help="passes over the new rows")
+    update_parser.add_argument("--learning-rate", type=float, default=0.001, help="SGD step size")
+    args = parser.parse_args()
+
+    report = Report(args.command)
+    try:
+        train(args, report) if args.command == "train" else update(args, report)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    result = report.finish()
+    print(json.dumps(result, indent=2) if not args.report else f"Wrote {args.report}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import os
-import pickle
+import sys
 import logging
 from typing import Dict
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, validator
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'ml_server'))
+from model_registry import get_bundle
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,19 +17,11 @@ logger = logging.getLogger(__name__)
 
 # Load all required models and transformers
 try:
-    base_path = os.path.dirname(__file__)
-    
-    with open(os.path.join(base_path, 'LogReg.pkl'), 'rb') as f:
-        model = pickle.load(f)
-    
-    with open(os.path.join(base_path, 'column_transformer.pkl'), 'rb') as f:
-        column_transformer = pickle.load(f)
-    
-    with open(os.path.join(base_path, 'label_encoders.pkl'), 'rb') as f:
-        label_encoders = pickle.load(f)
-    
-    with open(os.path.join(base_path, 'y_encoder.pkl'), 'rb') as f:
-        y_encoder = pickle.load(f)
+    bundle = get_bundle()
+    model = bundle.model
+    column_transformer = bundle.column_transformer
+    label_encoders = bundle.label_encoders
+    y_encoder = bundle.y_encoder
         
     logger.info("All models and transformers loaded successfully")
 except Exception as e:
@@ -0,0 +1,171 @@
+"""
+Measure request decode + response encode overhead of a /predict endpoint.
+
+    python scripts/benchmark_codec.py
+    python scripts/benchmark_codec.py --requests 50000 --schema form
+
+FastAPI apps that skip the model and return a fixed top-5 list are called
+directly through ASGI (no sockets), so the time per request is framework,
+decoding and encoding work only:
+
+- baseline: reads the body and returns pre-encoded bytes (routing and
+  middleware cost, subtracted from the others as "overhead")
+- pydantic: `CropRequest` body model dumped to a dict, and
+  `response_model=List[CropPrediction]`, as the servers did before
+- codec: raw body through `request_codec.RequestCodec` and `dumps`
+
+--schema form sends the capitalized schema (pH, State, Area, Soil_Type),
+which only the codec app accepts.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+from fastapi import FastAPI, Request, Response
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ml_server'))
+from request_codec import RequestCodec, dumps, orjson
+
+COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall", "Soil Type", "state", "land_size"]
+RESULT = [{"crop": crop, "probability": p} for crop, p in
+          [("mango", 0.9958), ("jute", 0.0039), ("rice", 0.0001), ("coffee", 0.00005), ("banana", 0.00001)]]
+
+BODIES = {
+    "api": {"state": "Punjab", "N": 50, "P": 40, "K": 30, "temperature": 25.5, "humidity": 50, "ph": 6.9,
+            "rainfall": 132, "soil_type": "Sandy", "land_size": 30},
+    "form": {"N": 50, "P": 40, "K": 30, "Temperature": 25.5, "Humidity": 50, "pH": 6.9, "Rainfall": 132,
+             "State": "Punjab", "Area": 30, "Soil_Type": "Sandy"},
+}
+
+
+class CropPrediction(BaseModel):
+    crop: str
+    probability: float
+
+
+class CropRequest(BaseModel):
+    state: str
+    N: float
+    P: float
+    K: float
+    temperature: float
+    humidity: float
+    ph: float
+    rainfall: float
+    soil_type: str
+    land_size: float
+
+
+def baseline_app() -> FastAPI:
+    app = FastAPI()
+    encoded = dumps(RESULT)
+
+    @app.post("/predict")
+    async def predict(request: Request):
+        await request.body()
+        return Response(encoded, media_type="application/json")
+
+    return app
+
+
+def pydantic_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/predict", response_model=List[CropPrediction])
+    async def predict(request: CropRequest):
+        input_data = request.model_dump()
+        input_data['state'] = input_data['state'].capitalize()
+        input_data['Soil Type'] = input_data.pop('soil_type').capitalize()
+        return RESULT
+
+    return app
+
+
+def codec_app() -> FastAPI:
+    app = FastAPI()
+    codec = RequestCodec(COLUMNS, ["Soil Type", "state"], normalize=str.capitalize)
+
+    @app.post("/predict")
+    async def predict(request: Request):
+        codec.decode(await request.body())
+        return Response(dumps(RESULT), media_type="application/json")
+
+    return app
+
+
+async def call(app, body: bytes):
+    """
+    One POST /predict straight through the ASGI interface; returns the status
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/predict", "raw_path": b"/predict", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run(app, body: bytes, requests: int, rounds: int) -> List[float]:
+    """
+    Microseconds per request for each round
+    """
+    status = await call(app, body)
+    if status != 200:
+        raise SystemExit(f"Request rejected with {status}")
+    for _ in range(min(requests, 1000)):  # warm-up
+        await call(app, body)
+    per_request = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await call(app, body)
+        per_request.append((time.perf_counter() - started) / requests * 1e6)
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--schema", choices=sorted(BODIES), default="api")
+    args = parser.parse_args()
+
+    body = json.dumps(BODIES[args.schema]).encode()
+    apps = {"baseline": baseline_app(), "codec": codec_app()}
+    if args.schema == "api":
+        apps["pydantic"] = pydantic_app()
+
+    report = {"schema": args.schema, "orjson": orjson is not None}
+    for name, app in apps.items():
+        rounds = asyncio.run(run(app, body, args.requests, args.rounds))
+        report[name] = {"median_us": round(statistics.median(rounds), 2), "min_us": round(min(rounds), 2)}
+        if name != "baseline":
+            report[name]["overhead_us"] = round(report[name]["median_us"] - report["baseline"]["median_us"], 2)
+        print(f"{name:>9}: {report[name]['median_us']:8.2f} us/request (best {report[name]['min_us']:.2f})"
+              + (f", decode+encode {report[name]['overhead_us']:.2f} us" if name != "baseline" else ""))
+    if "pydantic" in report:
+        report["speedup"] = round(report["pydantic"]["overhead_us"] / report["codec"]["overhead_us"], 2)
+        print(f"  decode+encode speedup: {report['speedup']}x")
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
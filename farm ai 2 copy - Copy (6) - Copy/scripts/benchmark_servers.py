@@ -0,0 +1,466 @@
+"""
+HTTP load test for the Python prediction servers.
+
+    python scripts/benchmark_servers.py
+    python scripts/benchmark_servers.py --servers crop_recommendation_server app --concurrency 1 8 32
+    python scripts/benchmark_servers.py --mix predict=0.8,repeat=0.1,invalid=0.1 --duration 20
+    python scripts/benchmark_servers.py --output report.json --baseline old_report.json
+    python scripts/benchmark_servers.py --servers crop_recommendation_server --transports tcp unix
+
+Every server listens on 127.0.0.1:8000, so they are started one at a time.
+With --transports unix a server is started with ML_SERVER_SOCKET and driven
+over a Unix domain socket instead; listing both runs the same request mix
+over each so the transports can be compared. Each one is driven by --concurrency client threads (one keep-alive
+connection each) for --duration seconds after a warm-up. Payloads are based
+on temp/input_*.json with randomized values. The report has throughput,
+p50/p95/p99 latency, error rate and peak RSS per server and concurrency
+level; it is printed as a table and written as JSON with --output. With
+--baseline, the run fails if throughput or p95 latency regressed by more
+than --max-regression.
+"""
+import argparse
+import glob
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+PORT = 8000
+TRANSPORTS = ["tcp", "unix"]
+
+# script, request schema, whether it has POST /predict/batch, whether it can listen on ML_SERVER_SOCKET
+SERVERS = {
+    "crop_recommendation_server": {"script": "ml_server/crop_recommendation_server.py", "schema": "api", "batch": True,
+                                   "unix": True},
+    "direct_prediction": {"script": "ml_server/direct_prediction.py", "schema": "api", "batch": True, "unix": True},
+    "simple_server": {"script": "ml_server/simple_server.py", "schema": "api", "batch": True, "unix": True},
+    "main": {"script": "ml_server/main.py", "schema": "form", "batch": False, "unix": False},
+    "app": {"script": "app.py", "schema": "api", "batch": False, "unix": True},
+}
+
+# Values the model was trained on (single-word states, as the servers capitalize the first letter only)
+STATES = ["Punjab", "Gujarat", "Karnataka", "Maharashtra", "Rajasthan"]
+SOIL_TYPES = ["Black", "Clayey", "Loamy", "Red", "Sandy"]
+
+REQUEST_KINDS = ["predict", "repeat", "invalid", "batch"]
+
+
+def load_form_payloads():
+    """
+    Sample inputs in the form schema used by the Next.js page (temp/input_*.json)
+    """
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "temp", "input_*.json"))):
+        with open(path) as f:
+            payloads.append(json.load(f))
+    if not payloads:
+        payloads.append({"N": 50, "P": 40, "K": 30, "Temperature": 25, "Humidity": 50, "pH": 6.9,
+                         "Rainfall": 132, "State": "Punjab", "Area": 30, "Soil_Type": "Sandy"})
+    return payloads
+
+
+def to_api_schema(form):
+    return {
+        "state": form.get("State", "Punjab"),
+        "N": form.get("N", 0),
+        "P": form.get("P", 0),
+        "K": form.get("K", 0),
+        "temperature": form.get("Temperature", 25),
+        "humidity": form.get("Humidity", 80),
+        "ph": form.get("pH", 6.5),
+        "rainfall": form.get("Rainfall", 200),
+        "soil_type": form.get("Soil_Type", "Loamy"),
+        "land_size": form.get("Area", 1.0),
+    }
+
+
+def randomize(form, rng):
+    form = dict(form)
+    for key, spread in (("N", 40), ("P", 30), ("K", 30), ("Temperature", 8), ("Humidity", 20),
+                        ("pH", 1.0), ("Rainfall", 80), ("Area", 10)):
+        if key in form:
+            form[key] = round(max(0.0, float(form[key]) + rng.uniform(-spread, spread)), 2)
+    form["State"] = rng.choice(STATES)
+    form["Soil_Type"] = rng.choice(SOIL_TYPES)
+    return form
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind {kind!r} (choose from {REQUEST_KINDS})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def build_requests(server, mix, batch_size, count, seed):
+    """
+    Pre-generated (kind, path, body) tuples so the client threads only send
+    """
+    rng = random.Random(seed)
+    base = load_form_payloads()
+    schema = SERVERS[server]["schema"]
+    convert = to_api_schema if schema == "api" else dict
+
+    kinds = [kind for kind in mix if kind != "batch" or SERVERS[server]["batch"]]
+    weights = [mix[kind] for kind in kinds]
+    repeated = json.dumps(convert(base[0])).encode()
+
+    requests = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "repeat":
+            requests.append((kind, "/predict", repeated))
+        elif kind == "invalid":
+            payload = convert(randomize(rng.choice(base), rng))
+            payload["state" if schema == "api" else "State"] = "Atlantis"
+            requests.append((kind, "/predict", json.dumps(payload).encode()))
+        elif kind == "batch":
+            rows = [convert(randomize(rng.choice(base), rng)) for _ in range(batch_size)]
+            requests.append((kind, "/predict/batch", json.dumps(rows).encode()))
+        else:
+            requests.append((kind, "/predict", json.dumps(convert(randomize(rng.choice(base), rng))).encode()))
+    return requests
+
+
+def port_in_use(host, port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex((host, port)) == 0
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def connector(socket_path):
+    """
+    Factory for keep-alive connections to the server under test: TCP, or the Unix socket if given
+    """
+    if socket_path:
+        return lambda timeout: UnixHTTPConnection(socket_path, timeout)
+    return lambda timeout: http.client.HTTPConnection(HOST, PORT, timeout=timeout)
+
+
+def read_memory_kb(pid):
+    """
+    (current RSS, peak RSS) in kB from /proc, or (None, None) elsewhere
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    values[line.split(":")[0]] = int(line.split()[1])
+    except OSError:
+        return None, None
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+class ServerProcess:
+    def __init__(self, name, env, startup_timeout, socket_path=None):
+        self.name = name
+        self.env = dict(env, ML_SERVER_SOCKET=socket_path) if socket_path else env
+        self.startup_timeout = startup_timeout
+        self.connect = connector(socket_path)
+        self.process = None
+        self.log = None
+
+    def start(self):
+        script = os.path.join(BASE_DIR, SERVERS[self.name]["script"])
+        self.log = tempfile.NamedTemporaryFile(prefix=f"bench_{self.name}_", suffix=".log", delete=False)
+        env = dict(os.environ, **self.env)
+        started = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, script], cwd=os.path.dirname(script), env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        while time.perf_counter() - started < self.startup_timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"exited with status {self.process.returncode} (log: {self.log.name})")
+            try:
+                conn = self.connect(1)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                conn.close()
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"not ready after {self.startup_timeout:.0f}s (log: {self.log.name})")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log:
+            self.log.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def drive(requests, concurrency, duration, timeout, connect):
+    """
+    Send requests from `concurrency` threads until `duration` elapses.
+    Returns a list of (kind, latency_seconds, status or None) per request.
+    """
+    results = []
+    results_lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    headers = {"Content-Type": "application/json"}
+
+    def client(offset):
+        local = []
+        conn = connect(timeout)
+        i = offset
+        while time.perf_counter() < stop_at:
+            kind, path, body = requests[i % len(requests)]
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                conn.request("POST", path, body, headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = None
+                conn.close()
+                conn = connect(timeout)
+            local.append((kind, time.perf_counter() - started, status))
+        conn.close()
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results, duration):
+    latencies = sorted(latency for _, latency, _ in results)
+    # "invalid" requests are expected to get a 4xx; everything else should be 2xx
+    errors = sum(1 for kind, _, status in results
+                 if status is None or status >= 500 or (kind != "invalid" and status >= 400))
+    by_kind = {}
+    for kind, _, _ in results:
+        by_kind[kind] = by_kind.get(kind, 0) + 1
+    return {
+        "requests": len(results),
+        "throughput_rps": len(results) / duration,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1000 if latencies else None,
+            "p50": percentile(latencies, 0.50) * 1000 if latencies else None,
+            "p95": percentile(latencies, 0.95) * 1000 if latencies else None,
+            "p99": percentile(latencies, 0.99) * 1000 if latencies else None,
+            "max": latencies[-1] * 1000 if latencies else None,
+        },
+        "errors": errors,
+        "error_rate": errors / len(results) if results else None,
+        "requests_by_kind": by_kind,
+    }
+
+
+def benchmark_server(name, transport, args):
+    report = {"server": name, "transport": transport, "script": SERVERS[name]["script"], "runs": []}
+    socket_path = None
+    if transport == "unix":
+        if not SERVERS[name]["unix"]:
+            report["error"] = "server has no Unix socket support"
+            return report
+        socket_path = os.path.join(tempfile.mkdtemp(prefix="bench_"), "ml.sock")
+    elif port_in_use(HOST, PORT):
+        report["error"] = f"port {PORT} is already in use"
+        return report
+
+    server = ServerProcess(name, args.env, args.startup_timeout, socket_path)
+    try:
+        report["startup_seconds"] = server.start()
+        pid = server.process.pid
+        report["rss_after_startup_mb"] = (read_memory_kb(pid)[0] or 0) / 1024 or None
+        requests = build_requests(name, args.mix, args.batch_size, args.pool_size, args.seed)
+
+        for concurrency in args.concurrency:
+            drive(requests, concurrency, args.warmup, args.timeout, server.connect)
+
+            peak = {"rss": 0}
+            sampling = threading.Event()
+
+            def sample_memory():
+                while not sampling.wait(0.2):
+                    rss, _ = read_memory_kb(pid)
+                    peak["rss"] = max(peak["rss"], rss or 0)
+
+            sampler = threading.Thread(target=sample_memory, daemon=True)
+            sampler.start()
+            results = drive(requests, concurrency, args.duration, args.timeout, server.connect)
+            sampling.set()
+            sampler.join()
+
+            run = {"concurrency": concurrency, **summarize(results, args.duration)}
+            run["peak_rss_mb"] = peak["rss"] / 1024 or None
+            report["runs"].append(run)
+            print(f"  {name} {transport} c={concurrency}: {run['throughput_rps']:.0f} req/s, "
+                  f"p95 {run['latency_ms']['p95'] or 0:.2f} ms, errors {run['errors']}", file=sys.stderr)
+
+        report["peak_rss_hwm_mb"] = (read_memory_kb(pid)[1] or 0) / 1024 or None
+    except RuntimeError as e:
+        report["error"] = str(e)
+    finally:
+        server.stop()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            os.rmdir(os.path.dirname(socket_path))
+    return report
+
+
+def format_table(reports):
+    header = ["server", "transport", "conc", "req/s", "p50 ms", "p95 ms", "p99 ms", "err %", "peak RSS MB"]
+    rows = []
+    for report in reports:
+        if report.get("error"):
+            rows.append([report["server"], report.get("transport", "tcp"), "-", "-", "-", "-", "-", "-",
+                         f"error: {report['error']}"])
+            continue
+        for run in report["runs"]:
+            latency = run["latency_ms"]
+            rows.append([
+                report["server"], report.get("transport", "tcp"), str(run["concurrency"]), f"{run['throughput_rps']:.0f}",
+                f"{latency['p50']:.2f}" if latency["p50"] is not None else "-",
+                f"{latency['p95']:.2f}" if latency["p95"] is not None else "-",
+                f"{latency['p99']:.2f}" if latency["p99"] is not None else "-",
+                f"{run['error_rate'] * 100:.1f}" if run["error_rate"] is not None else "-",
+                f"{run['peak_rss_mb']:.0f}" if run["peak_rss_mb"] else "-",
+            ])
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(header, widths)).rstrip()]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+    return "\n".join(lines)
+
+
+def compare_with_baseline(reports, baseline_path, max_regression):
+    """
+    Regressions of throughput or p95 latency beyond max_regression (a fraction)
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    # Reports from before --transports only have TCP runs
+    old_runs = {(report["server"], report.get("transport", "tcp"), run["concurrency"]): run
+                for report in baseline.get("servers", []) for run in report.get("runs", [])}
+    regressions = []
+    for report in reports:
+        for run in report.get("runs", []):
+            transport = report.get("transport", "tcp")
+            old = old_runs.get((report["server"], transport, run["concurrency"]))
+            if not old:
+                continue
+            label = f"{report['server']} {transport} c={run['concurrency']}"
+            if run["throughput_rps"] < old["throughput_rps"] * (1 - max_regression):
+                regressions.append(f"{label}: throughput {old['throughput_rps']:.0f} -> {run['throughput_rps']:.0f} req/s")
+            old_p95, new_p95 = old["latency_ms"]["p95"], run["latency_ms"]["p95"]
+            if old_p95 and new_p95 and new_p95 > old_p95 * (1 + max_regression):
+                regressions.append(f"{label}: p95 {old_p95:.2f} -> {new_p95:.2f} ms")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=["tcp"],
+                        help="run each server over TCP, a Unix domain socket, or both")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load before each run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=1"),
+                        help=f"weighted request kinds, e.g. predict=0.8,repeat=0.1,invalid=0.05,batch=0.05 "
+                             f"(kinds: {', '.join(REQUEST_KINDS)}; batch is skipped for servers without /predict/batch)")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per /predict/batch request")
+    parser.add_argument("--pool-size", type=int, default=5000, help="number of distinct pre-built requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="environment variable for the servers, e.g. --env LOG_SAMPLE_RATES=request=0")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed throughput drop / p95 increase against --baseline (fraction)")
+    args = parser.parse_args()
+    args.env = dict(item.split("=", 1) for item in args.env)
+
+    reports = []
+    for name in args.servers:
+        for transport in args.transports:
+            print(f"Benchmarking {name} over {transport}", file=sys.stderr)
+            reports.append(benchmark_server(name, transport, args))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "transports": args.transports, "concurrency": args.concurrency, "duration": args.duration,
+            "warmup": args.warmup, "mix": args.mix, "batch_size": args.batch_size, "env": args.env,
+        },
+        "servers": reports,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    print(format_table(reports), file=sys.stderr)
+
+    if args.baseline:
+        regressions = compare_with_baseline(reports, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Cold-start benchmark for every Python entry point.
+
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --servers simple_server crop_recommendation_server --runs 10
+    python scripts/benchmark_startup.py --output startup.json --budget-ms 2000
+
+Each server is started --runs times from scratch. For every start this
+records the time from spawning the process until it accepts connections,
+until GET /ready answers 200, and until the first POST /predict has been
+answered, plus the latency of that first request and of the one after it.
+The phase times each server reports on /ready (imports, model_load, warmup)
+and its RSS are recorded too. The Next.js prediction worker
+(app/api/predict/predict_crop.py --worker) is measured the same way, from
+spawn to its {"ready": true} line and to its first response.
+
+Medians per entry point are printed as a table and written as JSON with
+--output. With --budget-ms the run fails if any entry point's median time
+to first prediction is over the budget.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_servers import (BASE_DIR, HOST, PORT, SERVERS, git_commit, load_form_payloads, port_in_use,
+                               read_memory_kb, to_api_schema)
+
+WORKER = "predict_crop_worker"
+WORKER_SCRIPT = "app/api/predict/predict_crop.py"
+METRICS = ["listening_ms", "ready_ms", "first_prediction_ms", "first_request_ms", "second_request_ms"]
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def get(path, timeout=1.0):
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def post(conn, path, body):
+    started = time.perf_counter()
+    conn.request("POST", path, body, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    return response.status, elapsed_ms(started)
+
+
+def start_server(name, env, timeout):
+    """
+    One cold start of an HTTP server; returns the measurements for it
+    """
+    script = os.path.join(BASE_DIR, SERVERS[name]["script"])
+    form = load_form_payloads()[0]
+    body = json.dumps(to_api_schema(form) if SERVERS[name]["schema"] == "api" else form).encode()
+    log = tempfile.NamedTemporaryFile(prefix=f"startup_{name}_", suffix=".log", delete=False)
+    run = {}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script], cwd=os.path.dirname(script), env=dict(os.environ, **env),
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"exited with status {process.returncode} (log: {log.name})")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"not ready after {timeout:.0f}s (log: {log.name})")
+            try:
+                status, content = get("/ready")
+            except OSError:
+                time.sleep(0.005)
+                continue
+            run.setdefault("listening_ms", elapsed_ms(started))
+            if status == 200:
+                run["ready_ms"] = elapsed_ms(started)
+                run["startup"] = json.loads(content)
+                break
+            if status == 404:
+                # No readiness endpoint: listening is the best signal there is
+                run["ready_ms"] = run["listening_ms"]
+                break
+            time.sleep(0.005)
+
+        conn = http.client.HTTPConnection(HOST, PORT, timeout=timeout)
+        run["first_status"], run["first_request_ms"] = post(conn, "/predict", body)
+        run["first_prediction_ms"] = elapsed_ms(started)
+        run["second_status"], run["second_request_ms"] = post(conn, "/predict", body)
+        conn.close()
+        run["rss_mb"] = round((read_memory_kb(process.pid)[0] or 0) / 1024, 1) or None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
+    os.unlink(log.name)
+    return run
+
+
+def start_worker(timeout):
+    """
+    One cold start of the Next.js prediction worker, driven over stdin/stdout like lib/prediction-worker-pool.ts
+    """
+    script = os.path.join(BASE_DIR, WORKER_SCRIPT)
+    request = json.dumps({"id": 1, "input": load_form_payloads()[0]}) + "\n"
+    run = {}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script, "--worker"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    try:
+        ready = json.loads(process.stdout.readline() or "{}")
+        if not ready.get("ready"):
+            raise RuntimeError(ready.get("error", f"exited with status {process.poll()}"))
+        run["listening_ms"] = run["ready_ms"] = elapsed_ms(started)
+        run["startup"] = ready.get("startup")
+        for attempt in ("first", "second"):
+            sent = time.perf_counter()
+            process.stdin.write(request)
+            response = json.loads(process.stdout.readline())
+            run[f"{attempt}_request_ms"] = elapsed_ms(sent)
+            run[f"{attempt}_status"] = "error" if "error" in response else "ok"
+            if attempt == "first":
+                run["first_prediction_ms"] = elapsed_ms(started)
+        run["rss_mb"] = round((read_memory_kb(process.pid)[0] or 0) / 1024, 1) or None
+    finally:
+        process.kill()
+        process.wait()
+    return run
+
+
+def summarize(name, runs):
+    report = {"entry_point": name, "runs": runs}
+    for metric in METRICS + ["rss_mb"]:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        report[metric] = round(statistics.median(values), 1) if values else None
+    phases = {}
+    for run in runs:
+        for phase, ms in ((run.get("startup") or {}).get("phases_ms") or {}).items():
+            phases.setdefault(phase, []).append(ms)
+    report["phases_ms"] = {phase: round(statistics.median(values), 1) for phase, values in phases.items()}
+    report["first_status"] = runs[-1].get("first_status") if runs else None
+    return report
+
+
+def format_table(reports):
+    header = ["entry point", "imports", "model", "warmup", "listening", "ready", "1st predict", "1st req",
+              "2nd req", "status", "RSS MB"]
+    rows = []
+    for report in reports:
+        if report.get("error"):
+            rows.append([report["entry_point"]] + ["-"] * (len(header) - 2) + [f"error: {report['error']}"])
+            continue
+        phases = report["phases_ms"]
+        cells = [phases.get("imports"), phases.get("model_load"), phases.get("warmup")]
+        cells += [report[metric] for metric in ("listening_ms", "ready_ms", "first_prediction_ms",
+                                                "first_request_ms", "second_request_ms")]
+        rows.append([report["entry_point"]] + [f"{value:.0f}" if value is not None else "-" for value in cells[:5]]
+                    + [f"{value:.1f}" if value is not None else "-" for value in cells[5:]]
+                    + [str(report["first_status"]), f"{report['rss_mb']:.0f}" if report["rss_mb"] else "-"])
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(header, widths)).rstrip()]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+    lines.append("(milliseconds, medians; phases as reported on /ready, the rest measured from spawn)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS) + [WORKER], default=list(SERVERS) + [WORKER])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per entry point")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="environment variable for the servers, e.g. --env FAST_PREPROCESS=0")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail if an entry point's median time to first prediction is over this")
+    args = parser.parse_args()
+    # Model reloading and logging only add noise to a startup measurement
+    env = dict({"MODEL_RELOAD_INTERVAL": "0", "LOG_SAMPLE_RATES": "request=0,result=0,payload=0"},
+               **dict(item.split("=", 1) for item in args.env))
+
+    reports = []
+    for name in args.servers:
+        print(f"Starting {name} {args.runs} times", file=sys.stderr)
+        if name != WORKER and port_in_use(HOST, PORT):
+            reports.append({"entry_point": name, "error": f"port {PORT} is already in use"})
+            continue
+        try:
+            runs = [start_worker(args.timeout) if name == WORKER else start_server(name, env, args.timeout)
+                    for _ in range(args.runs)]
+        except (RuntimeError, OSError, http.client.HTTPException, ValueError) as e:
+            reports.append({"entry_point": name, "error": str(e)})
+            continue
+        reports.append(summarize(name, runs))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"runs": args.runs, "env": env},
+        "entry_points": reports,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    print(format_table(reports), file=sys.stderr)
+
+    if args.budget_ms:
+        over = [f"{r['entry_point']}: {r['first_prediction_ms']:.0f} ms" for r in reports
+                if r.get("first_prediction_ms") and r["first_prediction_ms"] > args.budget_ms]
+        for line in over:
+            print(f"OVER BUDGET ({args.budget_ms:.0f} ms) {line}", file=sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Score large CSV or Parquet files in fixed-size chunks.
+
+    python scripts/bulk_score.py soil_tests.csv scored/
+    python scripts/bulk_score.py soil_tests.parquet scored/ --chunk-size 200000 --workers 8
+    python scripts/bulk_score.py soil_tests.csv scored/ --keep-columns sample_id,district --top-k 3
+
+The input is read one chunk at a time, so memory use does not grow with the
+file size. Each chunk is preprocessed column-wise, scored with one
+predict_proba call and written to the output directory as its own part
+file (part-000000.csv, ... or .parquet). Part files are written atomically,
+so rerunning the same command after an interruption skips the chunks that
+are already done. _SUCCESS is written when the whole input has been scored.
+
+Input columns may use the model names (N, P, K, temperature, humidity, ph,
+rainfall, Soil Type, state, land_size), the API names (soil_type) or the
+form names (Temperature, pH, Rainfall, State, Soil_Type, Area). State and
+soil type are matched case-insensitively. Rows with missing or unknown
+values get an error message instead of predictions.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ml_server'))
+from feature_builder import FeatureBuilder
+from model_registry import DEFAULT_MODEL_DIR, get_bundle
+
+# Alternative column names -> model column names
+COLUMN_ALIASES = {
+    "soil_type": "Soil Type",
+    "Soil_Type": "Soil Type",
+    "Temperature": "temperature",
+    "Humidity": "humidity",
+    "pH": "ph",
+    "Rainfall": "rainfall",
+    "State": "state",
+    "Area": "land_size",
+}
+
+JOB_FILE = "_job.json"
+SUCCESS_FILE = "_SUCCESS"
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    name = path.lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name.endswith((".csv", ".csv.gz", ".txt")):
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; pass --input-format")
+
+
+def read_chunks(path, fmt, chunk_size):
+    """
+    Yield DataFrames of at most chunk_size rows
+    """
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkScorer:
+    """
+    Vectorized validation, preprocessing and top-k scoring of DataFrames
+    """
+
+    def __init__(self, model_dir, k):
+        bundle = get_bundle(model_dir)
+        self.model = bundle.model
+        self.y_encoder = bundle.y_encoder
+        self.version = bundle.version
+        self.feature_builder = FeatureBuilder.from_sklearn(bundle.label_encoders, bundle.column_transformer)
+        self.k = min(k, len(self.model.classes_))
+
+        # Known values of every categorical column, keyed by lower case
+        self.vocabularies = {col: {str(value).lower(): value for value in values}
+                             for col, values in self.feature_builder.categories().items()}
+        self.input_columns = self.feature_builder.input_columns
+
+    def score(self, df):
+        """
+        DataFrame with crop_1..k, probability_1..k and error for every row
+        """
+        df = df.rename(columns={name: target for name, target in COLUMN_ALIASES.items() if name in df.columns})
+        n = len(df)
+        errors = np.full(n, "", dtype=object)
+        columns = {}
+
+        for col in self.input_columns:
+            if col not in df.columns:
+                errors[:] = f"Missing column {col}"
+                continue
+            if col in self.vocabularies:
+                values = df[col].astype(str).str.strip().str.lower().map(self.vocabularies[col])
+                bad = values.isna().to_numpy()
+                if bad.any():
+                    errors[bad & (errors == "")] = [f"Invalid {col} value: {value!r}"
+                                                    for value in df[col].to_numpy()[bad & (errors == "")]]
+                columns[col] = values.to_numpy(dtype=object)
+            else:
+                values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+                bad = np.isnan(values)
+                errors[bad & (errors == "")] = f"Missing or non-numeric {col}"
+                columns[col] = values
+
+        valid = errors == ""
+        crops = np.full((n, self.k), None, dtype=object)
+        probabilities = np.full((n, self.k), np.nan)
+        if valid.any():
+            X = self.feature_builder.transform_columns({col: values[valid] for col, values in columns.items()})
+            proba = self.model.predict_proba(X)
+            idx = np.argpartition(-proba, self.k - 1, axis=1)[:, :self.k]
+            order = np.argsort(-np.take_along_axis(proba, idx, axis=1), axis=1, kind="stable")
+            top_idx = np.take_along_axis(idx, order, axis=1)
+            crops[valid] = self.y_encoder.inverse_transform(top_idx.ravel()).reshape(top_idx.shape)
+            probabilities[valid] = np.take_along_axis(proba, top_idx, axis=1)
+
+        out = {}
+        for i in range(self.k):
+            out[f"crop_{i + 1}"] = crops[:, i]
+            out[f"probability_{i + 1}"] = probabilities[:, i]
+        out["error"] = np.where(valid, None, errors)
+        return pd.DataFrame(out, index=df.index)
+
+
+def part_path(output_dir, chunk_index, fmt):
+    return os.path.join(output_dir, f"part-{chunk_index:06d}.{fmt}")
+
+
+def write_part(frame, path, fmt):
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)  # a part file either exists complete or not at all
+
+
+# Per-process state for --workers
+_scorer = None
+
+
+def init_worker(model_dir, k):
+    global _scorer
+    _scorer = ChunkScorer(model_dir, k)
+
+
+def score_chunk(chunk_index, first_row, df, keep_columns, output_dir, output_format):
+    scored = _scorer.score(df)
+    kept = df[keep_columns].reset_index(drop=True) if keep_columns else None
+    scored = scored.reset_index(drop=True)
+    scored.insert(0, "row", np.arange(first_row, first_row + len(df)))
+    if kept is not None:
+        scored = pd.concat([scored.iloc[:, :1], kept, scored.iloc[:, 1:]], axis=1)
+    write_part(scored, part_path(output_dir, chunk_index, output_format), output_format)
+    return chunk_index, len(df), int(scored["error"].notna().sum())
+
+
+def check_job(output_dir, job, restart):
+    """
+    Make sure a resumed run uses the same input and settings as the first one
+    """
+    path = os.path.join(output_dir, JOB_FILE)
+    if os.path.exists(path) and not restart:
+        with open(path) as f:
+            previous = json.load(f)
+        changed = [key for key in job if previous.get(key) != job[key]]
+        if changed:
+            raise SystemExit(f"{output_dir} holds a run with different {', '.join(changed)}; "
+                             f"use another output directory or --restart")
+        return
+    for name in os.listdir(output_dir):
+        if name.startswith("part-") or name in (JOB_FILE, SUCCESS_FILE):
+            os.remove(os.path.join(output_dir, name))
+    with open(path, "w") as f:
+        json.dump(job, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file")
+    parser.add_argument("output_dir", help="directory for the part files (created if needed)")
+    parser.add_argument("--input-format", choices=["csv", "parquet"])
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="rows per chunk")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--keep-columns", default="", help="comma-separated input columns copied to the output")
+    parser.add_argument("--workers", type=int, default=1, help="processes scoring chunks in parallel")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--restart", action="store_true", help="discard earlier progress in output_dir")
+    args = parser.parse_args()
+
+    input_format = detect_format(args.input, args.input_format)
+    keep_columns = [col for col in args.keep_columns.split(",") if col]
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    init_worker(args.model_dir, args.top_k)
+    stat = os.stat(args.input)
+    check_job(args.output_dir, {
+        "input": os.path.abspath(args.input),
+        "input_size": stat.st_size,
+        "input_mtime": stat.st_mtime,
+        "chunk_size": args.chunk_size,
+        "top_k": args.top_k,
+        "keep_columns": keep_columns,
+        "output_format": args.output_format,
+        "model_version": _scorer.version,
+    }, args.restart)
+
+    pool = None
+    if args.workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.model_dir, args.top_k))
+    # At most two chunks per worker are queued, so memory stays bounded
+    pending = collections.deque()
+    max_pending = 2 * args.workers
+
+    started = time.perf_counter()
+    rows_done = rows_skipped = errors = chunks_done = 0
+
+    def collect(result):
+        nonlocal rows_done, errors, chunks_done
+        chunk_index, rows, chunk_errors = result
+        rows_done += rows
+        errors += chunk_errors
+        chunks_done += 1
+        elapsed = time.perf_counter() - started
+        print(f"chunk {chunk_index}: {rows} rows ({chunk_errors} errors), "
+              f"{rows_done / elapsed:.0f} rows/s", file=sys.stderr)
+
+    first_row = 0
+    for chunk_index, df in enumerate(read_chunks(args.input, input_format, args.chunk_size)):
+        missing = [col for col in keep_columns if col not in df.columns]
+        if missing:
+            raise SystemExit(f"--keep-columns not found in input: {missing}")
+        if os.path.exists(part_path(args.output_dir, chunk_index, args.output_format)):
+            rows_skipped += len(df)
+        elif pool:
+            pending.append(pool.apply_async(score_chunk, (chunk_index, first_row, df, keep_columns,
+                                                          args.output_dir, args.output_format)))
+            while len(pending) >= max_pending:
+                collect(pending.popleft().get())
+        else:
+            collect(score_chunk(chunk_index, first_row, df, keep_columns, args.output_dir, args.output_format))
+        first_row += len(df)
+
+    while pending:
+        collect(pending.popleft().get())
+    if pool:
+        pool.close()
+        pool.join()
+
+    summary = {
+        "rows": first_row,
+        "rows_scored": rows_done,
+        "rows_skipped_resumed": rows_skipped,
+        "rows_with_errors": errors,
+        "seconds": round(time.perf_counter() - started, 3),
+        "model_version": _scorer.version,
+    }
+    with open(os.path.join(args.output_dir, SUCCESS_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,16 @@
 import sys
 import json
-import pickle
 import numpy as np
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ml_server'))
+from model_registry import get_bundle
+
 def load_models():
     try:
-        base_path = Path(__file__).parent.parent / 'models'
-        
-        with open(base_path / 'LogReg.pkl', 'rb') as f:
-            model = pickle.load(f)
-        
-        with open(base_path / 'column_transformer.pkl', 'rb') as f:
-            column_transformer = pickle.load(f)
-        
-        with open(base_path / 'label_encoders.pkl', 'rb') as f:
-            label_encoders = pickle.load(f)
-        
-        with open(base_path / 'y_encoder.pkl', 'rb') as f:
-            y_encoder = pickle.load(f)
-            
-        return model, column_transformer, label_encoders, y_encoder
+        # Loaded once per process by the registry, not on every predict() call
+        bundle = get_bundle()
+        return bundle.model, bundle.column_transformer, bundle.label_encoders, bundle.y_encoder
     except Exception as e:
         raise Exception(f"Error loading models: {str(e)}")
 
@@ -0,0 +1,265 @@
+"""
+Map the best crop for every cell of a raster grid.
+
+    python scripts/suitability_map.py layers/ maps/
+    python scripts/suitability_map.py layers/ maps/ --engine rules --tile 1024 --workers 8
+
+The layers directory holds one 2-D .npy array per input, all the same shape:
+
+    N.npy P.npy K.npy ph.npy temperature.npy humidity.npy rainfall.npy   float layers
+    state.npy soil_type.npy                                               integer index layers
+    land_size.npy                                                         optional (else --land-size)
+    legend.json      {"state": ["Punjab", ...], "soil_type": ["Sandy", ...]}
+
+Index layers refer to the names in legend.json. Cells with NaN in a float
+layer, or an index outside the legend, are no-data.
+
+Layers are memory-mapped and scored tile by tile, so only --tile x --tile
+cells per worker are in memory at a time. The output directory gets
+best_crop.npy (int16 index into legend.json's "crops", -1 for no-data or
+cells the model can't score) and probability.npy (float32, NaN for
+no-data). Both are written through memory maps as tiles finish.
+
+--engine logreg (default) uses the model from model_registry. --engine rules
+uses rule_engine.RuleEngine (scores from rule_engine.CROP_REQUIREMENTS), which ignores
+soil type and land size.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ml_server'))
+from feature_builder import Coded, FeatureBuilder
+from model_registry import DEFAULT_MODEL_DIR, get_bundle
+from rule_engine import PARAMETERS, RuleEngine
+
+NUMERIC_LAYERS = ["N", "P", "K", "ph", "temperature", "humidity", "rainfall"]
+INDEX_LAYERS = ["state", "soil_type"]
+LEGEND_FILE = "legend.json"
+
+
+def open_layers(layers_dir):
+    """
+    Memory-mapped layers and the legend; checks that every layer has the same shape
+    """
+    with open(os.path.join(layers_dir, LEGEND_FILE)) as f:
+        legend = json.load(f)
+    names = NUMERIC_LAYERS + INDEX_LAYERS
+    if os.path.exists(os.path.join(layers_dir, "land_size.npy")):
+        names.append("land_size")
+
+    layers = {}
+    for name in names:
+        path = os.path.join(layers_dir, f"{name}.npy")
+        if not os.path.exists(path):
+            raise SystemExit(f"Missing layer: {path}")
+        layers[name] = np.load(path, mmap_mode="r")
+        if layers[name].ndim != 2:
+            raise SystemExit(f"{path} is not a 2-D array (shape {layers[name].shape})")
+    shapes = {name: layer.shape for name, layer in layers.items()}
+    if len(set(shapes.values())) != 1:
+        raise SystemExit(f"Layers have different shapes: {shapes}")
+    for name in INDEX_LAYERS:
+        if name not in legend:
+            raise SystemExit(f"{LEGEND_FILE} has no {name!r} list")
+    return layers, legend
+
+
+class ModelEngine:
+    """
+    The registry's LogReg pipeline, with index layers passed to the feature builder as codes
+    """
+
+    def __init__(self, model_dir, legend):
+        bundle = get_bundle(model_dir)
+        self.model = bundle.model
+        self.version = bundle.version
+        self.crops = bundle.classes
+        self.feature_builder = FeatureBuilder.from_sklearn(bundle.label_encoders, bundle.column_transformer)
+
+        # Legend entries the model doesn't know make their cells unscorable, not fatal
+        vocabularies = self.feature_builder.categories()
+        self.states = legend["state"]
+        self.soil_types = legend["soil_type"]
+        self.known = {
+            "state": np.array([state in vocabularies.get("state", [state]) for state in self.states]),
+            "soil_type": np.array([soil in vocabularies.get("Soil Type", [soil]) for soil in self.soil_types]),
+        }
+
+    def score(self, values, state, soil_type, land_size):
+        """
+        (top class index, its probability) per cell, -1/NaN where a category is unknown to the model
+        """
+        best = np.full(len(state), -1, dtype=np.int16)
+        probability = np.full(len(state), np.nan, dtype=np.float32)
+        ok = self.known["state"][state] & self.known["soil_type"][soil_type]
+        if not ok.any():
+            return best, probability
+        columns = {name: values[ok, i] for i, name in enumerate(NUMERIC_LAYERS)}
+        columns["land_size"] = land_size[ok]
+        columns["state"] = Coded(state[ok], self.states)
+        columns["Soil Type"] = Coded(soil_type[ok], self.soil_types)
+        proba = self.model.predict_proba(self.feature_builder.transform_columns(columns))
+        top = proba.argmax(axis=1)
+        best[ok] = top
+        probability[ok] = proba[np.arange(len(top)), top]
+        return best, probability
+
+
+class RulesEngine:
+    """
+    rule_engine.CROP_REQUIREMENTS scores; the score of the best crop is reported as its probability
+    """
+
+    # Rows per RuleEngine.score call; it broadcasts over (rows x crops x parameters)
+    chunk_size = 8192
+
+    def __init__(self, legend):
+        self.engine = RuleEngine()
+        self.version = "rules"
+        self.crops = self.engine.crops
+        self.state_lookup = self.engine.state_indices(legend["state"])
+        self.order = [NUMERIC_LAYERS.index(param) for param in PARAMETERS]
+
+    def score(self, values, state, soil_type, land_size):
+        best = np.empty(len(state), dtype=np.int16)
+        probability = np.empty(len(state), dtype=np.float32)
+        for start in range(0, len(state), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            scores = self.engine.score(values[chunk][:, self.order], self.state_lookup[state[chunk]])
+            # First maximum, like the stable ranking in RuleEngine.rank
+            top = scores.argmax(axis=1)
+            best[chunk] = top
+            probability[chunk] = scores[np.arange(len(top)), top]
+        return best, probability
+
+
+# Per-process state, set up by init_worker
+_state = {}
+
+
+def init_worker(layers_dir, output_dir, engine, model_dir, land_size, threads=None):
+    if threads:
+        # Tiles are the unit of parallelism; don't let every worker start a full BLAS pool too
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(threads)
+        except ImportError:
+            pass
+    layers, legend = open_layers(layers_dir)
+    _state.update(
+        layers=layers,
+        legend_sizes={name: len(legend[name]) for name in INDEX_LAYERS},
+        engine=ModelEngine(model_dir, legend) if engine == "logreg" else RulesEngine(legend),
+        best=np.load(os.path.join(output_dir, "best_crop.npy"), mmap_mode="r+"),
+        probability=np.load(os.path.join(output_dir, "probability.npy"), mmap_mode="r+"),
+        land_size=land_size,
+    )
+
+
+def score_tile(window):
+    """
+    Score one (row, col, height, width) window; returns (scored cells, no-data cells)
+    """
+    r, c, h, w = window
+    layers = _state["layers"]
+    tile = (slice(r, r + h), slice(c, c + w))
+
+    values = np.stack([np.asarray(layers[name][tile], dtype=np.float64).ravel() for name in NUMERIC_LAYERS], axis=1)
+    state = np.asarray(layers["state"][tile]).ravel().astype(np.intp)
+    soil_type = np.asarray(layers["soil_type"][tile]).ravel().astype(np.intp)
+    if "land_size" in layers:
+        land_size = np.asarray(layers["land_size"][tile], dtype=np.float64).ravel()
+    else:
+        land_size = np.full(h * w, _state["land_size"])
+
+    valid = ~np.isnan(values).any(axis=1) & ~np.isnan(land_size)
+    valid &= (state >= 0) & (state < _state["legend_sizes"]["state"])
+    valid &= (soil_type >= 0) & (soil_type < _state["legend_sizes"]["soil_type"])
+
+    best = np.full(h * w, -1, dtype=np.int16)
+    probability = np.full(h * w, np.nan, dtype=np.float32)
+    if valid.any():
+        best[valid], probability[valid] = _state["engine"].score(
+            values[valid], state[valid], soil_type[valid], land_size[valid])
+    _state["best"][tile] = best.reshape(h, w)
+    _state["probability"][tile] = probability.reshape(h, w)
+    return int((best >= 0).sum()), int((~valid).sum())
+
+
+def tiles(shape, size):
+    height, width = shape
+    return [(r, c, min(size, height - r), min(size, width - c))
+            for r in range(0, height, size) for c in range(0, width, size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("layers_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--engine", choices=["logreg", "rules"], default="logreg")
+    parser.add_argument("--tile", type=int, default=512, help="tile edge in cells")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--land-size", type=float, default=1.0, help="used when there is no land_size layer")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+
+    layers, legend = open_layers(args.layers_dir)
+    shape = next(iter(layers.values())).shape
+    engine = ModelEngine(args.model_dir, legend) if args.engine == "logreg" else RulesEngine(legend)
+    del layers
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    np.lib.format.open_memmap(os.path.join(args.output_dir, "best_crop.npy"), mode="w+", dtype=np.int16, shape=shape)
+    np.lib.format.open_memmap(os.path.join(args.output_dir, "probability.npy"), mode="w+", dtype=np.float32, shape=shape)
+    with open(os.path.join(args.output_dir, LEGEND_FILE), "w") as f:
+        json.dump({"crops": engine.crops, "engine": args.engine, "model_version": engine.version}, f, indent=2)
+
+    windows = tiles(shape, args.tile)
+    init_args = (args.layers_dir, args.output_dir, args.engine, args.model_dir, args.land_size)
+    started = time.perf_counter()
+    scored = nodata = 0
+
+    def report(done, result):
+        nonlocal scored, nodata
+        scored += result[0]
+        nodata += result[1]
+        if done % max(1, len(windows) // 20) == 0 or done == len(windows):
+            elapsed = time.perf_counter() - started
+            print(f"{done}/{len(windows)} tiles, {(scored + nodata) / elapsed:,.0f} cells/s", file=sys.stderr)
+
+    if args.workers > 1 and len(windows) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=init_args + (1,))
+        # Workers write into the shared output maps; only small counts come back
+        for done, result in enumerate(pool.imap_unordered(score_tile, windows), 1):
+            report(done, result)
+        pool.close()
+        pool.join()
+    else:
+        init_worker(*init_args)
+        for done, window in enumerate(windows, 1):
+            report(done, score_tile(window))
+        _state["best"].flush()
+        _state["probability"].flush()
+
+    summary = {
+        "shape": list(shape),
+        "tiles": len(windows),
+        "cells_scored": scored,
+        "cells_unscored": shape[0] * shape[1] - scored,
+        "cells_no_data": nodata,
+        "seconds": round(time.perf_counter() - started, 3),
+        "engine": args.engine,
+        "model_version": engine.version,
+    }
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()